@@ -0,0 +1,30 @@
+"""
+An example of how to use the queues from asyncio code.
+
+All the MQI calls of a connection run on a thread of their own, so waiting for
+a message does not block the event loop, and cancelling the task that waits
+stops the wait.
+"""
+
+import asyncio
+from pymqiwm import AsyncWMQueueManager, AsyncWMQueue
+
+
+async def main():
+    async with AsyncWMQueueManager(name="TEST", conn_info="localhost(1414)") as qmgr:
+        async with AsyncWMQueue(qmgr, "DAVAY") as queue:
+            await queue.put("Test message")
+            print(await queue.get())
+
+            reader = asyncio.ensure_future(print_messages(queue))
+            await asyncio.sleep(10)
+            reader.cancel()  # stops waiting for new messages
+
+
+async def print_messages(queue):
+    async for message in queue.read_messages_while_waiting(seconds_wait_interval=-1):
+        print(message)
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,36 @@
+"""
+An example of how to share a pool of connections between threads.
+
+Every thread that takes a connection from the pool gets its own connection handle,
+so the threads don't wait for each other on a single connection like they would when
+sharing one `WMQueueManager`.
+
+`pool.stats()` shows how many connections are in use, how many threads are waiting
+for one and how long it took them to get it.
+"""
+
+import threading
+from pymqiwm import WMQueue, WMQueueManagerPool
+
+pool = WMQueueManagerPool(
+    name="TEST",
+    conn_info="localhost(1414)",
+    size=4
+)
+
+
+def write_to_queue(thread_number):
+    for i in range(100):
+        with pool.connection() as qmgr:
+            with WMQueue(qmgr=qmgr, name="DAVAY") as queue:
+                queue.put("message {0} from thread {1}".format(i, thread_number))
+
+
+if __name__ == '__main__':
+    with pool:
+        threads = [threading.Thread(target=write_to_queue, args=(n,)) for n in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        print(pool.stats())
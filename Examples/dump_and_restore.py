@@ -0,0 +1,21 @@
+"""
+An example of replaying the traffic of a production queue on a test queue manager.
+
+The messages are browsed into a dump file, so they stay on the production queue,
+then put on the test queue at twice the pace they were put at in production.
+"""
+
+from pymqiwm import WMQueueManager, WMQueue, DumpReader, dump, restore
+
+
+if __name__ == '__main__':
+    with WMQueueManager(name="PROD", conn_info="prod-mq(1414)") as qmgr:
+        with WMQueue(qmgr, "ORDERS") as queue:
+            print("Dumped", dump(queue, "orders.dump"), "messages")
+
+    with DumpReader("orders.dump") as reader:
+        print("From", reader[0].put_date_time, "to", reader[-1].put_date_time)
+
+    with WMQueueManager(name="TEST", conn_info="localhost(1414)") as qmgr:
+        with WMQueue(qmgr, "ORDERS") as queue:
+            print("Restored", restore("orders.dump", queue, speed=2), "messages")
@@ -0,0 +1,26 @@
+"""
+An example of sending a file that is bigger than the max message length of the queue.
+
+The file is put as a group of 4MB messages and got back into another file,
+neither side holds more than a couple of chunks in memory.
+"""
+
+from pymqiwm import WMQueueManager, WMQueue
+
+
+def connect():
+    return WMQueueManager(
+        name="TEST",
+        conn_info="localhost(1414)"
+    )
+
+
+if __name__ == '__main__':
+    with connect() as qmgr:
+        with WMQueue(qmgr, "FILES") as queue:
+            with open("backup.tar", "rb") as source:
+                group_id = queue.put_stream(source, chunk_size=4 * 1024 * 1024)
+            print("Put the group", group_id.hex())
+
+            with open("backup.copy.tar", "wb") as target:
+                print("Got", queue.get_stream(target, seconds_wait_interval=5), "bytes")
@@ -0,0 +1,27 @@
+"""
+An example of reading 40 queues over 2 connections.
+
+The orders queues get 5 times the share of the audit queues while all of them have messages,
+the empty queues are only polled once the stats poller sees messages on them.
+"""
+
+from pymqiwm import WMQueueManager, QueueStatsPoller, MultiQueueReader
+
+
+def connect():
+    return WMQueueManager(
+        name="TEST",
+        conn_info="localhost(1414)"
+    )
+
+
+if __name__ == '__main__':
+    weights = {"ORDERS.{0}".format(number): 5 for number in range(20)}
+    weights.update({"AUDIT.{0}".format(number): 1 for number in range(20)})
+
+    with QueueStatsPoller(connect, ["ORDERS.*", "AUDIT.*"], interval=1) as poller:
+        with MultiQueueReader(connect, weights, connections=2, seconds_wait_interval=10,
+                              stats_poller=poller) as reader:
+            for queue_name, message in reader:
+                print(queue_name, message)
+            print(reader.stats())
@@ -0,0 +1,33 @@
+"""
+An example of consuming a queue with a CPU heavy handler on several cores.
+
+Every worker process connects on its own and handles its messages with 2 threads,
+the supervisor adds workers up to 8 while there are more than 1000 messages per worker on the queue.
+"""
+
+import hashlib
+import time
+
+from pymqiwm import WMQueueManager, ProcessSupervisor
+
+
+def connect():
+    return WMQueueManager(
+        name="TEST",
+        conn_info="localhost(1414)"
+    )
+
+
+def handle(message):
+    for _ in range(1000):
+        message = hashlib.sha256(message).digest()
+
+
+if __name__ == '__main__':
+    with ProcessSupervisor(connect, "DAVAY", handle, processes=2, max_processes=8, messages_per_process=1000,
+                           threads=2) as supervisor:
+        for _ in range(12):
+            time.sleep(5)
+            stats = supervisor.stats()
+            print(stats["processes"], "processes,", stats["handled"], "handled,",
+                  round(stats["msgs per sec"]), "msgs/sec,", stats["depth"], "on the queue")
@@ -0,0 +1,30 @@
+"""
+An example of publish/subscribe.
+
+The first subscription is managed and non durable, it exists only inside its `with`.
+The second one is durable, it keeps collecting the publications between runs of the script,
+and its publications are handled by several threads with `fan_out`.
+"""
+
+from pymqiwm import WMQueueManager, WMTopic, WMSubscription
+
+
+def connect():
+    return WMQueueManager(
+        name="TEST",
+        conn_info="localhost(1414)"
+    )
+
+
+if __name__ == '__main__':
+    with connect() as qmgr:
+        with WMSubscription(qmgr, "prices/#") as subscription, \
+                WMSubscription(qmgr, "prices/+/eur", subscription_name="PRICES.EUR", durable=True) as eur:
+            with WMTopic(qmgr, "prices/fx/eur") as topic:
+                topic.publish("1.0712")
+                topic.publish_many("1.07{0:02}".format(number) for number in range(100))
+
+            for message in subscription.read_messages_while_waiting(1):
+                print(message)
+
+            print(eur.fan_out(print, workers=4, seconds_wait_interval=1))
@@ -0,0 +1,32 @@
+"""
+An example of how to consume a queue with several threads.
+
+The consumer runs 2 getter threads, each with its own connection, and hands the messages
+to a pool of 8 worker threads. When more than 32 messages are waiting for a free worker,
+the getters stop getting new messages until the workers catch up.
+
+`drain` keeps consuming until the queue is empty, and waits for the last messages to be handled.
+"""
+
+import time
+from pymqiwm import WMQueueManager, QueueConsumer
+
+
+def connect():
+    return WMQueueManager(
+        name="TEST",
+        conn_info="localhost(1414)"
+    )
+
+
+def handle(message):
+    time.sleep(0.1)  # some slow processing
+    print(message)
+
+
+if __name__ == '__main__':
+    consumer = QueueConsumer(connect, "DAVAY", handle, getters=2, workers=8, max_in_flight=32)
+    consumer.start()
+    time.sleep(5)
+    print(consumer.stats())
+    consumer.drain()
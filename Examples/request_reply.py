@@ -0,0 +1,50 @@
+"""
+An example of request/reply over two queues.
+
+The server thread answers every request on REQUESTS with a reply on the queue named in its ReplyToQ,
+with the CorrelId of the request, which is what the requester waits for.
+
+`WMRequester` keeps many requests in flight, a single reader thread hands every reply
+to the request with the same CorrelId.
+"""
+
+import threading
+from pymqi import MD
+from pymqiwm import WMQueueManager, WMQueue, WMRequester
+
+stop = threading.Event()
+
+
+def connect():
+    return WMQueueManager(
+        name="TEST",
+        conn_info="localhost(1414)"
+    )
+
+
+def serve():
+    with connect() as qmgr:
+        with WMQueue(qmgr, "REQUESTS") as requests:
+            while not stop.is_set():
+                for request in requests.read_messages_while_waiting(1, with_descriptor=True):
+                    with WMQueue(qmgr, request.reply_to_q.decode().strip()) as replies:
+                        md = MD()
+                        md.CorrelId = request.correl_id
+                        replies.put(request.body.upper(), md)
+
+
+if __name__ == '__main__':
+    server = threading.Thread(target=serve)
+    server.start()
+
+    with connect() as qmgr:
+        with WMQueue(qmgr, "REQUESTS") as requests, WMQueue(qmgr, "REPLIES") as replies:
+            print(requests.request("ping", replies, timeout=5))
+
+    with WMRequester(connect, "REQUESTS", "REPLIES") as requester:
+        futures = [requester.submit("request {0}".format(number)) for number in range(100)]
+        for future in futures:
+            print(future.result(timeout=5))
+
+    stop.set()
+    server.join()
@@ -1,4 +1,57 @@
-from .queue_manager import WMQueueManager
-from .queue import WMQueue
+import importlib
 
-__all__ = ["WMQueueManager", "WMQueue"]
+# The module of every public name. The modules, and pymqi with them, are imported on the first use of one of
+# their names, so `import pymqiwm` alone is cheap for short-lived scripts.
+_MODULES = {
+    "WMQueueManager": "queue_manager",
+    "WMQueue": "queue",
+    "WMMessage": "message",
+    "BrowseCursor": "message",
+    "WMQueueManagerPool": "pool",
+    "QueueConsumer": "consumer",
+    "WMRequester": "requester",
+    "ParallelBrowser": "browse",
+    "WMTopic": "topic",
+    "WMSubscription": "topic",
+    "QueueStatsPoller": "stats",
+    "QueueStats": "stats",
+    "AsyncWMQueueManager": "aio",
+    "AsyncWMQueue": "aio",
+    "PymqiBackend": "backend",
+    "FakeBackend": "fake_backend",
+    "Metrics": "metrics",
+    "InstrumentedBackend": "metrics",
+    "Codec": "codec",
+    "RawCodec": "codec",
+    "StringCodec": "codec",
+    "JsonCodec": "codec",
+    "MsgpackCodec": "codec",
+    "CompressedCodec": "codec",
+    "ProcessSupervisor": "supervisor",
+    "MultiQueueReader": "reader",
+    "dump": "snapshot",
+    "restore": "snapshot",
+    "DumpReader": "snapshot",
+    "DumpWriter": "snapshot",
+}
+
+__all__ = ["WMQueueManager", "WMQueue", "WMMessage", "WMQueueManagerPool", "QueueConsumer", "AsyncWMQueueManager",
+           "AsyncWMQueue", "WMRequester", "QueueStatsPoller", "QueueStats", "PymqiBackend", "FakeBackend",
+           "BrowseCursor", "ParallelBrowser", "WMTopic", "WMSubscription",
+           "Metrics", "InstrumentedBackend",
+           "Codec", "RawCodec", "StringCodec", "JsonCodec", "MsgpackCodec", "CompressedCodec",
+           "ProcessSupervisor", "MultiQueueReader",
+           "dump", "restore", "DumpReader", "DumpWriter"]
+
+
+def __getattr__(name):
+    module = _MODULES.get(name)
+    if module is None:
+        raise AttributeError("module {0!r} has no attribute {1!r}".format(__name__, name))
+    value = getattr(importlib.import_module("." + module, __name__), name)
+    globals()[name] = value  # the next uses don't go through here
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
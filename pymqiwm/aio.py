@@ -0,0 +1,250 @@
+import asyncio
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from pymqiwm.mqi import MQMIError
+from pymqiwm.mqi.CMQC import MQRC_NO_MSG_AVAILABLE
+from pymqiwm.consts import DEFAULT_CHANNEL
+from pymqiwm.message import WMMessage
+from pymqiwm.queue import WMQueue
+from pymqiwm.queue_manager import WMQueueManager
+
+_NO_MESSAGE = object()
+
+
+class AsyncWMQueueManager(object):
+    """
+
+        An asyncio wrapper for the WMQueueManager class.
+        Every connection gets its own single thread executor, all the blocking MQI calls of the connection
+        and of its queues are made on it, so they never block the event loop.
+
+        Usage:
+            >>> qmgr = AsyncWMQueueManager(name=..., conn_info=...)
+
+            >>> async with qmgr:
+            >>>     await qmgr.create_local_queue(name="LOCAL")
+            >>>     async with AsyncWMQueue(qmgr, "LOCAL") as queue:
+            >>>         await queue.put("test")
+
+    """
+
+    def __init__(self,
+                 name: str,
+                 conn_info: str,
+                 channel=DEFAULT_CHANNEL,
+                 user=None,
+                 password=None,
+                 backend=None,
+                 reconnect=False,
+                 reconnect_timeout=300):
+        self.sync = WMQueueManager(name, conn_info, channel=channel, user=user, password=password, backend=backend,
+                                   reconnect=reconnect, reconnect_timeout=reconnect_timeout)
+        self._executor = None
+
+    @property
+    def is_connected(self):
+        return self._executor is not None and self.sync.qmgr.is_connected
+
+    async def __aenter__(self):
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="pymqiwm-" + self.sync.qmgr_name)
+        try:
+            await self.run(self.sync.__enter__)
+        except BaseException:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+            raise
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        try:
+            await self.run(self.sync.__exit__, exc_type, exc_val, exc_tb)
+        finally:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    async def run(self, func, *args, **kwargs):
+        """ Runs a blocking function on the executor of this connection and waits for its result """
+        assert self._executor is not None, "Has to be connected to the queue manager"
+        return await asyncio.get_running_loop().run_in_executor(self._executor, partial(func, *args, **kwargs))
+
+    def submit(self, func, *args, **kwargs) -> asyncio.Future:
+        """ Same as `run`, but returns the future so the caller can decide how to wait for it """
+        assert self._executor is not None, "Has to be connected to the queue manager"
+        return asyncio.get_running_loop().run_in_executor(self._executor, partial(func, *args, **kwargs))
+
+    async def commit(self):
+        await self.run(self.sync.commit)
+
+    async def backout(self):
+        await self.run(self.sync.backout)
+
+    async def display_queues(self, value_for_search) -> [str]:
+        return await self.run(self.sync.display_queues, value_for_search)
+
+    async def display_channels(self, value_for_search) -> [str]:
+        return await self.run(self.sync.display_channels, value_for_search)
+
+    async def create_local_queue(self, name, depth=5000):
+        await self.run(self.sync.create_local_queue, name, depth)
+
+    async def delete_queue(self, name, purge=False):
+        await self.run(self.sync.delete_queue, name, purge)
+
+    async def create_local_queues(self, names, depth=5000) -> dict:
+        return await self.run(self.sync.create_local_queues, names, depth)
+
+    async def delete_queues(self, value_for_search, purge=False) -> dict:
+        return await self.run(self.sync.delete_queues, value_for_search, purge)
+
+    async def inquire_queues(self, value_for_search, attrs=None) -> dict:
+        return await self.run(self.sync.inquire_queues, value_for_search, attrs)
+
+    async def get_stats_from_queue(self, name) -> dict:
+        return await self.run(self.sync.get_stats_from_queue, name)
+
+    async def inquire_queue_status(self, name) -> dict:
+        return await self.run(self.sync.inquire_queue_status, name)
+
+    async def inquire_queues_status(self, value_for_search) -> dict:
+        return await self.run(self.sync.inquire_queues_status, value_for_search)
+
+    async def reset_queue_stats(self, value_for_search) -> dict:
+        return await self.run(self.sync.reset_queue_stats, value_for_search)
+
+
+class AsyncWMQueue(object):
+    """
+
+        An asyncio wrapper for the WMQueue class, its calls run on the executor of its AsyncWMQueueManager.
+
+        Usage:
+            >>> async with AsyncWMQueue(qmgr, "DAVAY") as queue:
+            >>>     await queue.put("test")
+            >>>     message = await queue.get(seconds_wait_interval=5)
+            >>>     async for message in queue.read_messages_while_waiting(-1):
+            >>>         print(message)
+
+        A get that waits is made of MQGETs that wait at most `cancel_check_interval` seconds each,
+        so cancelling the task that awaits it stops the wait within that time.
+        A message that arrives while a get is being cancelled is not lost, the next get returns it,
+        and if the queue is closed before that, the message is put back on the queue.
+
+    """
+
+    def __init__(self, qmgr: AsyncWMQueueManager, name: str, open_options=None, cancel_check_interval=0.2, codec=None):
+        self.qmgr = qmgr
+        self.name = name
+        self.sync = WMQueue(qmgr.sync, name, open_options=open_options, codec=codec)
+        self.cancel_check_interval = cancel_check_interval
+        self._pending = deque()
+
+    async def __aenter__(self):
+        await self.qmgr.run(self.sync.__enter__)
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.qmgr.run(self._close, exc_type, exc_val, exc_tb)
+
+    def _close(self, exc_type, exc_val, exc_tb):
+        try:
+            while self._pending:
+                message, md = self._pending.popleft()
+                self.sync.put(message, md)
+        finally:
+            self.sync.__exit__(exc_type, exc_val, exc_tb)
+
+    async def put(self, msg, *opts):
+        await self.qmgr.run(self.sync.put, msg, *opts)
+
+    async def put_many(self, messages, batch_size=100, batch_interval_ms=None) -> int:
+        return await self.qmgr.run(self.sync.put_many, messages, batch_size, batch_interval_ms)
+
+    async def get_many(self, count, batch_size=100, batch_interval_ms=None, max_length=None,
+                       with_descriptor=False) -> list:
+        return await self.qmgr.run(self.sync.get_many, count, batch_size, batch_interval_ms, max_length,
+                                   with_descriptor)
+
+    async def put_stream(self, fileobj, chunk_size=1048576, md=None) -> bytes:
+        return await self.qmgr.run(self.sync.put_stream, fileobj, chunk_size, md)
+
+    async def get_stream(self, fileobj, seconds_wait_interval=0, max_length=None) -> int:
+        return await self.qmgr.run(self.sync.get_stream, fileobj, seconds_wait_interval, max_length)
+
+    async def depth(self) -> int:
+        return await self.qmgr.run(self.sync.depth)
+
+    async def get(self, max_length=None, seconds_wait_interval=0):
+        """
+        Gets a message, waiting up to `seconds_wait_interval` seconds for one to arrive (-1 waits forever).
+        Like `WMQueue.get`, raises MQMIError with MQRC_NO_MSG_AVAILABLE if no message arrived.
+        """
+        return (await self._get(max_length, seconds_wait_interval))[0]
+
+    async def get_message(self, max_length=None, seconds_wait_interval=0) -> WMMessage:
+        """ The same as `get`, but returns a `WMMessage` like `WMQueue.get_message` """
+        return WMMessage.from_md(*(await self._get(max_length, seconds_wait_interval)))
+
+    async def _get(self, max_length, seconds_wait_interval):
+        if self._pending:
+            return self._pending.popleft()
+
+        cancelled = threading.Event()
+        future = self.qmgr.submit(self._get_while_waiting, max_length, seconds_wait_interval, cancelled)
+        try:
+            message, md = await asyncio.shield(future)
+        except asyncio.CancelledError:
+            cancelled.set()
+            future.add_done_callback(self._keep_message)
+            raise
+        return message, md
+
+    def _keep_message(self, future):
+        """ Keeps the message a cancelled get returned, for the next get """
+        if not future.cancelled() and future.exception() is None:
+            self._pending.append(future.result())
+
+    def _get_while_waiting(self, max_length, seconds_wait_interval, cancelled):
+        """ Runs on the executor, waits in slices so a cancel is noticed between them """
+        md = self.sync._get_message_descriptor()
+        deadline = None if seconds_wait_interval == -1 else time.monotonic() + seconds_wait_interval
+        while True:
+            remaining = self.cancel_check_interval if deadline is None else deadline - time.monotonic()
+            gmo = self.sync._get_and_wait_gmo(
+                wait_interval=int(max(0, min(remaining, self.cancel_check_interval)) * 1000)
+            )
+            try:
+                return self.sync.get(max_length, md, gmo), md
+            except MQMIError as e:
+                if e.reason != MQRC_NO_MSG_AVAILABLE:
+                    raise
+                if cancelled.is_set() or (deadline is not None and time.monotonic() >= deadline):
+                    raise
+
+    async def read_messages_while_waiting(self, seconds_wait_interval=0, max_length=None, with_descriptor=False):
+        """ The same as `WMQueue.read_messages_while_waiting`, as an async generator """
+        get = self.get_message if with_descriptor else self.get
+        while True:
+            try:
+                message = await get(max_length, seconds_wait_interval)
+            except MQMIError as e:
+                if e.reason != MQRC_NO_MSG_AVAILABLE:
+                    raise
+                if seconds_wait_interval != -1:
+                    return
+                continue
+            yield message
+
+    async def browse_messages(self, max_length=None, with_descriptor=False):
+        """ The same as `WMQueue.browse_messages`, as an async generator """
+        messages = self.sync.browse_messages(max_length, with_descriptor)
+        try:
+            while True:
+                message = await self.qmgr.run(next, messages, _NO_MESSAGE)
+                if message is _NO_MESSAGE:
+                    return
+                yield message
+        finally:
+            await self.qmgr.run(messages.close)
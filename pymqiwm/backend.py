@@ -0,0 +1,58 @@
+from pymqiwm.mqi import Queue, QueueManager, PCFExecute, Topic, Subscription
+
+
+class PymqiBackend(object):
+    """
+
+        The default backend, creates the real pymqi objects that talk to a live queue manager.
+
+        A backend is the single place where the wrapper creates its pymqi objects,
+        so any object that exposes the same factory functions can be passed to
+        `WMQueueManager(..., backend=...)` instead, for example `FakeBackend`.
+
+    """
+
+    def queue_manager(self):
+        """ Returns an unconnected queue manager object """
+        return QueueManager(None)
+
+    def queue(self, qmgr, name):
+        """
+        Returns a queue object bound to the connection, the open is deferred.
+        :param qmgr: A connected queue manager object created by `queue_manager`.
+        :param name: The name of the queue.
+        """
+        return Queue(qmgr, name)
+
+    def pcf(self, qmgr):
+        """
+        Returns an object for sending PCF commands over the connection.
+        :param qmgr: A connected queue manager object created by `queue_manager`.
+        """
+        return PCFExecute(qmgr)
+
+    def topic(self, qmgr, topic_string=None, topic_name=None):
+        """
+        Returns a topic object bound to the connection, the open is deferred.
+        :param qmgr: A connected queue manager object created by `queue_manager`.
+        :param topic_string: The topic string, for example "prices/eur".
+        :param topic_name: The name of an administrative topic object, its string is the prefix of `topic_string`.
+        """
+        return Topic(qmgr, topic_name=topic_name, topic_string=topic_string)
+
+    def subscription(self, qmgr):
+        """
+        Returns a subscription object bound to the connection, `sub` makes the MQSUB.
+        :param qmgr: A connected queue manager object created by `queue_manager`.
+        """
+        return Subscription(qmgr)
+
+    def async_put_status(self, qmgr):
+        """
+        Returns the results of the puts made with MQPMO_ASYNC_RESPONSE since the previous call (MQSTAT),
+        as a dict of "success", "warning", "failure" counts and the "reason" of the first error.
+        pymqi does not wrap MQSTAT, so this returns None, and the asynchronous puts have to be confirmed
+        by committing them under syncpoint instead.
+        :param qmgr: A connected queue manager object created by `queue_manager`.
+        """
+        return None
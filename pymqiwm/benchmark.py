@@ -0,0 +1,445 @@
+"""
+Benchmarks for the hot paths of the wrapper.
+
+Measures msgs/sec, bytes/sec and the p50/p99 latency per message of `WMQueue.put`, `WMQueue.get`,
+`read_messages_while_waiting`, `stream_messages` and `browse_messages`, next to the same calls made on the raw pymqi
+queue object, of the syncpoint batched `put_many`, `get_many` and `read_messages_in_batches`,
+and of the asynchronous put of `async_producer` (checked every batch size messages),
+for every combination of message size, batch size and thread count.
+With `--codecs`, also measures the per-message cost of encoding and decoding a document with each codec
+(`pymqiwm.codec`), one at a time and a batch at a time, without a queue manager.
+
+By default runs in-process against `FakeBackend`, pass `--backend pymqi` to run against a real
+queue manager, the queue has to exist and should not be used by anything else.
+
+Usage:
+    python -m pymqiwm.benchmark --sizes 64,4096,65536 --threads 1,4 --output results.json
+    python -m pymqiwm.benchmark --latency 0.0005 --compare results.json
+    python -m pymqiwm.benchmark --scenarios "" --codecs raw,json,json+zlib,msgpack --sizes 256,4096
+"""
+
+import argparse
+import json
+import platform
+import random
+import sys
+import threading
+import time
+from pymqiwm.mqi import MQMIError
+from pymqiwm.mqi.CMQC import MQRC_NO_MSG_AVAILABLE
+from pymqiwm.backend import PymqiBackend
+from pymqiwm.codec import CompressedCodec, RawCodec, StringCodec, get_codec
+from pymqiwm.consts import DEFAULT_CHANNEL
+from pymqiwm.fake_backend import FakeBackend
+from pymqiwm.queue import WMQueue
+from pymqiwm.queue_manager import WMQueueManager
+
+
+class Measurement(object):
+    """
+    The latency of every message handled by a single thread.
+    `retries` counts the calls that failed with MQRC_NO_MSG_AVAILABLE although the queue was not empty,
+    which happens when a concurrent consumer takes the message between the two MQGETs of a truncation retry.
+    """
+
+    def __init__(self):
+        self.latencies = []
+        self.retries = 0
+
+
+def _timed(operation, count, retry=False) -> Measurement:
+    """ Calls `operation` until it succeeded `count` times and measures the latency of each call """
+    measurement = Measurement()
+    latencies = measurement.latencies
+    while len(latencies) < count:
+        start = time.perf_counter()
+        try:
+            operation()
+        except MQMIError as e:
+            if not (retry and e.reason == MQRC_NO_MSG_AVAILABLE):
+                raise
+            measurement.retries += 1
+            continue
+        latencies.append(time.perf_counter() - start)
+    return measurement
+
+
+def _timed_iteration(iterator, count) -> Measurement:
+    """ Measures the time it took `iterator` to yield each of its first `count` items """
+    measurement = Measurement()
+    latencies = measurement.latencies
+    start = time.perf_counter()
+    for _ in iterator:
+        now = time.perf_counter()
+        latencies.append(now - start)
+        if len(latencies) == count:
+            break
+        start = now
+    return measurement
+
+
+def put(queue, payload, count, batch_size):
+    return _timed(lambda: queue.put(payload), count)
+
+
+def raw_put(queue, payload, count, batch_size):
+    return _timed(lambda: queue.queue.put(payload), count)
+
+
+def get(queue, payload, count, batch_size):
+    return _timed(queue.get, count, retry=True)
+
+
+def raw_get(queue, payload, count, batch_size):
+    return _timed(queue.queue.get, count, retry=True)
+
+
+def read_messages_while_waiting(queue, payload, count, batch_size):
+    return _timed_iteration(queue.read_messages_while_waiting(), count)
+
+
+def stream_messages(queue, payload, count, batch_size):
+    return _timed_iteration(queue.stream_messages(), count)
+
+
+def browse_messages(queue, payload, count, batch_size):
+    return _timed_iteration(queue.browse_messages(), count)
+
+
+def put_many(queue, payload, count, batch_size):
+    measurement = Measurement()
+    for start in range(0, count, batch_size):
+        size = min(batch_size, count - start)
+        began = time.perf_counter()
+        queue.put_many([payload] * size, batch_size=batch_size)
+        # every message of the batch waits for the commit, so all of them get the latency of the batch
+        measurement.latencies.extend([time.perf_counter() - began] * size)
+    return measurement
+
+
+def put_async(queue, payload, count, batch_size):
+    measurement = Measurement()
+    latencies = measurement.latencies
+    with queue.async_producer(check_every=batch_size) as producer:
+        for _ in range(count):
+            start = time.perf_counter()
+            producer.put(payload)
+            latencies.append(time.perf_counter() - start)
+    if producer.report["failed"]:
+        raise RuntimeError("Asynchronous puts failed: {0}".format(producer.report))
+    return measurement
+
+
+def get_many(queue, payload, count, batch_size):
+    measurement = Measurement()
+    while len(measurement.latencies) < count:
+        began = time.perf_counter()
+        got = len(queue.get_many(min(batch_size, count - len(measurement.latencies)), batch_size=batch_size))
+        measurement.latencies.extend([time.perf_counter() - began] * got)
+    return measurement
+
+
+def read_messages_in_batches(queue, payload, count, batch_size):
+    with queue.read_messages_in_batches(batch_size=batch_size) as messages:
+        return _timed_iteration(messages, count)
+
+
+class Scenario(object):
+    """
+    A single benchmarked operation.
+    :param run: function(queue, payload, count, batch_size) -> Measurement.
+    :param prefill: Whether the queue has to hold the messages before the run (for consumers).
+    :param batched: Whether the scenario is repeated for every batch size.
+    """
+
+    def __init__(self, run, prefill=False, batched=False):
+        self.run = run
+        self.prefill = prefill
+        self.batched = batched
+
+
+SCENARIOS = {
+    "put": Scenario(put),
+    "raw_put": Scenario(raw_put),
+    "get": Scenario(get, prefill=True),
+    "raw_get": Scenario(raw_get, prefill=True),
+    "read_messages_while_waiting": Scenario(read_messages_while_waiting, prefill=True),
+    "stream_messages": Scenario(stream_messages, prefill=True),
+    "browse_messages": Scenario(browse_messages, prefill=True),
+    "put_many": Scenario(put_many, batched=True),
+    "put_async": Scenario(put_async, batched=True),
+    "get_many": Scenario(get_many, prefill=True, batched=True),
+    "read_messages_in_batches": Scenario(read_messages_in_batches, prefill=True, batched=True),
+}
+
+
+def percentile(sorted_values, fraction):
+    """ Returns the value at `fraction` (0 to 1) of an already sorted list, nearest rank """
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def _document(size) -> dict:
+    """ A document of about `size` bytes once encoded as JSON, with text that compresses like real text """
+    words = random.Random(size).choices(["order", "customer", "EUR", "shipped", "pending", "item", "total",
+                                         "warehouse", "0042", "priority", "address", "Berlin", "note"], k=size)
+    document = {"id": 123456789, "status": "pending", "amounts": [10.5, 3.25, 99], "lines": [], "text": ""}
+    text = " ".join(words)
+    document["text"] = text[:max(0, size - len(json.dumps(document)))]
+    return document
+
+
+def _codec_payload(codec, size):
+    """ The document of `size` in the type `codec` takes """
+    inner = codec.codec if isinstance(codec, CompressedCodec) else codec
+    encoded = json.dumps(_document(size))
+    if isinstance(inner, RawCodec):
+        return encoded.encode()
+    if isinstance(inner, StringCodec):
+        return encoded
+    return _document(size)
+
+
+def benchmark_codec(name, size, messages, batch_size) -> dict:
+    """ Measures the microseconds per message of the encode, decode and batched decode of a codec """
+    codec = get_codec(name)
+    payload = _codec_payload(codec, size)
+    start = time.perf_counter()
+    bodies = [codec.encode(payload) for _ in range(messages)]
+    encode_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    for body in bodies:
+        codec.decode(body)
+    decode_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    for first in range(0, messages, batch_size):
+        codec.decode_many(bodies[first:first + batch_size])
+    decode_many_seconds = time.perf_counter() - start
+    return {
+        "codec": name,
+        "message_size": size,
+        "batch_size": batch_size,
+        "messages": messages,
+        "encoded_size": len(bodies[0]),
+        "encode_us": encode_seconds / messages * 1e6,
+        "decode_us": decode_seconds / messages * 1e6,
+        "decode_many_us": decode_many_seconds / messages * 1e6,
+    }
+
+
+class BenchmarkRunner(object):
+    """
+
+        Runs the scenarios against a queue, every thread gets its own connection and queue handle.
+
+        Usage:
+            >>> runner = BenchmarkRunner(connect=lambda: WMQueueManager(...), queue_name="BENCH")
+            >>> results = runner.run(["put", "get"], sizes=[64], batch_sizes=[1], threads=[1], messages=1000)
+
+    """
+
+    def __init__(self, connect, queue_name: str):
+        self.connect = connect
+        self.queue_name = queue_name
+
+    def run(self, scenarios, sizes, batch_sizes, threads, messages) -> list:
+        results = []
+        for name in scenarios:
+            scenario = SCENARIOS[name]
+            for size in sizes:
+                for batch_size in (batch_sizes if scenario.batched else [1]):
+                    for thread_count in threads:
+                        results.append(self.run_one(name, size, batch_size, thread_count, messages))
+        return results
+
+    def run_one(self, name, size, batch_size, thread_count, messages) -> dict:
+        scenario = SCENARIOS[name]
+        payload = b"x" * size
+        per_thread = max(1, messages // thread_count)
+        total = per_thread * thread_count
+
+        self.drain()
+        if scenario.prefill:
+            self.fill(payload, total)
+
+        latencies = []
+        retries = []
+        truncation_retries = []
+        errors = []
+        lock = threading.Lock()
+        barrier = threading.Barrier(thread_count + 1)
+
+        def worker():
+            try:
+                with self.connect() as qmgr:
+                    queue = WMQueue(qmgr, self.queue_name)
+                    with queue:
+                        barrier.wait()
+                        measured = scenario.run(queue, payload, per_thread, batch_size)
+                with lock:
+                    latencies.extend(measured.latencies)
+                    retries.append(measured.retries)
+                    truncation_retries.append(queue.truncation_retries)
+            except BaseException as e:
+                errors.append(e)
+                barrier.abort()
+
+        workers = [threading.Thread(target=worker) for _ in range(thread_count)]
+        for thread in workers:
+            thread.start()
+        try:
+            barrier.wait()
+        except threading.BrokenBarrierError:
+            pass
+        start = time.perf_counter()
+        for thread in workers:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        if errors:
+            raise errors[0]
+
+        self.drain()
+        latencies.sort()
+        done = len(latencies)
+        return {
+            "scenario": name,
+            "message_size": size,
+            "batch_size": batch_size,
+            "threads": thread_count,
+            "messages": done,
+            "seconds": elapsed,
+            "msgs_per_sec": done / elapsed if elapsed else 0.0,
+            "bytes_per_sec": done * size / elapsed if elapsed else 0.0,
+            "p50_ms": percentile(latencies, 0.50) * 1000,
+            "p99_ms": percentile(latencies, 0.99) * 1000,
+            "retries": sum(retries),
+            "truncation_retries": sum(truncation_retries),
+        }
+
+    def fill(self, payload, count):
+        with self.connect() as qmgr:
+            queue = WMQueue(qmgr, self.queue_name)
+            with queue:
+                for _ in range(count):
+                    queue.put(payload)
+
+    def drain(self):
+        with self.connect() as qmgr:
+            queue = WMQueue(qmgr, self.queue_name)
+            with queue:
+                for _ in queue.read_messages_while_waiting():
+                    pass
+
+
+def compare(results, baseline, tolerance) -> list:
+    """
+    Compares the results to a previous run.
+    :param tolerance: The fraction of msgs/sec that can be lost before it counts as a regression.
+    :return: list of human readable regressions, empty if there are none.
+    """
+    def key(result):
+        return result["scenario"], result["message_size"], result["batch_size"], result["threads"]
+
+    previous = {key(result): result for result in baseline["results"]}
+    regressions = []
+    for result in results:
+        old = previous.get(key(result))
+        if old and result["msgs_per_sec"] < old["msgs_per_sec"] * (1 - tolerance):
+            regressions.append("{0} size={1} batch={2} threads={3}: {4:.0f} -> {5:.0f} msgs/sec".format(
+                *key(result), old["msgs_per_sec"], result["msgs_per_sec"]))
+    return regressions
+
+
+def _csv(cast):
+    return lambda value: [cast(item) for item in value.split(",") if item]
+
+
+def _parse_args(argv):
+    parser = argparse.ArgumentParser(prog="python -m pymqiwm.benchmark", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", choices=["fake", "pymqi"], default="fake")
+    parser.add_argument("--qmgr", default="TEST")
+    parser.add_argument("--conn-info", default="localhost(1414)")
+    parser.add_argument("--channel", default=DEFAULT_CHANNEL)
+    parser.add_argument("--user")
+    parser.add_argument("--password")
+    parser.add_argument("--queue", default="PYMQIWM.BENCHMARK")
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="seconds of latency injected into every MQI call of the fake backend")
+    parser.add_argument("--messages", type=int, default=10000)
+    parser.add_argument("--sizes", type=_csv(int), default=[64, 1024, 16384])
+    parser.add_argument("--batch-sizes", type=_csv(int), default=[1, 10, 100])
+    parser.add_argument("--threads", type=_csv(int), default=[1, 4])
+    parser.add_argument("--scenarios", type=_csv(str), default=list(SCENARIOS))
+    parser.add_argument("--codecs", type=_csv(str), default=[],
+                        help="codecs to measure, for example raw,json,json+zlib,msgpack")
+    parser.add_argument("--output", help="path of the JSON report, defaults to stdout")
+    parser.add_argument("--compare", help="path of a previous JSON report, exits with 1 on a regression")
+    parser.add_argument("--tolerance", type=float, default=0.1)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = _parse_args(argv)
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        sys.exit("Unknown scenarios: " + ", ".join(sorted(unknown)))
+
+    if args.backend == "fake":
+        backend = FakeBackend(latency=args.latency)
+        backend.define_queue(args.qmgr, args.queue, max_depth=max(args.messages, 5000) * 2)
+    else:
+        backend = PymqiBackend()
+
+    def connect():
+        return WMQueueManager(args.qmgr, args.conn_info, channel=args.channel,
+                              user=args.user, password=args.password, backend=backend)
+
+    runner = BenchmarkRunner(connect, args.queue)
+    results = runner.run(args.scenarios, args.sizes, args.batch_sizes, args.threads, args.messages)
+    codec_results = []
+    for name in args.codecs:
+        for size in args.sizes:
+            try:
+                codec_results.append(benchmark_codec(name, size, args.messages, max(args.batch_sizes)))
+            except ImportError as e:
+                print("Skipping the {0} codec: {1}".format(name, e), file=sys.stderr)
+                break
+
+    for result in results:
+        print("{scenario:<30} size={message_size:<7} batch={batch_size:<5} threads={threads:<3} "
+              "{msgs_per_sec:>10.0f} msgs/s {bytes_per_sec:>14.0f} B/s "
+              "p50={p50_ms:.3f}ms p99={p99_ms:.3f}ms".format(**result), file=sys.stderr)
+    for result in codec_results:
+        print("codec {codec:<23} size={message_size:<7} encoded={encoded_size:<7} encode={encode_us:.2f}us "
+              "decode={decode_us:.2f}us decode_many={decode_many_us:.2f}us".format(**result), file=sys.stderr)
+
+    report = {
+        "timestamp": time.time(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "backend": args.backend,
+        "latency": args.latency if args.backend == "fake" else None,
+        "results": results,
+        "codecs": codec_results,
+    }
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(report, output, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+    if args.compare:
+        with open(args.compare) as baseline:
+            regressions = compare(results, json.load(baseline), args.tolerance)
+        for regression in regressions:
+            print("REGRESSION " + regression, file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
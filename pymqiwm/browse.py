@@ -0,0 +1,156 @@
+import threading
+import time
+from queue import Queue as _Buffer, Empty, Full
+from pymqiwm.message import BrowseCursor
+from pymqiwm.queue import WMQueue
+
+_DONE = object()
+
+
+class ParallelBrowser(object):
+    """
+
+        Browses a queue over several connections at once, every connection browses one partition of the messages,
+        and yields the messages of all the partitions as they arrive (not in queue order).
+
+        A partition is a GroupId (bytes), a selection string on the message properties (str, for example
+        "Region = 'EU'") or None for all the messages. The partitions are not checked against each other,
+        a message that is in two partitions is yielded twice and a message that is in none is not browsed.
+
+        Usage:
+            >>> def connect():
+            >>>     return WMQueueManager(name=..., conn_info=...)
+
+            >>> partitions = ["Region = 'EU'", "Region = 'US'", "Region = 'APAC'"]
+            >>> with ParallelBrowser(connect, "AUDIT", partitions) as browser:
+            >>>     for message in browser:
+            >>>         audit(message)
+            >>>         if browser.browsed % 10000 == 0:
+            >>>             print(browser.progress())
+            >>>             save(browser.saved_cursors())
+
+            >>> # after a crash, continue after the last messages that were yielded
+            >>> with ParallelBrowser(connect, "AUDIT", partitions, cursors=load()) as browser:
+            >>>     ...
+
+        `cursors` holds a `BrowseCursor` per partition that points to the last message of the partition
+        that was yielded, the messages that were already browsed but not yet yielded are browsed again on resume.
+
+    """
+
+    def __init__(self, connect, queue_name: str, partitions=(None,), cursors=None, max_length=None, prefetch=1000):
+        """
+        :param connect: A function that returns a new (not connected) `WMQueueManager`,
+                        the browser makes a connection per partition.
+        :param partitions: GroupIds, selection strings or None, one per connection.
+        :param cursors: Cursors to resume from, one per partition (`BrowseCursor` or the dict of `to_dict`).
+        :param prefetch: Max messages browsed ahead of the iteration, for all the partitions together.
+        """
+        partitions = list(partitions)
+        assert partitions, "There has to be at least one partition"
+        assert cursors is None or len(cursors) == len(partitions), "There has to be a cursor per partition"
+        assert prefetch > 0, "The prefetch has to be positive"
+        self.connect = connect
+        self.queue_name = queue_name
+        self.partitions = partitions
+        self.max_length = max_length
+        self.prefetch = prefetch
+        self.cursors = [BrowseCursor.from_dict(cursor) if isinstance(cursor, dict) else cursor
+                        for cursor in cursors] if cursors is not None else [BrowseCursor() for _ in partitions]
+        self.browsed = 0
+        self.depth = None
+        self.errors = []
+
+        self._started_positions = [cursor.position for cursor in self.cursors]
+        self._done = [False] * len(partitions)
+        self._buffer = _Buffer(prefetch)
+        self._stopping = threading.Event()
+        self._workers = []
+        self._started_at = None
+
+    def __enter__(self):
+        self._stopping.clear()
+        self._started_at = time.monotonic()
+        for index, partition in enumerate(self.partitions):
+            worker = threading.Thread(target=self._browse_partition,
+                                      args=(index, partition, self.cursors[index].copy()),
+                                      name="{0}-browse-{1}".format(self.queue_name, index), daemon=True)
+            worker.start()
+            self._workers.append(worker)
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._stopping.set()
+        for worker in self._workers:
+            while worker.is_alive():
+                self._drain()
+                worker.join(0.05)
+        self._workers = []
+        self._drain()
+
+    def __iter__(self):
+        assert self._workers, "The browser has to be started"
+        while not all(self._done):
+            index, message = self._buffer.get()
+            if message is _DONE:
+                self._done[index] = True
+                if self.errors:
+                    raise self.errors[0]
+                continue
+            self.cursors[index].advance(message.msg_id, message.put_date, message.put_time)
+            self.browsed += 1
+            yield message
+
+    def saved_cursors(self) -> list:
+        """ Returns the cursors as JSON serializable dicts, to pass as `cursors` when resuming """
+        return [cursor.to_dict() for cursor in self.cursors]
+
+    def progress(self) -> dict:
+        """
+        `browsed` counts the messages yielded since the browser started, `percent` counts the ones before
+        the cursors it resumed from too, out of the depth of the queue when it started.
+        """
+        elapsed = time.monotonic() - self._started_at if self._started_at is not None else 0
+        position = sum(cursor.position for cursor in self.cursors)
+        return {
+            "browsed": self.browsed,
+            "depth": self.depth,
+            "percent": 100.0 * position / self.depth if self.depth else None,
+            "msgs per second": self.browsed / elapsed if elapsed > 0 else None,
+            "partitions": [{"browsed": cursor.position - started, "position": cursor.position, "done": done}
+                           for cursor, started, done in zip(self.cursors, self._started_positions, self._done)],
+        }
+
+    def _browse_partition(self, index, partition, cursor):
+        group_id = partition if isinstance(partition, bytes) else None
+        selector = partition if isinstance(partition, str) else None
+        try:
+            with self.connect() as qmgr:
+                with WMQueue(qmgr, self.queue_name) as queue:
+                    if index == 0:
+                        self.depth = queue.depth()
+                    for message in queue.browse_messages(self.max_length, with_descriptor=True, cursor=cursor,
+                                                         group_id=group_id, selector=selector):
+                        if not self._hand_over((index, message)):
+                            return
+        except Exception as e:
+            self.errors.append(e)
+        finally:
+            self._hand_over((index, _DONE))
+
+    def _hand_over(self, item) -> bool:
+        """ Puts `item` in the buffer, returns False if the browser stopped while the buffer was full """
+        while not self._stopping.is_set():
+            try:
+                self._buffer.put(item, timeout=0.05)
+                return True
+            except Full:
+                pass
+        return False
+
+    def _drain(self):
+        while True:
+            try:
+                self._buffer.get_nowait()
+            except Empty:
+                return
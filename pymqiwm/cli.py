@@ -0,0 +1,207 @@
+"""
+A command line for the everyday operations on a queue manager, for cron jobs and shell scripts.
+
+Only the parts of pymqiwm (and pymqi) a command needs are imported, after the arguments were parsed,
+so `--help` and bad arguments return without loading pymqi. `--timings` prints to stderr how the run
+was spent: the CPU time of the interpreter before the command line ran, the import of pymqi and the
+wrapper, the connect, and the command.
+
+The password of `--user` is never an argument, where `ps` and the shell history would show it: it is read from
+the PYMQIWM_PASSWORD environment variable, from the first line of stdin with `--password-stdin`
+(the lines after it are the messages of `put`), or else asked for when stdin is a terminal.
+
+Usage:
+    python -m pymqiwm.cli --qmgr QM1 --conn-info "mq1(1414)" depth APP.IN APP.OUT
+    python -m pymqiwm.cli --qmgr QM1 --conn-info "mq1(1414)" browse APP.IN --limit 10 --descriptor
+    echo "hello" | python -m pymqiwm.cli --qmgr QM1 --conn-info "mq1(1414)" put APP.IN
+    python -m pymqiwm.cli --qmgr QM1 --conn-info "mq1(1414)" --user app --password-stdin depth APP.IN < secret
+    python -m pymqiwm.cli --qmgr QM1 --conn-info "mq1(1414)" --timings create APP.TEST --max-depth 10000
+    python -m pymqiwm.cli --qmgr QM1 --conn-info "mq1(1414)" delete APP.TEST --purge
+    python -m pymqiwm.cli --qmgr QM1 --conn-info "mq1(1414)" dump APP.IN app.in.dump
+    python -m pymqiwm.cli --qmgr QM1 --conn-info "mq1(1414)" restore app.in.dump APP.TEST --speed 1
+"""
+
+import argparse
+import getpass
+import os
+import sys
+import time
+
+PASSWORD_ENV = "PYMQIWM_PASSWORD"
+
+
+def _depth(qmgr, args):
+    from pymqiwm.queue import WMQueue
+    for name in args.queues:
+        with WMQueue(qmgr, name) as queue:
+            print("{0} {1}".format(name, queue.depth()))
+
+
+def _browse(qmgr, args):
+    from pymqiwm.queue import WMQueue
+    output = sys.stdout.buffer
+    with WMQueue(qmgr, args.queue) as queue:
+        for number, message in enumerate(queue.browse_messages(with_descriptor=args.descriptor)):
+            if args.limit is not None and number >= args.limit:
+                break
+            if args.descriptor:
+                output.write("{0} {1} {2} ".format(message.msg_id.hex(), message.put_date_time,
+                                                   len(message.body)).encode())
+                message = message.body
+            output.write(message + b"\n")
+    output.flush()
+
+
+def _put(qmgr, args):
+    from pymqiwm.queue import WMQueue
+    messages = [message.encode() for message in args.messages] if args.messages else \
+        [line.rstrip(b"\r\n") for line in sys.stdin.buffer]
+    with WMQueue(qmgr, args.queue) as queue:
+        if len(messages) == 1:
+            queue.put(messages[0])
+        else:
+            queue.put_many(messages)
+    print("Put {0} messages on {1}".format(len(messages), args.queue), file=sys.stderr)
+
+
+def _create(qmgr, args):
+    failed = {name: error for name, error in qmgr.create_local_queues(args.queues, args.max_depth).items()
+              if error is not None}
+    for name, error in failed.items():
+        print("Failed to create {0}: {1}".format(name, error), file=sys.stderr)
+    return 1 if failed else 0
+
+
+def _delete(qmgr, args):
+    from pymqiwm.mqi import MQMIError
+    failed = 0
+    for name in args.queues:
+        try:
+            qmgr.delete_queue(name, purge=args.purge)
+        except MQMIError as e:
+            print("Failed to delete {0}: {1}".format(name, e), file=sys.stderr)
+            failed += 1
+    return 1 if failed else 0
+
+
+def _dump(qmgr, args):
+    from pymqiwm.queue import WMQueue
+    from pymqiwm.snapshot import dump
+    with WMQueue(qmgr, args.queue) as queue:
+        written = dump(queue, args.path, destructive=args.destructive, limit=args.limit, append=args.append)
+    print("Dumped {0} messages of {1} to {2}".format(written, args.queue, args.path), file=sys.stderr)
+
+
+def _restore(qmgr, args):
+    from pymqiwm.queue import WMQueue
+    from pymqiwm.snapshot import restore
+    with WMQueue(qmgr, args.queue) as queue:
+        put = restore(args.path, queue, batch_size=args.batch_size, rate=args.rate, speed=args.speed,
+                      new_msg_ids=args.new_msg_ids)
+    print("Restored {0} messages of {1} to {2}".format(put, args.path, args.queue), file=sys.stderr)
+
+
+def _parse_args(argv):
+    parser = argparse.ArgumentParser(prog="python -m pymqiwm.cli", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--qmgr", required=True)
+    parser.add_argument("--conn-info", required=True, help='for example "mq1(1414)" or "mq1(1414),mq2(1414)"')
+    parser.add_argument("--channel", help="defaults to SYSTEM.DEF.SVRCONN")
+    parser.add_argument("--user")
+    parser.add_argument("--password-stdin", action="store_true",
+                        help="read the password from the first line of stdin, see {0} too".format(PASSWORD_ENV))
+    parser.add_argument("--timings", action="store_true", help="print where the time of the run went to stderr")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    depth = commands.add_parser("depth", help="print the current depth of queues")
+    depth.add_argument("queues", nargs="+")
+    depth.set_defaults(run=_depth)
+
+    browse = commands.add_parser("browse", help="print the messages of a queue without getting them")
+    browse.add_argument("queue")
+    browse.add_argument("--limit", type=int)
+    browse.add_argument("--descriptor", action="store_true", help="print the MsgId, put time and length first")
+    browse.set_defaults(run=_browse)
+
+    put = commands.add_parser("put", help="put messages, or every line of stdin when none are given")
+    put.add_argument("queue")
+    put.add_argument("messages", nargs="*")
+    put.set_defaults(run=_put)
+
+    create = commands.add_parser("create", help="create local queues")
+    create.add_argument("queues", nargs="+")
+    create.add_argument("--max-depth", type=int, default=5000)
+    create.set_defaults(run=_create)
+
+    delete = commands.add_parser("delete", help="delete queues")
+    delete.add_argument("queues", nargs="+")
+    delete.add_argument("--purge", action="store_true", help="delete them even if they have messages")
+    delete.set_defaults(run=_delete)
+
+    dump = commands.add_parser("dump", help="write the messages of a queue to a dump file")
+    dump.add_argument("queue")
+    dump.add_argument("path")
+    dump.add_argument("--destructive", action="store_true", help="get the messages instead of browsing them")
+    dump.add_argument("--limit", type=int)
+    dump.add_argument("--append", action="store_true", help="add the messages to an existing dump file")
+    dump.set_defaults(run=_dump)
+
+    restore = commands.add_parser("restore", help="put the messages of a dump file on a queue")
+    restore.add_argument("path")
+    restore.add_argument("queue")
+    restore.add_argument("--batch-size", type=int, default=100)
+    pace = restore.add_mutually_exclusive_group()
+    pace.add_argument("--rate", type=float, help="messages per second, as fast as possible by default")
+    pace.add_argument("--speed", type=float, help="the pace of the put times of the dump, 2 for twice as fast")
+    restore.add_argument("--new-msg-ids", action="store_true")
+    restore.set_defaults(run=_restore)
+    return parser.parse_args(argv)
+
+
+def _password(args):
+    """ The password of `--user`, from stdin, the environment, or a prompt on a terminal, None without one """
+    if args.password_stdin:
+        return sys.stdin.buffer.readline().rstrip(b"\r\n").decode()  # not sys.stdin, it would read ahead
+    password = os.environ.get(PASSWORD_ENV)
+    if password is None and args.user and sys.stdin.isatty():
+        password = getpass.getpass("Password of {0}: ".format(args.user))
+    return password
+
+
+def main(argv=None, backend=None):
+    """
+    :param backend: The backend of the connection, `PymqiBackend` by default, for example a `FakeBackend` in tests.
+    :return: The exit code, 1 if the command failed (the error is printed to stderr) or failed for one of the queues.
+    """
+    startup = time.process_time()
+    args = _parse_args(argv)
+    password = _password(args)
+
+    started = time.perf_counter()
+    from pymqiwm.mqi import MQMIError, PYIFError
+    from pymqiwm.queue_manager import WMQueueManager
+    imported = time.perf_counter()
+
+    options = {"user": args.user, "password": password, "backend": backend}
+    if args.channel:
+        options["channel"] = args.channel
+    code = 1
+    connected = None
+    try:
+        with WMQueueManager(args.qmgr, args.conn_info, **options) as qmgr:
+            connected = time.perf_counter()
+            code = args.run(qmgr, args) or 0
+    except (MQMIError, PYIFError, OSError, AssertionError) as e:  # the assertions check the arguments
+        print("{0} failed: {1}".format(args.command, e), file=sys.stderr)
+    finished = time.perf_counter()
+
+    if args.timings:
+        connect = "{0:.1f} ms".format((connected - imported) * 1000) if connected is not None else "failed"
+        print("startup {0:.1f} ms cpu, imports {1:.1f} ms, connect {2}, {3} {4:.1f} ms".format(
+            startup * 1000, (imported - started) * 1000, connect, args.command,
+            (finished - (connected or imported)) * 1000), file=sys.stderr)
+    return code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
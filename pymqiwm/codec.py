@@ -0,0 +1,190 @@
+import json
+import zlib
+from abc import ABC, abstractmethod
+from pymqiwm.mqi.CMQC import MQFMT_NONE, MQFMT_STRING
+
+# CodedCharSetId of UTF-8
+UTF8_CCSID = 1208
+
+
+class Codec(ABC):
+    """
+
+        Turns the objects put on a queue into message bodies and the bodies got back into objects,
+        and sets the MQMD Format (and CodedCharSetId for text) of the messages it encodes.
+
+        Usage:
+            >>> with WMQueue(qmgr, "ORDERS", codec="json") as queue:
+            >>>     queue.put({"id": 7, "total": 10.5})
+            >>>     order = queue.get()  # {'id': 7, 'total': 10.5}
+
+        A codec is given to `WMQueue` as an instance or as a name of `CODECS`, a name ending with "+zlib"
+        compresses the bodies of that codec, for example "json+zlib".
+        A codec implements `encode` and `decode`. `decode_many` decodes the bodies of a whole batch (`get_many`),
+        the codecs that can do it in a single call override it, and return exactly one object per body.
+
+    """
+
+    format = MQFMT_NONE
+    ccsid = None  # the CodedCharSetId of the bodies, None leaves the one of the MD
+
+    @abstractmethod
+    def encode(self, obj) -> bytes:
+        pass
+
+    @abstractmethod
+    def decode(self, body):
+        pass
+
+    def decode_many(self, bodies) -> list:
+        return [self.decode(body) for body in bodies]
+
+    def __repr__(self):
+        return "{0}()".format(type(self).__name__)
+
+
+class RawCodec(Codec):
+    """
+    Bytes in, bytes out without copies: a `memoryview` over a whole bytes object is put as that object,
+    and the bodies that are got are returned as a `memoryview`, so slicing them does not copy them.
+    pymqi only puts bytes, so any other buffer (bytearray, a partial view) is copied once.
+    """
+
+    def encode(self, obj) -> bytes:
+        if isinstance(obj, bytes):
+            return obj
+        if isinstance(obj, memoryview) and isinstance(obj.obj, bytes) and obj.nbytes == len(obj.obj):
+            return obj.obj
+        if isinstance(obj, str):
+            return obj.encode("utf-8")
+        return bytes(obj)
+
+    def decode(self, body):
+        return memoryview(body)
+
+
+class StringCodec(Codec):
+    """ str in, str out, the messages are MQSTR so the queue manager can convert them for other CCSIDs """
+
+    format = MQFMT_STRING
+
+    def __init__(self, encoding="utf-8", ccsid=UTF8_CCSID):
+        self.encoding = encoding
+        self.ccsid = ccsid
+
+    def encode(self, obj) -> bytes:
+        return obj.encode(self.encoding) if isinstance(obj, str) else bytes(obj)
+
+    def decode(self, body):
+        return body.decode(self.encoding)
+
+
+class JsonCodec(Codec):
+    """
+    JSON documents as UTF-8 MQSTR messages.
+    Every body is parsed on its own, joining the bodies of a batch into one array lets a body that is not
+    a single document (for example '"' next to '1],[2') pass for the documents of the bodies around it.
+    """
+
+    format = MQFMT_STRING
+    ccsid = UTF8_CCSID
+
+    def __init__(self, **dumps_kwargs):
+        dumps_kwargs.setdefault("separators", (",", ":"))
+        dumps_kwargs.setdefault("ensure_ascii", False)
+        self._dumps_kwargs = dumps_kwargs
+
+    def encode(self, obj) -> bytes:
+        return json.dumps(obj, **self._dumps_kwargs).encode("utf-8")
+
+    def decode(self, body):
+        return json.loads(body)
+
+
+class MsgpackCodec(Codec):
+    """
+    MessagePack, a compact binary encoding of the same types as JSON. Needs the `msgpack` package.
+    `decode_many` feeds the bodies of a batch one by one to a single `Unpacker`, without joining them,
+    and checks that every object ends where its body ends, otherwise (a body with two objects, an empty body)
+    it unpacks them one by one to raise the error of the body that is not a single object.
+    """
+
+    format = b"MSGPACK "
+
+    def __init__(self):
+        try:
+            import msgpack
+        except ImportError:
+            raise ImportError("MsgpackCodec needs the msgpack package, pip install msgpack")
+        self._msgpack = msgpack
+
+    def encode(self, obj) -> bytes:
+        return self._msgpack.packb(obj, use_bin_type=True)  # not a shared Packer, it is not thread safe
+
+    def decode(self, body):
+        return self._msgpack.unpackb(body, raw=False)
+
+    def decode_many(self, bodies) -> list:
+        # the buffer only holds the body that is being unpacked, the previous ones were consumed
+        unpacker = self._msgpack.Unpacker(raw=False, max_buffer_size=max(map(len, bodies), default=0) + 1)
+        objects = []
+        end = 0
+        try:
+            for body in bodies:
+                unpacker.feed(body)
+                end += len(body)
+                objects.append(unpacker.unpack())
+                if unpacker.tell() != end:  # the object started or ended in the body of another message
+                    break
+            else:
+                return objects
+        except (ValueError, self._msgpack.OutOfData):
+            pass
+        return [self.decode(body) for body in bodies]
+
+
+class CompressedCodec(Codec):
+    """
+    Compresses the bodies of another codec with zlib. The messages get their own format,
+    since the queue manager can't convert them, a reader needs the same codec to read them.
+    :param level: zlib level, 1 is the fastest and is usually enough for the repetitive payloads of messages.
+    """
+
+    format = b"ZLIB    "
+
+    def __init__(self, codec: Codec = None, level=1):
+        self.codec = codec if codec is not None else RawCodec()
+        self.level = level
+
+    def encode(self, obj) -> bytes:
+        return zlib.compress(self.codec.encode(obj), self.level)
+
+    def decode(self, body):
+        return self.codec.decode(zlib.decompress(body))
+
+    def decode_many(self, bodies) -> list:
+        return self.codec.decode_many([zlib.decompress(body) for body in bodies])
+
+    def __repr__(self):
+        return "CompressedCodec({0!r}, level={1})".format(self.codec, self.level)
+
+
+CODECS = {
+    "raw": RawCodec,
+    "string": StringCodec,
+    "json": JsonCodec,
+    "msgpack": MsgpackCodec,
+}
+
+
+def get_codec(codec):
+    """
+    Returns the codec for `codec`, which is a `Codec`, None (no codec), or a name of `CODECS`
+    optionally ending with "+zlib".
+    """
+    if codec is None or isinstance(codec, Codec):
+        return codec
+    name, _, compression = codec.partition("+")
+    assert name in CODECS, "Unknown codec {0!r}, the codecs are {1}".format(name, ", ".join(sorted(CODECS)))
+    assert compression in ("", "zlib"), "Unknown compression {0!r}, only zlib is supported".format(compression)
+    return CompressedCodec(CODECS[name]()) if compression else CODECS[name]()
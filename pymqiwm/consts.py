@@ -1,6 +1,17 @@
-DEFAULT_CHANNEL = "SYSTEM.DEF.SVRCONN"
-
-
+from pymqiwm.mqi.CMQC import (MQRC_CONNECTION_BROKEN, MQRC_Q_MGR_NOT_AVAILABLE, MQRC_HCONN_ERROR,
+                              MQRC_CONNECTION_STOPPING, MQRC_HOST_NOT_AVAILABLE, MQRC_CHANNEL_NOT_AVAILABLE,
+                              MQRC_STANDBY_Q_MGR)
 
+DEFAULT_CHANNEL = "SYSTEM.DEF.SVRCONN"
 
+# Reasons meaning the connection to the queue manager can't be used anymore and has to be made again.
+# The quiescing and stopping reasons of the queue manager are not in them, they are how FAIL_IF_QUIESCING asks
+# the application to stop, so they are raised to the caller instead of reconnecting (forever without a timeout).
+CONNECTION_BROKEN_REASONS = frozenset((
+    MQRC_CONNECTION_BROKEN, MQRC_Q_MGR_NOT_AVAILABLE, MQRC_HCONN_ERROR, MQRC_CONNECTION_STOPPING,
+))
 
+# Reasons a connect fails with while the queue manager (or its network) is down, a reconnect keeps trying after them
+RECONNECT_REASONS = CONNECTION_BROKEN_REASONS | frozenset((
+    MQRC_HOST_NOT_AVAILABLE, MQRC_CHANNEL_NOT_AVAILABLE, MQRC_STANDBY_Q_MGR,
+))
@@ -0,0 +1,326 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import suppress
+from pymqiwm.mqi import MQMIError
+from pymqiwm.mqi.CMQC import (MQRC_Q_MGR_QUIESCING, MQRC_Q_MGR_STOPPING, MQRC_CONNECTION_QUIESCING,
+                              MQRC_NO_MSG_AVAILABLE, MQGMO_SYNCPOINT)
+from pymqiwm.queue import WMQueue
+
+# Reasons a get fails with because of MQGMO_FAIL_IF_QUIESCING, they stop the getter without an error
+QUIESCING_REASONS = frozenset((MQRC_Q_MGR_QUIESCING, MQRC_Q_MGR_STOPPING, MQRC_CONNECTION_QUIESCING))
+
+_NO_MESSAGE = object()
+
+
+class _Counter(object):
+    __slots__ = ("count", "errors", "busy_seconds", "backouts", "poison")
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.busy_seconds = 0.0
+        self.backouts = 0  # units of work backed out because a handler raised
+        self.poison = 0  # messages moved to the backout queue
+
+
+class QueueConsumer(object):
+    """
+
+        Consumes a queue with several getter threads and handles the messages on a bounded worker pool.
+
+        Every getter thread makes its own connection with `connect` and reads with
+        `WMQueue.read_messages_while_waiting`, then hands the message to one of the `workers` threads
+        that call `handler(message)`. At most `max_in_flight` messages are got but not handled yet,
+        when the workers fall behind the getters stop getting, so messages stay on the queue.
+
+        Usage:
+            >>> def connect():
+            >>>     return WMQueueManager(name=..., conn_info=...)
+
+            >>> with QueueConsumer(connect, "DAVAY", handler=print, getters=2, workers=8) as consumer:
+            >>>     time.sleep(60)
+            >>>     print(consumer.stats())
+
+        Leaving the `with` (or calling `stop`) stops getting new messages and waits for the ones in flight,
+        `drain` does the same once the queue is empty.
+        The gets are made with MQGMO_FAIL_IF_QUIESCING, a quiescing queue manager stops the getters gracefully.
+        The messages are got outside of syncpoint, a message whose handler raised is counted as an error and dropped.
+        A getter that fails (its connection, a get) stops the whole consumer, `is_running` turns False and `stop`
+        or `drain` raise its error once the messages in flight were handled, the errors are kept in `errors`.
+
+        With `syncpoint=True` a getter gets up to `batch_size` messages in a unit of work, and commits it once
+        their handlers returned. If one of them raised, the unit of work is backed out and its messages are got
+        again one per unit of work, so only the failing message keeps being backed out while the others commit.
+        A message whose BackoutCount reached the BOTHRESH of the queue is moved to its BOQNAME queue
+        in the unit of work it was got in, without calling the handler, so bad input can't stall the consumer.
+        The queue needs both attributes in this mode, a message that always fails would be retried forever.
+
+    """
+
+    def __init__(self,
+                 connect,
+                 queue_name: str,
+                 handler,
+                 getters=1,
+                 workers=4,
+                 max_in_flight=100,
+                 seconds_wait_interval=1,
+                 max_length=None,
+                 depth_interval=5,
+                 codec=None,
+                 syncpoint=False,
+                 batch_size=10):
+        """
+        :param connect: A function that returns a new (not connected) `WMQueueManager`.
+        :param handler: A function that gets the body of every message.
+        :param seconds_wait_interval: How long a get waits for a message, this is also how long it takes
+                                      a getter to notice it has to stop. Has to be positive.
+        :param depth_interval: Seconds between checks of the queue depth for `stats`, None to never check.
+        :param codec: The codec the getters decode the messages with, so `handler` gets the objects.
+        :param syncpoint: Get under syncpoint, commit after the handlers and move poison messages, see above.
+        :param batch_size: Max messages in a unit of work with `syncpoint`.
+        """
+        assert getters > 0 and workers > 0 and max_in_flight > 0 and batch_size > 0, "The sizes have to be positive"
+        assert seconds_wait_interval > 0, "The getters have to wake up to check if they should stop"
+        self.connect = connect
+        self.queue_name = queue_name
+        self.handler = handler
+        self.getters = getters
+        self.workers = workers
+        self.max_in_flight = max_in_flight
+        self.seconds_wait_interval = seconds_wait_interval
+        self.max_length = max_length
+        self.depth_interval = depth_interval
+        self.codec = codec
+        self.syncpoint = syncpoint
+        self.batch_size = batch_size
+        self.errors = []
+
+        self._slots = threading.BoundedSemaphore(max_in_flight)
+        self._stopping = threading.Event()
+        self._draining = threading.Event()
+        self._lock = threading.Lock()
+        self._executor = None
+        self._threads = []
+        self._getter_counters = {}
+        self._worker_counters = {}
+        self._in_flight = 0
+        self._dispatch_lag_seconds = 0.0
+        self._depth = None
+        self._started = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        try:
+            self.stop()
+        except Exception:
+            if exc_type is None:  # the error of the block goes first
+                raise
+
+    @property
+    def is_running(self):
+        return any(thread.is_alive() for thread in self._threads)
+
+    def start(self):
+        assert not self.is_running, "The consumer is already running"
+        self._stopping.clear()
+        self._draining.clear()
+        self.errors = []
+        self._started = time.monotonic()
+        self._executor = ThreadPoolExecutor(max_workers=self.workers,
+                                            thread_name_prefix="{0}-worker".format(self.queue_name))
+        self._threads = [threading.Thread(target=self._get_messages, args=(number,),
+                                          name="{0}-getter_{1}".format(self.queue_name, number), daemon=True)
+                         for number in range(self.getters)]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self, timeout=None):
+        """
+        Stops getting new messages and waits until the messages in flight were handled.
+        Raises the error of the first getter that failed.
+        :param timeout: Max seconds to wait for the getters, the workers are always waited for.
+        """
+        self._stopping.set()
+        self._join(timeout)
+
+    def drain(self, timeout=None):
+        """
+        Keeps consuming until a get finds the queue empty, then stops like `stop`.
+        :param timeout: Max seconds to wait for the getters, None waits until the queue is empty.
+        """
+        self._draining.set()
+        self._join(timeout)
+
+    def _join(self, timeout):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for thread in self._threads:
+            thread.join(None if deadline is None else max(0, deadline - time.monotonic()))
+        self._stopping.set()
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+        if self.errors:
+            raise self.errors[0]
+
+    def stats(self) -> dict:
+        """
+        Returns a snapshot of the throughput of every getter and worker, and the lag of the consumer:
+        the last depth of the queue, the number of messages in flight, and the average time a message waited
+        for a free worker.
+        """
+        elapsed = time.monotonic() - self._started if self._started else 0.0
+        with self._lock:
+            received = sum(counter.count for counter in self._getter_counters.values())
+            handled = sum(counter.count for counter in self._worker_counters.values())
+            return {
+                "running": self.is_running,
+                "received": received,
+                "handled": handled,
+                "errors": sum(counter.errors for counter in self._worker_counters.values()),
+                "backouts": sum(counter.backouts for counter in self._getter_counters.values()),
+                "poison": sum(counter.poison for counter in self._getter_counters.values()),
+                "in flight": self._in_flight,
+                "depth": self._depth,
+                "dispatch lag ms": self._dispatch_lag_seconds / handled * 1000 if handled else 0.0,
+                "getters": {name: {"received": counter.count,
+                                   "msgs per sec": counter.count / elapsed if elapsed else 0.0}
+                            for name, counter in self._getter_counters.items()},
+                "workers": {name: {"handled": counter.count,
+                                   "errors": counter.errors,
+                                   "msgs per sec": counter.count / elapsed if elapsed else 0.0,
+                                   "busy %": counter.busy_seconds / elapsed * 100 if elapsed else 0.0}
+                            for name, counter in self._worker_counters.items()},
+            }
+
+    def _get_messages(self, number):
+        counter = _Counter()
+        with self._lock:
+            self._getter_counters[threading.current_thread().name] = counter
+        try:
+            with self.connect() as qmgr:
+                with WMQueue(qmgr, self.queue_name, codec=self.codec) as queue:
+                    consume = self._consume_in_units_of_work if self.syncpoint else self._consume
+                    consume(queue, counter, check_depth=number == 0 and self.depth_interval is not None)
+        except MQMIError as e:
+            if e.reason not in QUIESCING_REASONS:
+                self._failed(e)
+        except Exception as e:
+            self._failed(e)
+
+    def _failed(self, error):
+        """ A getter died, the others stop too, so the failure shows in `is_running` and is raised by `stop` """
+        self.errors.append(error)
+        self._stopping.set()
+
+    def _consume(self, queue, counter, check_depth):
+        next_depth_check = time.monotonic()
+        messages = None
+        while not self._stopping.is_set():
+            if check_depth and time.monotonic() >= next_depth_check:
+                self._depth = queue.depth()
+                next_depth_check = time.monotonic() + self.depth_interval
+
+            # Backpressure, a message is only got once there is a free slot for it
+            if not self._slots.acquire(timeout=self.seconds_wait_interval):
+                continue
+
+            if messages is None:
+                messages = queue.read_messages_while_waiting(self.seconds_wait_interval, self.max_length)
+            message = next(messages, _NO_MESSAGE)
+            if message is _NO_MESSAGE:  # no message arrived during the wait interval
+                self._slots.release()
+                messages = None
+                if self._draining.is_set():
+                    return
+                continue
+
+            counter.count += 1
+            with self._lock:
+                self._in_flight += 1
+            self._executor.submit(self._handle, message, time.monotonic())  # the worker frees the slot
+
+    def _consume_in_units_of_work(self, queue, counter, check_depth):
+        threshold, backout_queue = queue.backout_policy()
+        assert threshold and backout_queue, "The queue needs a BOTHRESH and a BOQNAME to consume it under syncpoint"
+        wait_gmo = queue._get_and_wait_gmo(wait_interval=int(self.seconds_wait_interval * 1000))
+        wait_gmo.Options |= MQGMO_SYNCPOINT
+        no_wait_gmo = queue._syncpoint_no_wait_gmo()
+        next_depth_check = time.monotonic()
+        isolating = 0  # messages still to get one per unit of work, after a unit of work was backed out
+        while not self._stopping.is_set():
+            if check_depth and time.monotonic() >= next_depth_check:
+                self._depth = queue.depth()
+                next_depth_check = time.monotonic() + self.depth_interval
+
+            size = 1 if isolating else self.batch_size
+            pending = 0  # messages got in the unit of work, handled or moved
+            futures = []
+            try:
+                while len(futures) < size and not self._stopping.is_set():
+                    # Backpressure, only the first message of a unit of work waits for a free slot
+                    if not self._slots.acquire(timeout=self.seconds_wait_interval if not pending else 0):
+                        break
+                    md = queue._get_message_descriptor()
+                    try:
+                        body = queue._get(self.max_length, md, no_wait_gmo if pending else wait_gmo)
+                    except MQMIError as e:
+                        self._slots.release()
+                        if e.reason != MQRC_NO_MSG_AVAILABLE:
+                            raise
+                        break
+                    pending += 1
+                    if queue._is_poison(md):
+                        queue._move_to_backout_queue(body, md)
+                        counter.poison += 1
+                        self._slots.release()
+                        continue
+                    counter.count += 1
+                    with self._lock:
+                        self._in_flight += 1
+                    # decoded by the worker, a body that can't be decoded fails like its handler raised
+                    futures.append(self._executor.submit(self._handle, body, time.monotonic(), queue.codec))
+
+                handled = [future.result() for future in futures]
+            except BaseException:
+                if pending:
+                    with suppress(Exception):  # the connection may be gone, which backs it out too
+                        queue.qmgr.backout()
+                raise
+
+            if not pending:  # no message arrived during the wait interval
+                if self._draining.is_set():
+                    return
+                continue
+            if all(handled):
+                queue.qmgr.commit()
+                isolating = max(0, isolating - pending)
+            else:
+                queue.qmgr.backout()
+                counter.backouts += 1
+                isolating = max(isolating, len(futures))
+
+    def _handle(self, message, got_at, codec=None) -> bool:
+        start = time.monotonic()
+        name = threading.current_thread().name
+        counter = self._worker_counters.get(name)
+        if counter is None:
+            with self._lock:
+                counter = self._worker_counters.setdefault(name, _Counter())
+        try:
+            self.handler(message if codec is None else codec.decode(message))
+            return True
+        except Exception:
+            counter.errors += 1
+            return False
+        finally:
+            end = time.monotonic()
+            with self._lock:
+                counter.count += 1
+                counter.busy_seconds += end - start
+                self._dispatch_lag_seconds += start - got_at
+                self._in_flight -= 1
+            self._slots.release()
@@ -0,0 +1,1060 @@
+import operator
+import re
+import struct
+import threading
+import time
+from bisect import bisect_right, insort
+from collections import Counter, deque
+from contextlib import contextmanager
+from fnmatch import fnmatchcase
+from itertools import count
+from pymqiwm.mqi import MQMIError, PYIFError
+from pymqiwm.mqi import MD, GMO, PMO
+from pymqiwm.mqi.CMQC import (
+    MQCC_OK, MQCC_WARNING, MQCC_FAILED, MQRC_NONE, MQRC_NO_MSG_AVAILABLE,
+    MQRC_NOT_OPEN_FOR_INPUT, MQRC_NOT_OPEN_FOR_OUTPUT, MQRC_NOT_OPEN_FOR_BROWSE,
+    MQRC_NOT_OPEN_FOR_INQUIRE, MQRC_TRUNCATED_MSG_FAILED, MQRC_TRUNCATED_MSG_ACCEPTED,
+    MQRC_UNKNOWN_OBJECT_NAME, MQRC_Q_FULL, MQRC_MSG_TOO_BIG_FOR_Q, MQRC_Q_NOT_EMPTY,
+    MQRC_OBJECT_IN_USE, MQRC_Q_MGR_QUIESCING, MQRC_CONNECTION_BROKEN, MQRC_NO_MSG_UNDER_CURSOR,
+    MQRC_SELECTION_NOT_AVAILABLE, MQRC_SUB_NAME_ERROR, MQRC_SUB_ALREADY_EXISTS, MQRC_SUBSCRIPTION_IN_USE,
+    MQRC_NO_SUBSCRIPTION, MQRC_HOBJ_ERROR, MQRC_HOST_NOT_AVAILABLE,
+    MQOO_INPUT_AS_Q_DEF, MQOO_INPUT_SHARED, MQOO_INPUT_EXCLUSIVE, MQOO_BROWSE,
+    MQOO_OUTPUT, MQOO_INQUIRE, MQOO_READ_AHEAD, MQCO_NONE, MQCO_REMOVE_SUB,
+    MQSO_CREATE, MQSO_RESUME, MQSO_DURABLE, MQSO_NON_DURABLE, MQSO_MANAGED,
+    MQGMO_WAIT, MQGMO_SYNCPOINT, MQGMO_SYNCPOINT_IF_PERSISTENT, MQGMO_BROWSE_FIRST,
+    MQGMO_BROWSE_NEXT, MQGMO_BROWSE_MSG_UNDER_CURSOR, MQGMO_MSG_UNDER_CURSOR,
+    MQGMO_ACCEPT_TRUNCATED_MSG, MQGMO_FAIL_IF_QUIESCING,
+    MQPMO_SYNCPOINT, MQPMO_NEW_MSG_ID, MQPMO_NEW_CORREL_ID, MQPMO_FAIL_IF_QUIESCING, MQPMO_ASYNC_RESPONSE,
+    MQPMO_LOGICAL_ORDER, MQGMO_LOGICAL_ORDER, MQGMO_ALL_MSGS_AVAILABLE, MQMF_MSG_IN_GROUP, MQMF_LAST_MSG_IN_GROUP,
+    MQRC_OPTIONS_ERROR, MQRC_BACKED_OUT,
+    MQMO_MATCH_MSG_ID, MQMO_MATCH_CORREL_ID, MQMO_MATCH_GROUP_ID,
+    MQWI_UNLIMITED, MQMI_NONE, MQCI_NONE, MQGI_NONE, MQFMT_NONE, MQFMT_STRING,
+    MQPER_PERSISTENT, MQPER_NOT_PERSISTENT, MQPER_PERSISTENCE_AS_Q_DEF,
+    MQQT_LOCAL, MQQT_ALL, MQ_Q_NAME_LENGTH, MQ_CHANNEL_NAME_LENGTH,
+    MQCA_Q_NAME, MQIA_Q_TYPE, MQIA_CURRENT_Q_DEPTH, MQIA_MAX_Q_DEPTH, MQIA_MAX_MSG_LENGTH,
+    MQIA_DEF_PERSISTENCE, MQIA_BACKOUT_THRESHOLD, MQCA_BACKOUT_REQ_Q_NAME,
+    MQIA_OPEN_INPUT_COUNT, MQIA_OPEN_OUTPUT_COUNT, MQIA_HIGH_Q_DEPTH,
+    MQIA_MSG_ENQ_COUNT, MQIA_MSG_DEQ_COUNT, MQIA_TIME_SINCE_RESET
+)
+from pymqiwm.mqi.CMQCFC import (MQCACH_CHANNEL_NAME, MQIACF_PURGE, MQPO_YES,
+                                MQRCCF_OBJECT_ALREADY_EXISTS, MQIACF_UNCOMMITTED_MSGS, MQIACF_OLDEST_MSG_AGE)
+from pymqiwm.consts import DEFAULT_CHANNEL
+
+_INPUT_OPTIONS = MQOO_INPUT_AS_Q_DEF | MQOO_INPUT_SHARED | MQOO_INPUT_EXCLUSIVE
+_BROWSE_OPTIONS = MQGMO_BROWSE_FIRST | MQGMO_BROWSE_NEXT | MQGMO_BROWSE_MSG_UNDER_CURSOR
+_DEFAULT_CHANNELS = (DEFAULT_CHANNEL, "SYSTEM.DEF.SENDER", "SYSTEM.DEF.RECEIVER")
+_NO_ROUND_TRIP = frozenset(("MQPUT_ASYNC", "MQGET_READ_AHEAD"))  # calls that return without waiting for the server
+_IN_GROUP = MQMF_MSG_IN_GROUP | MQMF_LAST_MSG_IN_GROUP
+
+
+def _to_str(value) -> str:
+    """ Normalizes a queue/channel name given as str, bytes or an OD object """
+    value = getattr(value, "ObjectName", value)
+    if isinstance(value, bytes):
+        value = value.decode()
+    return value.strip(" \0")
+
+
+def _padded(name: str, length: int) -> bytes:
+    """ Returns a name the way MQ returns it, blank padded to the field length """
+    return name.encode().ljust(length)
+
+
+def _failed(reason, comp=MQCC_FAILED):
+    return MQMIError(comp, reason)
+
+
+def _fill_md(backend, md, pmo, def_persistence, qmgr_name):
+    """ Sets the MD fields that the queue manager sets on put """
+    if pmo.Options & MQPMO_NEW_MSG_ID or md.MsgId in (b"", MQMI_NONE):
+        md.MsgId = backend._new_msg_id(qmgr_name)
+    if pmo.Options & MQPMO_NEW_CORREL_ID:
+        md.CorrelId = backend._new_msg_id(qmgr_name)
+    md.CorrelId = md.CorrelId.ljust(len(MQCI_NONE), b"\0")
+    md.GroupId = md.GroupId.ljust(len(MQGI_NONE), b"\0")
+    md.Format = md.Format or MQFMT_NONE
+    if md.Persistence == MQPER_PERSISTENCE_AS_Q_DEF:
+        md.Persistence = def_persistence
+    md.BackoutCount = 0
+    now = time.time()
+    md.PutDate = time.strftime("%Y%m%d", time.gmtime(now)).encode()
+    md.PutTime = (time.strftime("%H%M%S", time.gmtime(now)) + "%02d" % int(now % 1 * 100)).encode()
+
+
+_COMPARISON = re.compile(r"^Root\.MQMD\.(\w+)\s*(<>|<=|>=|=|<|>)\s*('(?:[^']|'')*'|-?\d+)$")
+_OPERATORS = {"=": operator.eq, "<>": operator.ne, "<": operator.lt, ">": operator.gt, "<=": operator.le,
+              ">=": operator.ge}
+
+
+def _selector(selection: str):
+    """
+    Returns a function that tells if the MD dict of a message matches a selection string,
+    or None for a selection string the fake can't evaluate.
+    The fake messages have no properties, only comparisons of MQMD fields to a number or a 'string' literal
+    ("Root.MQMD.Priority >= 5", "Root.MQMD.Format = 'MQSTR'") joined by AND and OR are supported.
+    """
+    fields = MD().get()
+    alternatives = []
+    for alternative in re.split(r"\s+OR\s+", selection.strip(), flags=re.IGNORECASE):
+        comparisons = []
+        for comparison in re.split(r"\s+AND\s+", alternative, flags=re.IGNORECASE):
+            parsed = _COMPARISON.match(comparison.strip())
+            if parsed is None or parsed.group(1) not in fields:
+                return None
+            field, compare, literal = parsed.groups()
+            if literal.startswith("'") != isinstance(fields[field], bytes):
+                return None
+            if literal.startswith("'"):
+                value = literal[1:-1].replace("''", "'")
+                comparisons.append(lambda md, f=field, c=compare, v=value: _OPERATORS[c](_to_str(md[f]), v))
+            else:
+                comparisons.append(lambda md, f=field, c=compare, v=int(literal): _OPERATORS[c](md[f], v))
+        alternatives.append(comparisons)
+    return lambda md: any(all(comparison(md) for comparison in comparisons) for comparisons in alternatives)
+
+
+def _topic_matches(pattern: str, topic: str) -> bool:
+    """ Matches a topic string against a subscription with the "#" (any levels) and "+" (one level) wildcards """
+    patterns, levels = pattern.split("/"), topic.split("/")
+    for index, part in enumerate(patterns):
+        if part == "#":
+            return True
+        if index >= len(levels) or part not in ("+", levels[index]):
+            return False
+    return len(patterns) == len(levels)
+
+
+class _FakeMessage(object):
+    __slots__ = ("seq", "md", "data", "put_at")
+
+    def __init__(self, seq, md, data):
+        self.seq = seq
+        self.md = md
+        self.data = data
+        self.put_at = time.time()
+
+
+class _FakeQueueState(object):
+    """
+    The server side of a local queue.
+    Messages are kept in FIFO order by their sequence number, priorities are ignored.
+    Every access to the messages is done while holding `condition`.
+    """
+
+    def __init__(self, name, max_depth=5000, max_msg_length=4194304,
+                 def_persistence=MQPER_NOT_PERSISTENT, backout_threshold=0, backout_queue=""):
+        self.name = name
+        self.max_depth = max_depth
+        self.max_msg_length = max_msg_length
+        self.def_persistence = def_persistence
+        self.backout_threshold = backout_threshold
+        self.backout_queue = backout_queue
+        self.condition = threading.Condition()
+        self.seqs = []
+        self.messages = {}
+        self.uncommitted = 0
+        self.open_input_count = 0
+        self.open_output_count = 0
+        self.enq_count = 0
+        self.deq_count = 0
+        self.high_depth = 0
+        self.reset_time = time.time()
+
+    @property
+    def depth(self):
+        """ Like MQ, the depth includes the messages that are part of uncommitted units of work """
+        return len(self.seqs) + self.uncommitted
+
+    def add(self, msg):
+        insort(self.seqs, msg.seq)
+        self.messages[msg.seq] = msg
+        self.high_depth = max(self.high_depth, self.depth)
+        self.condition.notify_all()
+
+    def remove(self, msg):
+        del self.seqs[bisect_right(self.seqs, msg.seq) - 1]
+        del self.messages[msg.seq]
+
+    def find(self, after=0, match=None, select=None):
+        """
+        Returns the first visible message with a sequence number higher than `after`.
+        :param after: The sequence number to start after, 0 means the head of the queue.
+        :param match: An optional dict of MD field name to the value it has to be equal to.
+        :param select: An optional function of the MD dict that tells if the message is selected.
+        """
+        index = bisect_right(self.seqs, after) if after else 0
+        if not match and select is None:
+            return self.messages[self.seqs[index]] if index < len(self.seqs) else None
+        for seq in self.seqs[index:]:
+            msg = self.messages[seq]
+            if all(msg.md[field] == value for field, value in match.items()) and (select is None or select(msg.md)):
+                return msg
+        return None
+
+    def attributes(self) -> dict:
+        return {
+            MQCA_Q_NAME: _padded(self.name, MQ_Q_NAME_LENGTH),
+            MQIA_Q_TYPE: MQQT_LOCAL,
+            MQIA_CURRENT_Q_DEPTH: self.depth,
+            MQIA_MAX_Q_DEPTH: self.max_depth,
+            MQIA_MAX_MSG_LENGTH: self.max_msg_length,
+            MQIA_DEF_PERSISTENCE: self.def_persistence,
+            MQIA_BACKOUT_THRESHOLD: self.backout_threshold,
+            MQCA_BACKOUT_REQ_Q_NAME: _padded(self.backout_queue, MQ_Q_NAME_LENGTH),
+            MQIA_OPEN_INPUT_COUNT: self.open_input_count,
+            MQIA_OPEN_OUTPUT_COUNT: self.open_output_count,
+        }
+
+
+class _FakeBroker(object):
+    """ The server side of a queue manager, shared by all the connections made to it """
+
+    def __init__(self, name):
+        self.name = name
+        self.lock = threading.Lock()
+        self.queues = {}
+        self.channels = list(_DEFAULT_CHANNELS)
+        self.subscriptions = {}
+        self.quiescing = False
+        self.epoch = 0  # connections made before the last `FakeBackend.break_connections` are broken
+
+    def queue(self, name) -> _FakeQueueState:
+        try:
+            return self.queues[name]
+        except KeyError:
+            raise _failed(MQRC_UNKNOWN_OBJECT_NAME)
+
+    def wake_all(self):
+        """ Wakes every get that is waiting for a message so it can re-check the connection state """
+        for state in list(self.queues.values()):
+            with state.condition:
+                state.condition.notify_all()
+
+
+class FakeBackend(object):
+    """
+
+        An in-memory, thread-safe stand-in for a queue manager.
+        Can be passed to `WMQueueManager` instead of the default `PymqiBackend`
+        for testing and benchmarking without a live MQ server.
+
+        Usage:
+
+            >>> backend = FakeBackend(latency=0.0005)
+            >>> backend.define_queue("TEST", "DAVAY")
+            >>> qmgr = WMQueueManager(name="TEST", conn_info="localhost(1414)", backend=backend)
+
+        The objects it creates behave like their pymqi counterparts, including the deferred open,
+        the MQRC reason codes, the GMO wait semantics, syncpoint and the truncation retry of `Queue.get`.
+
+        :param latency: Seconds to sleep on every MQI call, to reproduce a network round trip.
+                        A put with MQPMO_ASYNC_RESPONSE (counted as "MQPUT_ASYNC") does not wait for it.
+        :param latencies: Optional per call overrides, for example {"MQGET": 0.001, "MQCMD_CREATE_Q": 0.01}.
+        :param async_put: False to reproduce a server that rejects MQPMO_ASYNC_RESPONSE with MQRC_OPTIONS_ERROR.
+        :param read_ahead: Max number of non-persistent messages sent ahead to a queue opened with MQOO_READ_AHEAD,
+                           the gets served from them are counted as "MQGET_READ_AHEAD" and have no latency.
+
+        The number of calls made for every verb is counted in `calls`.
+        Topic objects can't be defined, a topic name is used as the first levels of the topic string.
+        The messages have no properties, a selection string can only compare MQMD fields ("Root.MQMD.Priority > 4").
+        It needs neither an MQ server nor pymqi: without pymqi (its C extension is built against the MQ client)
+        the structures, exceptions and constants come from the pure-Python stand-ins of `pymqiwm.mqi`.
+
+    """
+
+    def __init__(self, latency=0.0, latencies=None, async_put=True, read_ahead=64):
+        self.latency = latency
+        self.latencies = dict(latencies or {})
+        self.async_put = async_put
+        self.read_ahead = read_ahead
+        self.unavailable_hosts = set()
+        self.calls = Counter()
+        self._calls_lock = threading.Lock()
+        self._brokers = {}
+        self._brokers_lock = threading.Lock()
+        self._msg_ids = count(1)
+
+    def queue_manager(self):
+        return FakeQueueManager(self)
+
+    def queue(self, qmgr, name):
+        return FakeQueue(qmgr, name)
+
+    def pcf(self, qmgr):
+        return FakePCFExecute(qmgr)
+
+    def topic(self, qmgr, topic_string=None, topic_name=None):
+        return FakeTopic(qmgr, topic_name, topic_string)
+
+    def subscription(self, qmgr):
+        return FakeSubscription(qmgr)
+
+    def async_put_status(self, qmgr):
+        return qmgr.stat()
+
+    def broker(self, qmgr_name) -> _FakeBroker:
+        """ Returns the server side of the queue manager, creating it on first use """
+        qmgr_name = _to_str(qmgr_name)
+        with self._brokers_lock:
+            if qmgr_name not in self._brokers:
+                self._brokers[qmgr_name] = _FakeBroker(qmgr_name)
+            return self._brokers[qmgr_name]
+
+    def define_queue(self, qmgr_name, name, **attributes):
+        """
+        Defines a local queue, does nothing if it already exists.
+        :param qmgr_name: The name of the queue manager that holds the queue.
+        :param name: The name of the queue.
+        :param attributes: max_depth, max_msg_length, def_persistence, backout_threshold, backout_queue.
+        """
+        broker = self.broker(qmgr_name)
+        with broker.lock:
+            if name not in broker.queues:
+                broker.queues[name] = _FakeQueueState(name, **attributes)
+
+    def quiesce(self, qmgr_name, quiescing=True):
+        """ Marks the queue manager as quiescing, calls made with FAIL_IF_QUIESCING will fail """
+        broker = self.broker(qmgr_name)
+        broker.quiescing = quiescing
+        broker.wake_all()
+
+    def break_connections(self, qmgr_name):
+        """
+        Breaks every connection currently made to the queue manager, like a network failure would.
+        Their next call fails with MQRC_CONNECTION_BROKEN and their units of work are backed out,
+        new connections work normally.
+        """
+        broker = self.broker(qmgr_name)
+        broker.epoch += 1
+        broker.wake_all()
+
+    def set_host_available(self, host, available=True):
+        """
+        Makes the connects to `host` (as written in conn_info, "host(port)") fail with MQRC_HOST_NOT_AVAILABLE,
+        a connect with several hosts succeeds as long as one of them is available.
+        """
+        if available:
+            self.unavailable_hosts.discard(host)
+        else:
+            self.unavailable_hosts.add(host)
+
+    def reset_calls(self):
+        with self._calls_lock:
+            self.calls.clear()
+
+    def _record(self, verb):
+        with self._calls_lock:
+            self.calls[verb] += 1
+        delay = self.latencies.get(verb, 0.0 if verb in _NO_ROUND_TRIP else self.latency)
+        if delay:
+            time.sleep(delay)
+
+    def _new_msg_id(self, qmgr_name) -> bytes:
+        """ Builds a unique message id the way MQ does, "AMQ " + queue manager name + a counter """
+        return b"AMQ " + qmgr_name.encode()[:12].ljust(12) + struct.pack(">Q", next(self._msg_ids))
+
+
+class FakeQueueManager(object):
+    """
+    The fake counterpart of `pymqi.QueueManager`.
+    Calls made on the same connection are serialized like with MQCNO_HANDLE_SHARE_BLOCK.
+    """
+
+    def __init__(self, backend: FakeBackend):
+        self.backend = backend
+        self.broker = None
+        self._epoch = 0
+        self._lock = threading.RLock()
+        self._uow_puts = []
+        self._uow_gets = []
+        self._uow_groups = {}  # handle to the group positions it had when the unit of work began
+        self._uow_failed = False
+        self._async_status = self._no_async_status()
+
+    @property
+    def is_connected(self):
+        return self.broker is not None and not self.is_broken
+
+    @property
+    def is_broken(self):
+        return self.broker is not None and self._epoch != self.broker.epoch
+
+    def connect(self, name):
+        self.connect_with_options(name)
+
+    def connect_with_options(self, name, *args, **kwargs):
+        cd = kwargs.get("cd")
+        hosts = [host.strip() for host in _to_str(cd.ConnectionName).split(",")] if cd is not None else []
+        with self._lock:
+            self.backend._record("MQCONNX")
+            if hosts and all(host in self.backend.unavailable_hosts for host in hosts):
+                raise _failed(MQRC_HOST_NOT_AVAILABLE)
+            self._backout()  # left over from a broken connection
+            self.broker = self.backend.broker(name)
+            self._epoch = self.broker.epoch
+
+    def disconnect(self):
+        if self.broker is None:
+            raise PYIFError("not connected")
+        with self._lock:
+            self.backend._record("MQDISC")
+            self._backout()  # an uncommitted unit of work is backed out on a normal disconnect
+            self.broker = None
+
+    def get_handle(self):
+        if self.broker is None:
+            raise PYIFError("not connected")
+        return id(self)
+
+    getHandle = get_handle
+
+    @contextmanager
+    def _verb(self, verb):
+        """ Runs an MQI call on the connection, the call blocks other threads using the same connection """
+        self.get_handle()
+        with self._lock:
+            self.backend._record(verb)
+            if self.is_broken:
+                self._backout()
+                raise _failed(MQRC_CONNECTION_BROKEN)
+            yield self.broker
+
+    def begin(self):
+        with self._verb("MQBEGIN"):
+            pass
+
+    def commit(self):
+        with self._verb("MQCMIT"):
+            if self._uow_failed:  # an asynchronous put of the unit of work failed
+                self._backout()
+                raise _failed(MQRC_BACKED_OUT)
+            puts, self._uow_puts = self._uow_puts, []
+            gets, self._uow_gets = self._uow_gets, []
+            self._uow_groups = {}
+            for state, msg in puts:
+                with state.condition:
+                    state.uncommitted -= 1
+                    state.enq_count += 1
+                    state.add(msg)
+            for state, msg in gets:
+                with state.condition:
+                    state.uncommitted -= 1
+                    state.deq_count += 1
+
+    def backout(self):
+        with self._verb("MQBACK"):
+            self._backout()
+
+    def stat(self) -> dict:
+        """
+        Returns the results of the asynchronous puts since the previous call, like MQSTAT(MQSTAT_TYPE_ASYNC_ERROR).
+        """
+        with self._verb("MQSTAT"):
+            status, self._async_status = self._async_status, self._no_async_status()
+        return status
+
+    def _no_async_status(self) -> dict:
+        return {"success": 0, "warning": 0, "failure": 0, "reason": MQRC_NONE}
+
+    def _async_put_done(self, reason=MQRC_NONE, syncpoint=False):
+        status = self._async_status
+        if reason == MQRC_NONE:
+            status["success"] += 1
+            return
+        status["failure"] += 1
+        if status["reason"] == MQRC_NONE:
+            status["reason"] = reason  # MQSTAT returns the first error
+        if syncpoint:
+            self._uow_failed = True
+
+    def _backout(self):
+        self._uow_failed = False
+        puts, self._uow_puts = self._uow_puts, []
+        gets, self._uow_gets = self._uow_gets, []
+        groups, self._uow_groups = self._uow_groups, {}
+        for queue, (put_group, get_group) in groups.items():
+            queue._put_group, queue._get_group = put_group, get_group  # like MQ, the group positions are restored
+        for state, msg in puts:
+            with state.condition:
+                state.uncommitted -= 1
+        for state, msg in gets:
+            with state.condition:
+                state.uncommitted -= 1
+                msg.md["BackoutCount"] += 1
+                state.add(msg)  # back to its original position in the queue
+
+    def _enqueue(self, state, stored, syncpoint):
+        """ Adds a message to a queue, or to the unit of work of the connection """
+        with state.condition:
+            if len(stored.data) > state.max_msg_length:
+                raise _failed(MQRC_MSG_TOO_BIG_FOR_Q)
+            if state.depth >= state.max_depth:
+                raise _failed(MQRC_Q_FULL)
+            stored.seq = next(self.backend._msg_ids)
+            if syncpoint:
+                state.uncommitted += 1
+                self._uow_puts.append((state, stored))
+            else:
+                state.enq_count += 1
+                state.add(stored)
+
+    def put1(self, q_desc, msg, *opts):
+        queue = FakeQueue(self, q_desc)
+        queue.put(msg, *opts)
+        queue.close()
+
+
+class FakeQueue(object):
+    """ The fake counterpart of `pymqi.Queue`, the open is deferred the same way """
+
+    def __init__(self, qmgr: FakeQueueManager, *opts):
+        self._qmgr = qmgr
+        self._name = None
+        self._state = None
+        self._open_opts = 0
+        self._cursor = 0
+        self._select = None  # the selection string of the open, see `_selector`
+        self._put_group = None  # (GroupId, MsgSeqNumber) of the last message put in logical order
+        self._get_group = None  # (GroupId, MsgSeqNumber) of the next message to get in logical order
+        if len(opts) > 2:
+            raise TypeError("Too many args")
+        if opts:
+            self._name = _to_str(opts[0])
+        if len(opts) == 2:
+            self._real_open(opts[1])
+
+    def _real_open(self, open_opts):
+        if self._name is None:
+            raise PYIFError("The Queue Descriptor has not been set.")
+        with self._qmgr._verb("MQOPEN") as broker:
+            state = broker.queue(self._name)
+            with state.condition:
+                if open_opts & _INPUT_OPTIONS:
+                    state.open_input_count += 1
+                if open_opts & MQOO_OUTPUT:
+                    state.open_output_count += 1
+        self._state = state
+        self._open_opts = open_opts
+        self._cursor = 0
+        # the messages the server sent ahead of the gets, lost on close like with the real client
+        self._read_ahead = deque() if open_opts & MQOO_READ_AHEAD else None
+
+    def open(self, q_desc, *opts):
+        if len(opts) > 1:
+            raise TypeError("Too many args")
+        if self._state is not None:
+            raise PYIFError("The Queue is already open")
+        if getattr(q_desc, "SelectionStringVSLength", 0):
+            self._select = _selector(_to_str(q_desc.get_vs("SelectionString")))
+            if self._select is None:
+                raise _failed(MQRC_SELECTION_NOT_AVAILABLE)
+        self._name = _to_str(q_desc)
+        if opts:
+            self._real_open(opts[0])
+
+    def close(self, options=MQCO_NONE):
+        if self._state is None:
+            raise PYIFError("not open")
+        state = self._state
+        with self._qmgr._verb("MQCLOSE"):
+            with state.condition:
+                if self._open_opts & _INPUT_OPTIONS:
+                    state.open_input_count -= 1
+                if self._open_opts & MQOO_OUTPUT:
+                    state.open_output_count -= 1
+        self._state = self._name = self._select = None
+        self._open_opts = 0
+
+    def get_handle(self):
+        return id(self) if self._state is not None else None
+
+    def inquire(self, attribute):
+        if self._state is None:
+            self._real_open(MQOO_INQUIRE)
+        with self._qmgr._verb("MQINQ"):
+            if not self._open_opts & MQOO_INQUIRE:
+                raise _failed(MQRC_NOT_OPEN_FOR_INQUIRE)
+            with self._state.condition:
+                attributes = self._state.attributes()
+        return attributes[attribute]
+
+    def put(self, msg, *opts):
+        md, pmo = self._common_args(*opts)
+        if not isinstance(msg, bytes):
+            if isinstance(msg, str):
+                msg = msg.encode("utf-8")
+                md.Format = MQFMT_STRING
+            else:
+                raise TypeError("Message type is {0}. Convert to bytes.".format(type(msg)))
+        if pmo is None:
+            pmo = PMO()
+
+        if self._state is None:
+            self._real_open(MQOO_OUTPUT)
+
+        asynchronous = pmo.Options & MQPMO_ASYNC_RESPONSE
+        if asynchronous and not self._qmgr.backend.async_put:
+            with self._qmgr._verb("MQPUT"):
+                raise _failed(MQRC_OPTIONS_ERROR)
+
+        with self._qmgr._verb("MQPUT_ASYNC" if asynchronous else "MQPUT") as broker:
+            try:
+                self._mqput(broker, md, pmo, msg)
+            except MQMIError as e:
+                if not asynchronous:
+                    raise
+                # the error is only reported by MQSTAT, or by the commit of the unit of work
+                self._qmgr._async_put_done(e.reason, pmo.Options & MQPMO_SYNCPOINT)
+            else:
+                if asynchronous:
+                    self._qmgr._async_put_done()
+
+    def _mqput(self, broker, md, pmo, msg):
+        if not self._open_opts & MQOO_OUTPUT:
+            raise _failed(MQRC_NOT_OPEN_FOR_OUTPUT)
+        if pmo.Options & MQPMO_FAIL_IF_QUIESCING and broker.quiescing:
+            raise _failed(MQRC_Q_MGR_QUIESCING)
+        state = self._state
+        if pmo.Options & MQPMO_LOGICAL_ORDER and md.MsgFlags & _IN_GROUP:
+            self._join_uow(pmo.Options & MQPMO_SYNCPOINT)
+            group_id, number = self._put_group or (self._qmgr.backend._new_msg_id(broker.name), 0)
+            md.GroupId, md.MsgSeqNumber = group_id, number + 1
+            self._put_group = None if md.MsgFlags & MQMF_LAST_MSG_IN_GROUP else (group_id, number + 1)
+        _fill_md(self._qmgr.backend, md, pmo, state.def_persistence, broker.name)
+        self._qmgr._enqueue(state, _FakeMessage(0, md.get(), msg), pmo.Options & MQPMO_SYNCPOINT)
+
+    def get(self, max_length=None, *opts):
+        md, gmo = self._common_args(*opts)
+        if gmo is None:
+            gmo = GMO()
+
+        if self._state is None:
+            self._real_open(MQOO_INPUT_AS_Q_DEF)
+
+        if max_length is None:
+            length = 0 if gmo.Options & MQGMO_ACCEPT_TRUNCATED_MSG else 4096
+        else:
+            length = max_length
+
+        data, comp, reason, original_length = self._mqget(md, gmo, length)
+        if not comp:
+            return data
+
+        if (reason == MQRC_TRUNCATED_MSG_ACCEPTED or
+                (reason == MQRC_TRUNCATED_MSG_FAILED and max_length is not None) or
+                reason != MQRC_TRUNCATED_MSG_FAILED):
+            raise MQMIError(comp, reason, message=data, original_length=original_length)
+
+        # Message truncated, but we know its size, same as pymqi does another MQGET to retrieve it.
+        data, comp, reason, _ = self._mqget(md, gmo, original_length)
+        if comp:
+            raise MQMIError(comp, reason)
+        return data
+
+    def _common_args(self, *opts):
+        if len(opts) > 2:
+            raise TypeError("Too many args")
+        md = opts[0] if opts else None
+        options = opts[1] if len(opts) == 2 else None
+        return md if md is not None else MD(), options
+
+    def _match(self, md, gmo) -> dict:
+        """ Returns the MD fields a message has to match according to the GMO match options """
+        match = {}
+        for option, field, none in ((MQMO_MATCH_MSG_ID, "MsgId", MQMI_NONE),
+                                    (MQMO_MATCH_CORREL_ID, "CorrelId", MQCI_NONE),
+                                    (MQMO_MATCH_GROUP_ID, "GroupId", MQGI_NONE)):
+            value = getattr(md, field)
+            if gmo.MatchOptions & option and value not in (b"", none):
+                match[field] = value.ljust(len(none), b"\0")
+        return match
+
+    def _mqget(self, md, gmo, length):
+        """
+        A single MQGET call.
+        :return: tuple of (data, completion code, reason, original length of the message).
+        """
+        options = gmo.Options
+        browse = options & _BROWSE_OPTIONS
+        match = self._match(md, gmo)
+        read_ahead = (self._read_ahead is not None and not browse and not match and
+                      not options & (MQGMO_SYNCPOINT | MQGMO_SYNCPOINT_IF_PERSISTENT))
+        if read_ahead and self._read_ahead:
+            return self._get_read_ahead(md, options, length)
+
+        with self._qmgr._verb("MQGET") as broker:
+            if browse and not self._open_opts & MQOO_BROWSE:
+                raise _failed(MQRC_NOT_OPEN_FOR_BROWSE)
+            if not browse and not self._open_opts & _INPUT_OPTIONS:
+                raise _failed(MQRC_NOT_OPEN_FOR_INPUT)
+
+            state = self._state
+            wait = options & MQGMO_WAIT and gmo.WaitInterval != 0
+            deadline = None
+            if wait and gmo.WaitInterval != MQWI_UNLIMITED:
+                deadline = time.monotonic() + gmo.WaitInterval / 1000.0
+
+            with state.condition:
+                while True:
+                    if self._qmgr.is_broken:
+                        raise _failed(MQRC_CONNECTION_BROKEN)
+                    if options & MQGMO_FAIL_IF_QUIESCING and broker.quiescing:
+                        raise _failed(MQRC_Q_MGR_QUIESCING)
+
+                    msg = self._find(state, options, match)
+                    if msg is not None:
+                        break
+                    if options & (MQGMO_BROWSE_MSG_UNDER_CURSOR | MQGMO_MSG_UNDER_CURSOR):
+                        raise _failed(MQRC_NO_MSG_UNDER_CURSOR)
+                    if not wait:
+                        raise _failed(MQRC_NO_MSG_AVAILABLE)
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        raise _failed(MQRC_NO_MSG_AVAILABLE)
+                    state.condition.wait(remaining)
+
+                original_length = len(msg.data)
+                truncated = original_length > length
+                md.set(**msg.md)
+                if truncated and not options & MQGMO_ACCEPT_TRUNCATED_MSG:
+                    # The message stays on the queue and the browse cursor does not move
+                    return msg.data[:length], MQCC_WARNING, MQRC_TRUNCATED_MSG_FAILED, original_length
+
+                if browse:
+                    self._cursor = msg.seq
+                else:
+                    state.remove(msg)
+                    syncpoint = options & MQGMO_SYNCPOINT or (
+                        options & MQGMO_SYNCPOINT_IF_PERSISTENT and msg.md["Persistence"] == MQPER_PERSISTENT)
+                    if options & MQGMO_LOGICAL_ORDER:
+                        self._join_uow(syncpoint)
+                        flags = msg.md["MsgFlags"]
+                        in_group = flags & _IN_GROUP and not flags & MQMF_LAST_MSG_IN_GROUP
+                        self._get_group = (msg.md["GroupId"], msg.md["MsgSeqNumber"] + 1) if in_group else None
+                    if syncpoint:
+                        state.uncommitted += 1
+                        self._qmgr._uow_gets.append((state, msg))
+                    else:
+                        state.deq_count += 1
+                        if read_ahead:
+                            self._send_ahead(state)
+
+        if truncated:
+            return msg.data[:length], MQCC_WARNING, MQRC_TRUNCATED_MSG_ACCEPTED, original_length
+        return msg.data, MQCC_OK, MQRC_NONE, original_length
+
+    def _send_ahead(self, state):
+        """ Moves the next non-persistent messages to the client, in the same round trip """
+        limit = self._qmgr.backend.read_ahead
+        while len(self._read_ahead) < limit and state.seqs:
+            msg = state.messages[state.seqs[0]]
+            if msg.md["Persistence"] == MQPER_PERSISTENT:
+                break
+            state.remove(msg)
+            state.deq_count += 1
+            self._read_ahead.append(msg)
+
+    def _get_read_ahead(self, md, options, length):
+        with self._qmgr._verb("MQGET_READ_AHEAD"):
+            msg = self._read_ahead[0]
+            original_length = len(msg.data)
+            md.set(**msg.md)
+            if original_length > length:
+                if not options & MQGMO_ACCEPT_TRUNCATED_MSG:
+                    return msg.data[:length], MQCC_WARNING, MQRC_TRUNCATED_MSG_FAILED, original_length
+                self._read_ahead.popleft()
+                return msg.data[:length], MQCC_WARNING, MQRC_TRUNCATED_MSG_ACCEPTED, original_length
+            self._read_ahead.popleft()
+            return msg.data, MQCC_OK, MQRC_NONE, original_length
+
+    def _join_uow(self, syncpoint):
+        """ Keeps the group positions of the handle, to restore them if the unit of work is backed out """
+        if syncpoint and self not in self._qmgr._uow_groups:
+            self._qmgr._uow_groups[self] = self._put_group, self._get_group
+
+    def _find_in_logical_order(self, state, all_available):
+        """
+        Returns the next message of the group that is being got, or else the first message that is not in a group
+        or is the first of its group, if `all_available` only of a group whose messages are all on the queue.
+        """
+        if self._get_group is not None:
+            group_id, number = self._get_group
+            return state.find(match={"GroupId": group_id, "MsgSeqNumber": number})
+        for seq in state.seqs:
+            msg = state.messages[seq]
+            if not msg.md["MsgFlags"] & _IN_GROUP:
+                return msg
+            if msg.md["MsgSeqNumber"] == 1 and (not all_available or self._group_complete(state, msg.md["GroupId"])):
+                return msg
+        return None
+
+    def _group_complete(self, state, group_id) -> bool:
+        numbers = set()
+        last = None
+        for seq in state.seqs:
+            md = state.messages[seq].md
+            if md["GroupId"] == group_id:
+                numbers.add(md["MsgSeqNumber"])
+                if md["MsgFlags"] & MQMF_LAST_MSG_IN_GROUP:
+                    last = md["MsgSeqNumber"]
+        return last is not None and len(numbers) == last
+
+    def _find(self, state, options, match):
+        if options & (MQGMO_BROWSE_MSG_UNDER_CURSOR | MQGMO_MSG_UNDER_CURSOR):
+            return state.messages.get(self._cursor)
+        if options & MQGMO_LOGICAL_ORDER and not options & _BROWSE_OPTIONS:
+            return self._find_in_logical_order(state, options & MQGMO_ALL_MSGS_AVAILABLE)
+        if options & MQGMO_BROWSE_FIRST:
+            self._cursor = 0
+        after = self._cursor if options & _BROWSE_OPTIONS else 0
+        return state.find(after, match, self._select)
+
+
+class _FakeSubscriptionState(object):
+    """ The server side of a subscription, the publications that match `topic` are put on `queue` """
+
+    def __init__(self, name, topic, queue, durable, managed):
+        self.name = name
+        self.topic = topic
+        self.queue = queue
+        self.durable = durable
+        self.managed = managed
+        self.owner = None  # the connection using the subscription, released when it closes or breaks
+
+    @property
+    def in_use(self):
+        return self.owner is not None and self.owner.is_connected
+
+
+def _full_topic(topic_name, topic_string) -> str:
+    return "/".join(_to_str(part) for part in (topic_name, topic_string) if part)
+
+
+class FakeTopic(object):
+    """ The fake counterpart of `pymqi.Topic`, a publication is put on the queue of every matching subscription """
+
+    def __init__(self, qmgr: FakeQueueManager, topic_name=None, topic_string=None, topic_desc=None, open_opts=None):
+        self._qmgr = qmgr
+        self.topic_name = topic_name
+        self.topic_string = topic_string
+        self._open_opts = None
+        if open_opts:
+            self.open(open_opts=open_opts)
+
+    def open(self, topic_name=None, topic_string=None, topic_desc=None, open_opts=None):
+        if self._open_opts is not None:
+            raise PYIFError("The Topic is already open.")
+        self.topic_name = topic_name or self.topic_name
+        self.topic_string = topic_string or self.topic_string
+        if open_opts:
+            with self._qmgr._verb("MQOPEN"):
+                self._open_opts = open_opts
+
+    def pub(self, msg, *opts):
+        if not isinstance(msg, bytes):
+            raise TypeError("Python 3 style string (unicode) found but not allowed here: `{0}`. "
+                            "Convert to bytes.".format(msg))
+        md = opts[0] if opts and opts[0] is not None else MD()
+        pmo = opts[1] if len(opts) > 1 and opts[1] is not None else PMO()
+        if self._open_opts is None:
+            self.open(open_opts=MQOO_OUTPUT)
+        topic = _full_topic(self.topic_name, self.topic_string)
+        with self._qmgr._verb("MQPUT") as broker:
+            if pmo.Options & MQPMO_FAIL_IF_QUIESCING and broker.quiescing:
+                raise _failed(MQRC_Q_MGR_QUIESCING)
+            _fill_md(self._qmgr.backend, md, pmo, MQPER_NOT_PERSISTENT, broker.name)
+            with broker.lock:
+                queues = [sub.queue for sub in broker.subscriptions.values() if _topic_matches(sub.topic, topic)]
+            for state in queues:
+                # every subscriber gets its own copy of the publication, with its own MsgId
+                delivered = dict(md.get(), MsgId=self._qmgr.backend._new_msg_id(broker.name))
+                self._qmgr._enqueue(state, _FakeMessage(0, delivered, msg), pmo.Options & MQPMO_SYNCPOINT)
+
+    def close(self, options=MQCO_NONE):
+        if self._open_opts is None:
+            raise PYIFError("Topic not open.")
+        with self._qmgr._verb("MQCLOSE"):
+            self._open_opts = None
+
+
+class FakeSubscription(object):
+    """
+    The fake counterpart of `pymqi.Subscription`.
+    A managed subscription gets a queue named like the ones MQ creates, "SYSTEM.MANAGED.DURABLE.*"
+    or "SYSTEM.MANAGED.NDURABLE.*", that is deleted with the subscription.
+    """
+
+    def __init__(self, qmgr: FakeQueueManager):
+        self._qmgr = qmgr
+        self._state = None
+        self.sub_queue = None
+        self.sub_name = None
+
+    def sub(self, sub_desc=None, sub_queue=None, sub_name=None, sub_opts=None, topic_name=None, topic_string=None):
+        options = sub_opts if sub_opts else MQSO_CREATE | MQSO_NON_DURABLE | MQSO_MANAGED
+        name = _to_str(sub_name) if sub_name else None
+        durable = bool(options & MQSO_DURABLE)
+        managed = bool(options & MQSO_MANAGED)
+        if durable and not name:
+            raise _failed(MQRC_SUB_NAME_ERROR)
+        with self._qmgr._verb("MQSUB") as broker:
+            with broker.lock:
+                state = broker.subscriptions.get(name) if name else None
+                if state is not None:
+                    if not options & MQSO_RESUME:
+                        raise _failed(MQRC_SUB_ALREADY_EXISTS)
+                    if state.in_use:
+                        raise _failed(MQRC_SUBSCRIPTION_IN_USE)
+                elif not options & MQSO_CREATE:
+                    raise _failed(MQRC_NO_SUBSCRIPTION)
+                else:
+                    if managed:
+                        queue_name = "SYSTEM.MANAGED.{0}.{1:016X}".format("DURABLE" if durable else "NDURABLE",
+                                                                         next(self._qmgr.backend._msg_ids))
+                        queue = broker.queues[queue_name] = _FakeQueueState(queue_name, max_depth=999999999)
+                    else:
+                        if sub_queue is None or getattr(sub_queue, "_state", None) is None:
+                            raise _failed(MQRC_HOBJ_ERROR)
+                        queue = sub_queue._state
+                    state = _FakeSubscriptionState(name or queue.name, _full_topic(topic_name, topic_string),
+                                                   queue, durable, managed)
+                    broker.subscriptions[state.name] = state
+                state.owner = self._qmgr
+        self._state = state
+        self.sub_name = name
+        if state.managed:
+            self.sub_queue = FakeQueue(self._qmgr)
+            self.sub_queue._name = state.queue.name
+            self.sub_queue._real_open(MQOO_INPUT_AS_Q_DEF | MQOO_BROWSE | MQOO_INQUIRE)
+        else:
+            self.sub_queue = sub_queue
+
+    def get_sub_queue(self):
+        return self.sub_queue
+
+    def close(self, sub_close_options=MQCO_NONE, close_sub_queue=False, close_sub_queue_options=MQCO_NONE):
+        if self._state is None:
+            raise PYIFError("Subscription not open.")
+        state, self._state = self._state, None
+        with self._qmgr._verb("MQCLOSE") as broker:
+            with broker.lock:
+                state.owner = None
+                if not state.durable or sub_close_options & MQCO_REMOVE_SUB:
+                    broker.subscriptions.pop(state.name, None)
+                    if state.managed:
+                        broker.queues.pop(state.queue.name, None)
+        if close_sub_queue:
+            self.sub_queue.close(close_sub_queue_options)
+
+
+class FakePCFExecute(object):
+    """
+    The fake counterpart of `pymqi.PCFExecute`, supports the commands the wrapper uses.
+    Like the real one, it opens a reply queue when created.
+    """
+
+    def __init__(self, qmgr: FakeQueueManager):
+        self._qmgr = qmgr
+        with qmgr._verb("MQOPEN"):
+            pass
+
+    def disconnect(self):
+        with self._qmgr._verb("MQCLOSE"):
+            pass
+
+    def _queues(self, broker, pattern):
+        pattern = _to_str(pattern)
+        with broker.lock:
+            return [state for name, state in sorted(broker.queues.items()) if fnmatchcase(name, pattern)]
+
+    def MQCMD_PING_Q_MGR(self, args=None):
+        with self._qmgr._verb("MQCMD_PING_Q_MGR"):
+            return []
+
+    def MQCMD_INQUIRE_Q(self, args):
+        with self._qmgr._verb("MQCMD_INQUIRE_Q") as broker:
+            queue_type = args.get(MQIA_Q_TYPE, MQQT_ALL)
+            response = []
+            for state in self._queues(broker, args[MQCA_Q_NAME]):
+                if queue_type in (MQQT_ALL, MQQT_LOCAL):
+                    with state.condition:
+                        response.append(state.attributes())
+            if not response:
+                raise _failed(MQRC_UNKNOWN_OBJECT_NAME)
+            return response
+
+    def MQCMD_INQUIRE_Q_STATUS(self, args):
+        with self._qmgr._verb("MQCMD_INQUIRE_Q_STATUS") as broker:
+            response = []
+            for state in self._queues(broker, args[MQCA_Q_NAME]):
+                with state.condition:
+                    oldest = state.messages[state.seqs[0]].put_at if state.seqs else None
+                    response.append({
+                        MQCA_Q_NAME: _padded(state.name, MQ_Q_NAME_LENGTH),
+                        MQIA_CURRENT_Q_DEPTH: state.depth,
+                        MQIA_OPEN_INPUT_COUNT: state.open_input_count,
+                        MQIA_OPEN_OUTPUT_COUNT: state.open_output_count,
+                        MQIACF_UNCOMMITTED_MSGS: state.uncommitted,
+                        MQIACF_OLDEST_MSG_AGE: -1 if oldest is None else int(time.time() - oldest),
+                    })
+            if not response:
+                raise _failed(MQRC_UNKNOWN_OBJECT_NAME)
+            return response
+
+    def MQCMD_INQUIRE_CHANNEL(self, args):
+        with self._qmgr._verb("MQCMD_INQUIRE_CHANNEL") as broker:
+            pattern = _to_str(args[MQCACH_CHANNEL_NAME])
+            response = [{MQCACH_CHANNEL_NAME: _padded(name, MQ_CHANNEL_NAME_LENGTH)}
+                        for name in broker.channels if fnmatchcase(name, pattern)]
+            if not response:
+                raise _failed(MQRC_UNKNOWN_OBJECT_NAME)
+            return response
+
+    def MQCMD_CREATE_Q(self, args):
+        with self._qmgr._verb("MQCMD_CREATE_Q") as broker:
+            name = _to_str(args[MQCA_Q_NAME])
+            attributes = {
+                "max_depth": args.get(MQIA_MAX_Q_DEPTH, 5000),
+                "max_msg_length": args.get(MQIA_MAX_MSG_LENGTH, 4194304),
+                "def_persistence": args.get(MQIA_DEF_PERSISTENCE, MQPER_NOT_PERSISTENT),
+                "backout_threshold": args.get(MQIA_BACKOUT_THRESHOLD, 0),
+                "backout_queue": _to_str(args.get(MQCA_BACKOUT_REQ_Q_NAME, "")),
+            }
+            with broker.lock:
+                if name in broker.queues:
+                    raise _failed(MQRCCF_OBJECT_ALREADY_EXISTS)
+                broker.queues[name] = _FakeQueueState(name, **attributes)
+            return []
+
+    def MQCMD_DELETE_Q(self, args):
+        with self._qmgr._verb("MQCMD_DELETE_Q") as broker:
+            name = _to_str(args[MQCA_Q_NAME])
+            with broker.lock:
+                state = broker.queue(name)
+                with state.condition:
+                    if state.open_input_count or state.open_output_count:
+                        raise _failed(MQRC_OBJECT_IN_USE)
+                    if state.depth and args.get(MQIACF_PURGE) != MQPO_YES:
+                        raise _failed(MQRC_Q_NOT_EMPTY)
+                del broker.queues[name]
+            return []
+
+    def MQCMD_RESET_Q_STATS(self, args):
+        with self._qmgr._verb("MQCMD_RESET_Q_STATS") as broker:
+            response = []
+            for state in self._queues(broker, args[MQCA_Q_NAME]):
+                with state.condition:
+                    now = time.time()
+                    response.append({
+                        MQCA_Q_NAME: _padded(state.name, MQ_Q_NAME_LENGTH),
+                        MQIA_HIGH_Q_DEPTH: state.high_depth,
+                        MQIA_MSG_ENQ_COUNT: state.enq_count,
+                        MQIA_MSG_DEQ_COUNT: state.deq_count,
+                        MQIA_TIME_SINCE_RESET: int(now - state.reset_time),
+                    })
+                    state.high_depth = state.depth
+                    state.enq_count = state.deq_count = 0
+                    state.reset_time = now
+            if not response:
+                raise _failed(MQRC_UNKNOWN_OBJECT_NAME)
+            return response
@@ -0,0 +1,117 @@
+from datetime import datetime, timezone
+from pymqiwm.mqi import MD
+
+
+class WMMessage(object):
+    """
+
+        A message got from a queue, with the fields of its message descriptor that are needed to
+        correlate, dedupe or get it again selectively.
+
+        Usage:
+            >>> with queue:
+            >>>     for message in queue.read_messages_while_waiting(5, with_descriptor=True):
+            >>>         print(message.msg_id, message.correl_id, message.body)
+
+        Only the fields below are taken from the MD, so the MD object of the generator can be reused
+        for the next message. `put_date_time` is parsed from PutDate and PutTime only when it is read.
+
+    """
+
+    __slots__ = ("body", "msg_id", "correl_id", "put_date", "put_time", "persistence", "backout_count", "format",
+                 "reply_to_q")
+
+    def __init__(self, body, msg_id, correl_id, put_date, put_time, persistence, backout_count, format,
+                 reply_to_q=b""):
+        self.body = body
+        self.msg_id = msg_id
+        self.correl_id = correl_id
+        self.put_date = put_date
+        self.put_time = put_time
+        self.persistence = persistence
+        self.backout_count = backout_count
+        self.format = format
+        self.reply_to_q = reply_to_q
+
+    @classmethod
+    def from_md(cls, body, md: MD):
+        return cls(body, md.MsgId, md.CorrelId, md.PutDate, md.PutTime,
+                   md.Persistence, md.BackoutCount, md.Format, md.ReplyToQ)
+
+    @property
+    def put_date_time(self):
+        """ The UTC time the message was put, None if the queue manager did not set it """
+        date = self.put_date.decode("ascii", "replace").strip("\0 ") if self.put_date else ""
+        time = self.put_time.decode("ascii", "replace").strip("\0 ") if self.put_time else ""
+        if len(date) != 8 or len(time) < 6:
+            return None
+        # PutTime is HHMMSSTH, the last two digits are hundredths of a second
+        hundredths = int(time[6:8] or 0)
+        return datetime.strptime(date + time[:6], "%Y%m%d%H%M%S").replace(
+            microsecond=hundredths * 10000, tzinfo=timezone.utc)
+
+    def __repr__(self):
+        # the body is an object when the queue has a codec
+        length = len(self.body) if isinstance(self.body, (bytes, str, memoryview)) else None
+        return "WMMessage(msg_id={0!r}, correl_id={1!r}, length={2})".format(self.msg_id, self.correl_id, length)
+
+    def __eq__(self, other):
+        if isinstance(other, WMMessage):
+            return self.msg_id == other.msg_id and self.body == other.body
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(self.msg_id)
+
+
+class BrowseCursor(object):
+    """
+
+        The position of a browse: the last message that was browsed, and how many were browsed up to it.
+        `WMQueue.browse_messages(cursor=...)` resumes after that message and moves the cursor as it yields,
+        so it can be saved at any time (`to_dict` is JSON serializable) and the browse resumed later,
+        on another handle or connection.
+
+        Usage:
+            >>> cursor = BrowseCursor()
+            >>> for message in queue.browse_messages(cursor=cursor):
+            >>>     ...
+            >>> saved = json.dumps(cursor.to_dict())
+            >>> for message in queue.browse_messages(cursor=BrowseCursor.from_dict(json.loads(saved))):
+            >>>     ...  # continues after the last message that was browsed
+
+    """
+
+    __slots__ = ("msg_id", "put_date", "put_time", "position")
+
+    def __init__(self, msg_id=None, put_date=b"", put_time=b"", position=0):
+        self.msg_id = msg_id
+        self.put_date = put_date
+        self.put_time = put_time
+        self.position = position
+
+    def advance(self, msg_id, put_date, put_time):
+        """ Moves the cursor to the next message that was browsed """
+        self.msg_id = msg_id
+        self.put_date = put_date
+        self.put_time = put_time
+        self.position += 1
+
+    def copy(self):
+        return BrowseCursor(self.msg_id, self.put_date, self.put_time, self.position)
+
+    def to_dict(self) -> dict:
+        return {
+            "msg_id": self.msg_id.hex() if self.msg_id else None,
+            "put_date": self.put_date.decode(),
+            "put_time": self.put_time.decode(),
+            "position": self.position,
+        }
+
+    @classmethod
+    def from_dict(cls, saved: dict):
+        return cls(bytes.fromhex(saved["msg_id"]) if saved["msg_id"] else None,
+                   saved["put_date"].encode(), saved["put_time"].encode(), saved["position"])
+
+    def __repr__(self):
+        return "BrowseCursor(msg_id={0!r}, position={1})".format(self.msg_id, self.position)
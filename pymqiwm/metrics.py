@@ -0,0 +1,292 @@
+import threading
+import time
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pymqiwm.mqi import MQMIError
+from pymqiwm.mqi.CMQC import MQRC_NONE
+from pymqiwm.backend import PymqiBackend
+
+# Upper bounds in seconds of the latency histogram buckets, from a local call to a slow network round trip
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+_HELP = {
+    "pymqiwm_mqi_calls_total": ("counter", "MQI calls and PCF commands by verb and reason code (0 is success)."),
+    "pymqiwm_mqi_call_seconds": ("histogram", "Latency of the MQI calls and PCF commands by verb."),
+    "pymqiwm_bytes_total": ("counter", "Bytes of the message bodies put and got."),
+    "pymqiwm_reopens_total": ("counter", "Queues opened again because their connection was made again."),
+    "pymqiwm_reconnects_total": ("counter", "Connections made again after they broke."),
+    "pymqiwm_reconnect_seconds": ("histogram", "Time from a broken connection to the new connection."),
+}
+
+
+class _Histogram(object):
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self, buckets):
+        self.counts = [0] * (len(buckets) + 1)  # the last one is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+
+class Metrics(object):
+    """
+
+        Counters and latency histograms of the calls the wrapper makes, rendered in the Prometheus text format.
+
+        Usage:
+            >>> metrics = Metrics()
+            >>> backend = InstrumentedBackend(PymqiBackend(), metrics)
+            >>> with WMQueueManager(name=..., conn_info=..., backend=backend) as qmgr:
+            >>>     ...
+            >>> print(metrics.render())
+            >>> metrics.serve(9464)  # or expose them on http://127.0.0.1:9464/metrics
+
+        A metric is a name and a tuple of (label, value) pairs, the names are listed in `_HELP`.
+
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._counters = {}
+        self._histograms = {}
+        self._lock = threading.Lock()
+        self._server = None
+
+    def inc(self, name, labels=(), amount=1):
+        key = (name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name, labels, seconds):
+        key = (name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = _Histogram(self.buckets)
+            histogram.counts[bisect_left(self.buckets, seconds)] += 1
+            histogram.sum += seconds
+            histogram.count += 1
+
+    def call(self, verb, reason, seconds):
+        """ Records an MQI call or a PCF command """
+        self.inc("pymqiwm_mqi_calls_total", (("verb", verb), ("reason", str(reason))))
+        self.observe("pymqiwm_mqi_call_seconds", (("verb", verb),), seconds)
+
+    def snapshot(self) -> dict:
+        """ Returns the counters, and the count and sum of the histograms, by name and labels """
+        with self._lock:
+            values = dict(self._counters)
+            for key, histogram in self._histograms.items():
+                values[key] = {"count": histogram.count, "sum": histogram.sum}
+        return values
+
+    def render(self) -> str:
+        """ Returns all the metrics in the Prometheus text exposition format """
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted((key, list(histogram.counts), histogram.sum, histogram.count)
+                                for key, histogram in self._histograms.items())
+        lines = []
+        described = set()
+        for (name, labels), value in counters:
+            self._describe(lines, described, name)
+            lines.append("{0}{1} {2}".format(name, _labels(labels), value))
+        bounds = [repr(bound) for bound in self.buckets] + ["+Inf"]
+        for (name, labels), counts, total, count in histograms:
+            self._describe(lines, described, name)
+            cumulative = 0
+            for bound, bucket_count in zip(bounds, counts):
+                cumulative += bucket_count
+                lines.append("{0}_bucket{1} {2}".format(name, _labels(labels + (("le", bound),)), cumulative))
+            lines.append("{0}_sum{1} {2!r}".format(name, _labels(labels), total))
+            lines.append("{0}_count{1} {2}".format(name, _labels(labels), count))
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port, host="127.0.0.1"):
+        """ Serves `render` on http://host:port/metrics from a background thread, until `stop_serving` """
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = metrics.render().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=self._server.serve_forever, name="pymqiwm-metrics", daemon=True).start()
+
+    def stop_serving(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def _describe(self, lines, described, name):
+        if name not in described:
+            described.add(name)
+            kind, text = _HELP.get(name, ("untyped", name))
+            lines.append("# HELP {0} {1}".format(name, text))
+            lines.append("# TYPE {0} {1}".format(name, kind))
+
+
+def _labels(labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join('{0}="{1}"'.format(label, str(value).replace("\\", "\\\\").replace('"', '\\"'))
+                          for label, value in labels) + "}"
+
+
+def _size(msg, encoding) -> int:
+    """ The number of bytes of a message body, pymqi puts a str encoded with the `bytes_encoding` of its qmgr """
+    return len(msg.encode(encoding)) if isinstance(msg, str) else len(msg)
+
+
+def _unwrap(value):
+    return value._target if isinstance(value, _Instrumented) else value
+
+
+class _Instrumented(object):
+    """ Forwards everything to the object it wraps, the subclasses time its MQI calls """
+
+    def __init__(self, target, metrics: Metrics):
+        self._target = target
+        self._metrics = metrics
+
+    def __getattr__(self, name):
+        return getattr(self._target, name)
+
+    def _timed(self, verb, method, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            result = method(*args, **kwargs)
+        except MQMIError as e:
+            self._metrics.call(verb, e.reason, time.perf_counter() - started)
+            raise
+        self._metrics.call(verb, MQRC_NONE, time.perf_counter() - started)
+        return result
+
+
+class _InstrumentedQueueManager(_Instrumented):
+    def connect_with_options(self, *args, **kwargs):
+        return self._timed("MQCONNX", self._target.connect_with_options, *args, **kwargs)
+
+    def disconnect(self):
+        return self._timed("MQDISC", self._target.disconnect)
+
+    def commit(self):
+        return self._timed("MQCMIT", self._target.commit)
+
+    def backout(self):
+        return self._timed("MQBACK", self._target.backout)
+
+    def begin(self):
+        return self._timed("MQBEGIN", self._target.begin)
+
+
+class _InstrumentedQueue(_Instrumented):
+    def __init__(self, target, metrics: Metrics, encoding="utf8"):
+        super().__init__(target, metrics)
+        self._encoding = encoding
+
+    def open(self, q_desc, *opts):
+        if not opts:  # a deferred open makes no call
+            return self._target.open(q_desc)
+        return self._timed("MQOPEN", self._target.open, q_desc, *opts)
+
+    def close(self, *args):
+        return self._timed("MQCLOSE", self._target.close, *args)
+
+    def put(self, msg, *opts):
+        self._timed("MQPUT", self._target.put, msg, *opts)
+        self._metrics.inc("pymqiwm_bytes_total", (("direction", "put"),), _size(msg, self._encoding))
+
+    def get(self, max_length=None, *opts):
+        message = self._timed("MQGET", self._target.get, max_length, *opts)
+        self._metrics.inc("pymqiwm_bytes_total", (("direction", "get"),), _size(message, self._encoding))
+        return message
+
+    def inquire(self, attribute):
+        return self._timed("MQINQ", self._target.inquire, attribute)
+
+
+class _InstrumentedTopic(_Instrumented):
+    def open(self, *args, **kwargs):
+        return self._timed("MQOPEN", self._target.open, *args, **kwargs)
+
+    def close(self, *args):
+        return self._timed("MQCLOSE", self._target.close, *args)
+
+    def pub(self, msg, *opts):
+        self._timed("MQPUT", self._target.pub, msg, *opts)
+        self._metrics.inc("pymqiwm_bytes_total", (("direction", "put"),), _size(msg, "utf8"))
+
+
+class _InstrumentedSubscription(_Instrumented):
+    @property
+    def sub_queue(self):
+        return _InstrumentedQueue(self._target.sub_queue, self._metrics)  # the gets return bytes
+
+    def sub(self, sub_desc=None, sub_queue=None, **kwargs):
+        # pymqi checks the type of the queue object, so it gets the one that is wrapped
+        return self._timed("MQSUB", self._target.sub, sub_desc, _unwrap(sub_queue), **kwargs)
+
+    def close(self, *args, **kwargs):
+        return self._timed("MQCLOSE", self._target.close, *args, **kwargs)
+
+
+class _InstrumentedPCF(_Instrumented):
+    def __getattr__(self, name):
+        command = getattr(self._target, name)
+        if not name.startswith("MQCMD_"):
+            return command
+        return lambda *args, **kwargs: self._timed(name, command, *args, **kwargs)
+
+
+class InstrumentedBackend(object):
+    """
+
+        A backend that records every MQI call and PCF command made through the objects of another backend in `metrics`.
+        Without it nothing is recorded and nothing is added to the calls, the instrumentation is only paid for
+        when this backend is passed to `WMQueueManager`.
+
+        Usage:
+            >>> metrics = Metrics()
+            >>> qmgr = WMQueueManager(name=..., conn_info=..., backend=InstrumentedBackend(PymqiBackend(), metrics))
+
+    """
+
+    def __init__(self, backend=None, metrics: Metrics = None):
+        self.backend = backend or PymqiBackend()
+        self.metrics = metrics if metrics is not None else Metrics()
+
+    def __getattr__(self, name):
+        return getattr(self.backend, name)  # for example `define_queue` of `FakeBackend`
+
+    def queue_manager(self):
+        return _InstrumentedQueueManager(self.backend.queue_manager(), self.metrics)
+
+    def queue(self, qmgr, name):
+        qmgr = _unwrap(qmgr)
+        return _InstrumentedQueue(self.backend.queue(qmgr, name), self.metrics, getattr(qmgr, "bytes_encoding", "utf8"))
+
+    def pcf(self, qmgr):
+        return _InstrumentedPCF(self.backend.pcf(_unwrap(qmgr)), self.metrics)
+
+    def topic(self, qmgr, topic_string=None, topic_name=None):
+        return _InstrumentedTopic(self.backend.topic(_unwrap(qmgr), topic_string, topic_name), self.metrics)
+
+    def subscription(self, qmgr):
+        return _InstrumentedSubscription(self.backend.subscription(_unwrap(qmgr)), self.metrics)
+
+    def async_put_status(self, qmgr):
+        started = time.perf_counter()
+        status = self.backend.async_put_status(_unwrap(qmgr))
+        if status is not None:
+            self.metrics.call("MQSTAT", MQRC_NONE, time.perf_counter() - started)
+        return status
@@ -0,0 +1,143 @@
+"""
+The MQ constants of `pymqi.CMQC`. With pymqi installed they are imported from it, without it (see `pymqiwm.mqi`)
+only the constants pymqiwm uses are defined here, with the values of pymqi.
+"""
+
+try:
+    from pymqi.CMQC import *  # noqa: F401,F403
+except ImportError:
+    MQAT_NO_CONTEXT = 0
+    MQCA_BACKOUT_REQ_Q_NAME = 2019
+    MQCA_Q_NAME = 2016
+    MQCCSI_Q_MGR = 0
+    MQCC_FAILED = 2
+    MQCC_OK = 0
+    MQCC_WARNING = 1
+    MQCHT_CLNTCONN = 6
+    MQCI_NONE = b'\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00'
+    MQCNO_HANDLE_SHARE_BLOCK = 64
+    MQCO_NONE = 0
+    MQCO_REMOVE_SUB = 8
+    MQEI_UNLIMITED = -1
+    MQENC_NATIVE = 546
+    MQFB_NONE = 0
+    MQFMT_NONE = b'        '
+    MQFMT_STRING = b'MQSTR   '
+    MQGI_NONE = b'\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00'
+    MQGMO_ACCEPT_TRUNCATED_MSG = 64
+    MQGMO_ALL_MSGS_AVAILABLE = 131072
+    MQGMO_BROWSE_FIRST = 16
+    MQGMO_BROWSE_MSG_UNDER_CURSOR = 2048
+    MQGMO_BROWSE_NEXT = 32
+    MQGMO_FAIL_IF_QUIESCING = 8192
+    MQGMO_LOGICAL_ORDER = 32768
+    MQGMO_MSG_UNDER_CURSOR = 256
+    MQGMO_NO_WAIT = 0
+    MQGMO_STRUC_ID = b'GMO '
+    MQGMO_SYNCPOINT = 2
+    MQGMO_SYNCPOINT_IF_PERSISTENT = 4096
+    MQGMO_VERSION_1 = 1
+    MQGMO_VERSION_2 = 2
+    MQGMO_WAIT = 1
+    MQGS_NOT_IN_GROUP = 32
+    MQIA_BACKOUT_THRESHOLD = 22
+    MQIA_CURRENT_Q_DEPTH = 3
+    MQIA_DEF_PERSISTENCE = 5
+    MQIA_HIGH_Q_DEPTH = 36
+    MQIA_MAX_MSG_LENGTH = 13
+    MQIA_MAX_Q_DEPTH = 15
+    MQIA_MSG_DEQ_COUNT = 38
+    MQIA_MSG_ENQ_COUNT = 37
+    MQIA_OPEN_INPUT_COUNT = 17
+    MQIA_OPEN_OUTPUT_COUNT = 18
+    MQIA_Q_TYPE = 20
+    MQIA_TIME_SINCE_RESET = 35
+    MQMD_STRUC_ID = b'MD  '
+    MQMD_VERSION_1 = 1
+    MQMD_VERSION_2 = 2
+    MQMF_LAST_MSG_IN_GROUP = 16
+    MQMF_MSG_IN_GROUP = 8
+    MQMF_NONE = 0
+    MQMI_NONE = b'\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00'
+    MQMO_MATCH_CORREL_ID = 2
+    MQMO_MATCH_GROUP_ID = 4
+    MQMO_MATCH_MSG_ID = 1
+    MQMO_NONE = 0
+    MQMT_DATAGRAM = 8
+    MQMT_REQUEST = 1
+    MQOD_STRUC_ID = b'OD  '
+    MQOD_VERSION_1 = 1
+    MQOD_VERSION_4 = 4
+    MQOL_UNDEFINED = -1
+    MQOO_BROWSE = 8
+    MQOO_FAIL_IF_QUIESCING = 8192
+    MQOO_INPUT_AS_Q_DEF = 1
+    MQOO_INPUT_EXCLUSIVE = 4
+    MQOO_INPUT_SHARED = 2
+    MQOO_INQUIRE = 32
+    MQOO_OUTPUT = 16
+    MQOO_READ_AHEAD = 1048576
+    MQOT_Q = 1
+    MQPER_NOT_PERSISTENT = 0
+    MQPER_PERSISTENCE_AS_Q_DEF = 2
+    MQPER_PERSISTENT = 1
+    MQPMO_ASYNC_RESPONSE = 65536
+    MQPMO_FAIL_IF_QUIESCING = 8192
+    MQPMO_LOGICAL_ORDER = 32768
+    MQPMO_NEW_CORREL_ID = 128
+    MQPMO_NEW_MSG_ID = 64
+    MQPMO_NONE = 0
+    MQPMO_STRUC_ID = b'PMO '
+    MQPMO_SYNCPOINT = 2
+    MQPMO_VERSION_1 = 1
+    MQPRI_PRIORITY_AS_Q_DEF = -1
+    MQQT_ALL = 1001
+    MQQT_LOCAL = 1
+    MQRC_BACKED_OUT = 2003
+    MQRC_CHANNEL_NOT_AVAILABLE = 2537
+    MQRC_CONNECTION_BROKEN = 2009
+    MQRC_CONNECTION_QUIESCING = 2202
+    MQRC_CONNECTION_STOPPING = 2203
+    MQRC_HCONN_ERROR = 2018
+    MQRC_HOBJ_ERROR = 2019
+    MQRC_HOST_NOT_AVAILABLE = 2538
+    MQRC_MSG_TOO_BIG_FOR_Q = 2030
+    MQRC_NONE = 0
+    MQRC_NOT_OPEN_FOR_BROWSE = 2036
+    MQRC_NOT_OPEN_FOR_INPUT = 2037
+    MQRC_NOT_OPEN_FOR_INQUIRE = 2038
+    MQRC_NOT_OPEN_FOR_OUTPUT = 2039
+    MQRC_NO_MSG_AVAILABLE = 2033
+    MQRC_NO_MSG_UNDER_CURSOR = 2034
+    MQRC_NO_SUBSCRIPTION = 2428
+    MQRC_OBJECT_IN_USE = 2042
+    MQRC_OPTIONS_ERROR = 2046
+    MQRC_PMO_ERROR = 2173
+    MQRC_Q_FULL = 2053
+    MQRC_Q_MGR_NOT_AVAILABLE = 2059
+    MQRC_Q_MGR_QUIESCING = 2161
+    MQRC_Q_MGR_STOPPING = 2162
+    MQRC_Q_NOT_EMPTY = 2055
+    MQRC_SELECTION_NOT_AVAILABLE = 2551
+    MQRC_STANDBY_Q_MGR = 2543
+    MQRC_SUBSCRIPTION_IN_USE = 2429
+    MQRC_SUB_ALREADY_EXISTS = 2432
+    MQRC_SUB_NAME_ERROR = 2440
+    MQRC_TRUNCATED_MSG_ACCEPTED = 2079
+    MQRC_TRUNCATED_MSG_FAILED = 2080
+    MQRC_UNKNOWN_OBJECT_NAME = 2085
+    MQRL_UNDEFINED = -1
+    MQRO_NONE = 0
+    MQSEG_INHIBITED = 32
+    MQSO_CREATE = 2
+    MQSO_DURABLE = 8
+    MQSO_FAIL_IF_QUIESCING = 8192
+    MQSO_MANAGED = 32
+    MQSO_NON_DURABLE = 0
+    MQSO_RESUME = 4
+    MQSS_NOT_A_SEGMENT = 32
+    MQWI_UNLIMITED = -1
+    MQXPT_TCP = 2
+    MQ_CHANNEL_NAME_LENGTH = 20
+    MQ_CORREL_ID_LENGTH = 24
+    MQ_Q_NAME_LENGTH = 48
@@ -0,0 +1,16 @@
+"""
+The PCF constants of `pymqi.CMQCFC`. With pymqi installed they are imported from it, without it (see `pymqiwm.mqi`)
+only the constants pymqiwm uses are defined here, with the values of pymqi.
+"""
+
+try:
+    from pymqi.CMQCFC import *  # noqa: F401,F403
+except ImportError:
+    MQCACH_CHANNEL_NAME = 3501
+    MQIACF_OLDEST_MSG_AGE = 1227
+    MQIACF_PURGE = 1007
+    MQIACF_Q_ATTRS = 1002
+    MQIACF_Q_STATUS_ATTRS = 1026
+    MQIACF_UNCOMMITTED_MSGS = 1027
+    MQPO_YES = 1
+    MQRCCF_OBJECT_ALREADY_EXISTS = 4001
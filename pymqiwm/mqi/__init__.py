@@ -0,0 +1,20 @@
+"""
+The pymqi names pymqiwm uses, every module of pymqiwm imports them from here instead of from pymqi.
+
+With pymqi installed they are the ones of pymqi. pymqi loads a C extension that is built against the IBM MQ
+client, so on a machine without the client the structures (MD, GMO, PMO, OD, CD), the exceptions and the
+constants (`pymqiwm.mqi.CMQC`, `pymqiwm.mqi.CMQCFC`) are the pure-Python stand-ins of `pymqiwm.mqi._structs`.
+They are all `FakeBackend` needs, so the wrapper and its tests run on it without MQ, while the default
+`PymqiBackend` raises ImportError when it makes its first object. `HAS_PYMQI` tells which ones are used.
+"""
+
+try:
+    from pymqi import Queue, QueueManager, PCFExecute, Topic, Subscription, MQMIError, PYIFError, MD, GMO, PMO, OD, CD
+    HAS_PYMQI = True
+except ImportError:
+    from pymqiwm.mqi._structs import (Queue, QueueManager, PCFExecute, Topic, Subscription, MQMIError, PYIFError,
+                                      MD, GMO, PMO, OD, CD)
+    HAS_PYMQI = False
+
+__all__ = ["Queue", "QueueManager", "PCFExecute", "Topic", "Subscription", "MQMIError", "PYIFError",
+           "MD", "GMO", "PMO", "OD", "CD", "HAS_PYMQI"]
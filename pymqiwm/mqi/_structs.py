@@ -0,0 +1,277 @@
+"""
+Pure-Python stand-ins for the pymqi structures and exceptions, used when pymqi can't be imported.
+
+They have the members, the defaults and the `get`/`set`/`pack`/`unpack` methods of their pymqi counterparts,
+and MD packs to the same bytes as `pymqi.MD`, so a dump file written with either can be read with the other.
+The classes that talk to a queue manager (QueueManager, Queue, ...) raise ImportError when they are created.
+"""
+
+import struct
+from pymqiwm.mqi import CMQC, CMQCFC
+
+MQLONG = "i" if struct.calcsize("P") == 8 else "l"
+
+
+class _Struct(object):
+    """ An MQI structure, `_fields` is the list of (member name, default value, struct format) of the C struct """
+
+    _fields = ()
+
+    def __init__(self, **kw):
+        self._format = "".join(fmt for _, _, fmt in self._fields)
+        self._vs = {}
+        for name, default, _ in self._fields:
+            setattr(self, name, list(default) if isinstance(default, list) else default)
+        self.set(**kw)
+
+    def set(self, **kw):
+        for name, value in kw.items():
+            getattr(self, name)  # AttributeError for a member the structure doesn't have
+            setattr(self, name, value)
+
+    def get(self) -> dict:
+        return {name: getattr(self, name) for name, _, _ in self._fields}
+
+    def __getitem__(self, key):
+        return getattr(self, key)
+
+    def __setitem__(self, key, value):
+        getattr(self, key)
+        setattr(self, key, value)
+
+    def get_length(self) -> int:
+        return struct.calcsize(self._format)
+
+    def pack(self) -> bytes:
+        values = []
+        for name, _, _ in self._fields:
+            value = getattr(self, name)
+            values.extend(value if isinstance(value, list) else (value,))
+        return struct.pack(self._format, *values)
+
+    def unpack(self, buff):
+        buff = bytes(buff)
+        if len(buff) < self.get_length():
+            buff += b"\0" * (self.get_length() - len(buff))
+        values = iter(struct.unpack(self._format, buff))
+        for name, default, _ in self._fields:
+            setattr(self, name, [next(values) for _ in default] if isinstance(default, list) else next(values))
+
+    def set_vs(self, vs_name, vs_value=None, vs_offset=0, vs_buffer_size=0, vs_ccsid=0):
+        """ Sets a variable length string (MQCHARV), its value is kept here instead of behind a pointer """
+        if isinstance(vs_value, str):
+            vs_value = vs_value.encode()
+        self._vs[vs_name] = vs_value
+        self[vs_name + "VSOffset"] = vs_offset
+        self[vs_name + "VSBufSize"] = vs_buffer_size
+        self[vs_name + "VSLength"] = len(vs_value) if vs_value is not None else 0
+        self[vs_name + "VSCCSID"] = vs_ccsid
+
+    def get_vs(self, vs_name):
+        return self._vs.get(vs_name[:-len("VSPtr")] if vs_name.endswith("VSPtr") else vs_name)
+
+    def __str__(self):
+        return "\n".join("{0}: {1}".format(name, getattr(self, name)) for name, _, _ in self._fields)
+
+
+def _vs_fields(name) -> tuple:
+    """ The members of a variable length string (MQCHARV) """
+    return ((name + "VSPtr", 0, "P"), (name + "VSOffset", 0, MQLONG), (name + "VSBufSize", 0, MQLONG),
+            (name + "VSLength", 0, MQLONG), (name + "VSCCSID", 0, MQLONG))
+
+
+class MD(_Struct):
+    """ MQMD """
+
+    _fields = (
+        ("StrucId", CMQC.MQMD_STRUC_ID, "4s"),
+        ("Version", CMQC.MQMD_VERSION_1, MQLONG),
+        ("Report", CMQC.MQRO_NONE, MQLONG),
+        ("MsgType", CMQC.MQMT_DATAGRAM, MQLONG),
+        ("Expiry", CMQC.MQEI_UNLIMITED, MQLONG),
+        ("Feedback", CMQC.MQFB_NONE, MQLONG),
+        ("Encoding", CMQC.MQENC_NATIVE, MQLONG),
+        ("CodedCharSetId", CMQC.MQCCSI_Q_MGR, MQLONG),
+        ("Format", b"", "8s"),
+        ("Priority", CMQC.MQPRI_PRIORITY_AS_Q_DEF, MQLONG),
+        ("Persistence", CMQC.MQPER_PERSISTENCE_AS_Q_DEF, MQLONG),
+        ("MsgId", b"", "24s"),
+        ("CorrelId", b"", "24s"),
+        ("BackoutCount", 0, MQLONG),
+        ("ReplyToQ", b"", "48s"),
+        ("ReplyToQMgr", b"", "48s"),
+        ("UserIdentifier", b"", "12s"),
+        ("AccountingToken", b"", "32s"),
+        ("ApplIdentityData", b"", "32s"),
+        ("PutApplType", CMQC.MQAT_NO_CONTEXT, MQLONG),
+        ("PutApplName", b"", "28s"),
+        ("PutDate", b"", "8s"),
+        ("PutTime", b"", "8s"),
+        ("ApplOriginData", b"", "4s"),
+        ("GroupId", b"", "24s"),
+        ("MsgSeqNumber", 1, MQLONG),
+        ("Offset", 0, MQLONG),
+        ("MsgFlags", CMQC.MQMF_NONE, MQLONG),
+        ("OriginalLength", CMQC.MQOL_UNDEFINED, MQLONG),
+    )
+
+
+class GMO(_Struct):
+    """ MQGMO """
+
+    _fields = (
+        ("StrucId", CMQC.MQGMO_STRUC_ID, "4s"),
+        ("Version", CMQC.MQGMO_VERSION_1, MQLONG),
+        ("Options", CMQC.MQGMO_NO_WAIT, MQLONG),
+        ("WaitInterval", 0, MQLONG),
+        ("Signal1", 0, MQLONG),
+        ("Signal2", 0, MQLONG),
+        ("ResolvedQName", b"", "48s"),
+        ("MatchOptions", CMQC.MQMO_MATCH_MSG_ID | CMQC.MQMO_MATCH_CORREL_ID, MQLONG),
+        ("GroupStatus", CMQC.MQGS_NOT_IN_GROUP, "b"),
+        ("SegmentStatus", CMQC.MQSS_NOT_A_SEGMENT, "b"),
+        ("Segmentation", CMQC.MQSEG_INHIBITED, "b"),
+        ("Reserved1", b" ", "c"),
+        ("MsgToken", b"", "16s"),
+        ("ReturnedLength", CMQC.MQRL_UNDEFINED, MQLONG),
+        ("Reserved2", 0, MQLONG),
+        ("MsgHandle", 0, "q"),
+    )
+
+
+class PMO(_Struct):
+    """ MQPMO """
+
+    _fields = (
+        ("StrucId", CMQC.MQPMO_STRUC_ID, "4s"),
+        ("Version", CMQC.MQPMO_VERSION_1, MQLONG),
+        ("Options", CMQC.MQPMO_NONE, MQLONG),
+        ("Timeout", -1, MQLONG),
+        ("Context", 0, MQLONG),
+        ("KnownDestCount", 0, MQLONG),
+        ("UnknownDestCount", 0, MQLONG),
+        ("InvalidDestCount", 0, MQLONG),
+        ("ResolvedQName", b"", "48s"),
+        ("ResolvedQMgrName", b"", "48s"),
+        ("RecsPresent", 0, MQLONG),
+        ("PutMsgRecFields", 0, MQLONG),
+        ("PutMsgRecOffset", 0, MQLONG),
+        ("ResponseRecOffset", 0, MQLONG),
+        ("PutMsgRecPtr", 0, "P"),
+        ("ResponseRecPtr", 0, "P"),
+        ("OriginalMsgHandle", 0, "q"),
+        ("NewMsgHandle", 0, "q"),
+        ("Action", 0, MQLONG),
+        ("PubLevel", 0, MQLONG),
+    )
+
+
+class OD(_Struct):
+    """ MQOD """
+
+    _fields = (
+        ("StrucId", CMQC.MQOD_STRUC_ID, "4s"),
+        ("Version", CMQC.MQOD_VERSION_1, MQLONG),
+        ("ObjectType", CMQC.MQOT_Q, MQLONG),
+        ("ObjectName", b"", "48s"),
+        ("ObjectQMgrName", b"", "48s"),
+        ("DynamicQName", b"AMQ.*", "48s"),
+        ("AlternateUserId", b"", "12s"),
+        ("RecsPresent", 0, MQLONG),
+        ("KnownDestCount", 0, MQLONG),
+        ("UnknownDestCount", 0, MQLONG),
+        ("InvalidDestCount", 0, MQLONG),
+        ("ObjectRecOffset", 0, MQLONG),
+        ("ResponseRecOffset", 0, MQLONG),
+        ("ObjectRecPtr", 0, "P"),
+        ("ResponseRecPtr", 0, "P"),
+        ("AlternateSecurityId", b"", "40s"),
+        ("ResolvedQName", b"", "48s"),
+        ("ResolvedQMgrName", b"", "48s"),
+    ) + _vs_fields("ObjectString") + _vs_fields("SelectionString") + _vs_fields("ResObjectString") + (
+        ("ResolvedType", -3, MQLONG),
+    ) + ((("pad", b"", "4s"),) if MQLONG == "i" else ())
+
+
+class CD(_Struct):
+    """ MQCD, only the members of a client connection the wrapper sets """
+
+    _fields = (
+        ("ChannelName", b"", "20s"),
+        ("Version", 6, MQLONG),
+        ("ChannelType", CMQC.MQCHT_CLNTCONN, MQLONG),
+        ("TransportType", CMQC.MQXPT_TCP, MQLONG),
+        ("MaxMsgLength", 4194304, MQLONG),
+        ("ConnectionName", b"", "264s"),
+        ("HeartbeatInterval", 300, MQLONG),
+        ("SSLCipherSpec", b"", "32s"),
+        ("KeepAliveInterval", -1, MQLONG),
+    )
+
+
+class Error(Exception):
+    """ The base of the pymqi exceptions """
+
+
+class MQMIError(Error):
+    """ An MQI call failed with the completion code `comp` and the reason code `reason` """
+
+    comp = CMQC.MQCC_OK
+    reason = CMQC.MQRC_NONE
+
+    def __init__(self, comp, reason, **kw):
+        self.comp, self.reason = comp, reason
+        for key, value in kw.items():
+            setattr(self, key, value)
+
+    def __str__(self):
+        return "MQI Error. Comp: %d, Reason %d: %s" % (self.comp, self.reason, self.errorAsString())
+
+    def errorAsString(self) -> str:
+        if self.comp == CMQC.MQCC_OK:
+            return "OK"
+        prefix = "WARNING: " if self.comp == CMQC.MQCC_WARNING else "FAILED: "
+        name = _REASON_NAMES.get(self.reason)
+        return prefix + (name if name is not None else "Error code {0} not defined".format(self.reason))
+
+
+class PYIFError(Error):
+    """ A pymqi object was used the wrong way, for example a queue that is not open """
+
+    def __init__(self, e):
+        self.error = e
+
+    def __str__(self):
+        return "PYMQI Error: " + str(self.error)
+
+
+_REASON_NAMES = {value: name for module, prefix in ((CMQC, "MQRC_"), (CMQCFC, "MQRCCF_"))
+                 for name, value in vars(module).items() if name.startswith(prefix)}
+
+
+class _NeedsPymqi(object):
+    """ A pymqi object that needs the MQ client, there is no stand-in for it """
+
+    def __init__(self, *args, **kwargs):
+        raise ImportError("{0} needs pymqi, pip install pymqi (it builds against the IBM MQ client), "
+                          "or pass backend=FakeBackend() to work without a queue manager".format(type(self).__name__))
+
+
+class QueueManager(_NeedsPymqi):
+    pass
+
+
+class Queue(_NeedsPymqi):
+    pass
+
+
+class Topic(_NeedsPymqi):
+    pass
+
+
+class Subscription(_NeedsPymqi):
+    pass
+
+
+class PCFExecute(_NeedsPymqi):
+    pass
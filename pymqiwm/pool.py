@@ -0,0 +1,205 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager, suppress
+from pymqiwm.mqi import MQMIError
+from pymqiwm.consts import DEFAULT_CHANNEL, CONNECTION_BROKEN_REASONS
+from pymqiwm.queue_manager import WMQueueManager
+
+
+class _PooledConnection(object):
+    __slots__ = ("qmgr", "last_used", "broken")
+
+    def __init__(self, qmgr: WMQueueManager):
+        self.qmgr = qmgr
+        self.last_used = time.monotonic()
+        self.broken = False
+
+
+class WMQueueManagerPool(object):
+    """
+
+        A pool of connections to the same queue manager, shared across threads.
+        Every connection is a `WMQueueManager` made with the same channel, connection info and credentials,
+        so threads using the pool don't block each other on a single shared connection handle.
+
+        Usage:
+            >>> pool = WMQueueManagerPool(name=..., conn_info=..., size=8)
+
+            >>> with pool:
+            >>>     with pool.connection() as qmgr:
+            >>>         with WMQueue(qmgr, "DAVAY") as queue:
+            >>>             queue.put("test")
+
+        Connections are made on demand, up to `size` of them.
+        A connection that raised one of the connection broken reasons is reconnected before its next use,
+        and a connection that was idle for more than `health_check_interval` seconds is checked first.
+        If the block using a connection raises, its open unit of work is backed out before it returns to the pool.
+
+    """
+
+    def __init__(self,
+                 name: str,
+                 conn_info: str,
+                 channel=DEFAULT_CHANNEL,
+                 user=None,
+                 password=None,
+                 size=4,
+                 acquire_timeout=None,
+                 health_check_interval=30,
+                 backend=None):
+        assert size > 0, "The pool size has to be positive"
+        self._name = name
+        self._conn_info = conn_info
+        self._channel = channel
+        self._user = user
+        self._password = password
+        self._backend = backend
+        self.size = size
+        self.acquire_timeout = acquire_timeout
+        self.health_check_interval = health_check_interval
+
+        self._condition = threading.Condition()
+        self._idle = deque()
+        self._all = []
+        self._closed = False
+        self._waiting = 0
+        self._acquired = 0
+        self._acquire_seconds = 0.0
+        self._max_acquire_seconds = 0.0
+        self._reconnects = 0
+
+    def __enter__(self):
+        self._closed = False
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    @contextmanager
+    def connection(self, timeout=None):
+        """
+        Hands out a connected `WMQueueManager` for the duration of the `with` block.
+        :param timeout: Max seconds to wait for a free connection, defaults to `acquire_timeout`,
+                        None waits forever. Raises TimeoutError when it runs out.
+        """
+        pooled = self._acquire(self.acquire_timeout if timeout is None else timeout)
+        try:
+            yield pooled.qmgr
+        except MQMIError as e:
+            if e.reason in CONNECTION_BROKEN_REASONS:
+                pooled.broken = True
+            else:
+                self._backout(pooled)
+            raise
+        except BaseException:
+            self._backout(pooled)
+            raise
+        finally:
+            self._release(pooled)
+
+    def stats(self) -> dict:
+        """ Returns a snapshot of the pool usage """
+        with self._condition:
+            return {
+                "size": self.size,
+                "connections": len(self._all),
+                "idle": len(self._idle),
+                "in use": len(self._all) - len(self._idle),
+                "waiting": self._waiting,
+                "acquired": self._acquired,
+                "reconnects": self._reconnects,
+                "average acquire ms": self._acquire_seconds / self._acquired * 1000 if self._acquired else 0.0,
+                "max acquire ms": self._max_acquire_seconds * 1000,
+            }
+
+    def close(self):
+        """ Disconnects the idle connections, the ones in use are disconnected when they are released """
+        with self._condition:
+            self._closed = True
+            idle, self._idle = list(self._idle), deque()
+            for pooled in idle:
+                self._all.remove(pooled)
+            self._condition.notify_all()
+        for pooled in idle:
+            self._disconnect(pooled)
+
+    def _acquire(self, timeout) -> _PooledConnection:
+        start = time.monotonic()
+        deadline = None if timeout is None else start + timeout
+        with self._condition:
+            self._waiting += 1
+            try:
+                while True:
+                    assert not self._closed, "The pool is closed"
+                    if self._idle:
+                        pooled = self._idle.pop()  # the most recently used connection is the least likely to be stale
+                        break
+                    if len(self._all) < self.size:
+                        pooled = None
+                        self._all.append(pooled)  # reserve the slot, connecting is done outside of the lock
+                        break
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        raise TimeoutError("No free connection in the pool after {0} seconds".format(timeout))
+                    self._condition.wait(remaining)
+            finally:
+                self._waiting -= 1
+
+        try:
+            if pooled is None:
+                pooled = self._connect()
+            elif pooled.broken or self._is_stale(pooled):
+                self._reconnect(pooled)
+        except BaseException:
+            with self._condition:
+                self._all.remove(pooled)
+                self._condition.notify()
+            raise
+
+        waited = time.monotonic() - start
+        with self._condition:
+            self._acquired += 1
+            self._acquire_seconds += waited
+            self._max_acquire_seconds = max(self._max_acquire_seconds, waited)
+        return pooled
+
+    def _release(self, pooled: _PooledConnection):
+        pooled.last_used = time.monotonic()
+        with self._condition:
+            if not self._closed:
+                self._idle.append(pooled)
+                self._condition.notify()
+                return
+            self._all.remove(pooled)
+        self._disconnect(pooled)
+
+    def _connect(self) -> _PooledConnection:
+        qmgr = WMQueueManager(self._name, self._conn_info, channel=self._channel,
+                              user=self._user, password=self._password, backend=self._backend)
+        qmgr._safe_connect()
+        pooled = _PooledConnection(qmgr)
+        with self._condition:
+            self._all[self._all.index(None)] = pooled
+        return pooled
+
+    def _is_stale(self, pooled: _PooledConnection) -> bool:
+        """ Checks a connection that was idle for too long, `is_connected` pings the queue manager """
+        if time.monotonic() - pooled.last_used < self.health_check_interval:
+            return False
+        return not pooled.qmgr.is_connected
+
+    def _reconnect(self, pooled: _PooledConnection):
+        self._disconnect(pooled)
+        pooled.qmgr._safe_connect()
+        pooled.broken = False
+        with self._condition:
+            self._reconnects += 1
+
+    def _backout(self, pooled: _PooledConnection):
+        with suppress(Exception):
+            pooled.qmgr.backout()
+
+    def _disconnect(self, pooled: _PooledConnection):
+        with suppress(Exception):
+            pooled.qmgr.__exit__(None, None, None)
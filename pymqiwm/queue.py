@@ -1,12 +1,336 @@
-from contextlib import suppress
-from pymqi import Queue, QueueManager
-from pymqi import MQMIError
-from pymqi import MD, GMO
-from pymqi.CMQC import (MQIA_CURRENT_Q_DEPTH, MQRC_NO_MSG_AVAILABLE,
-                        MQRC_NOT_OPEN_FOR_INPUT, MQRC_NOT_OPEN_FOR_OUTPUT,
-                        MQMI_NONE, MQGMO_WAIT, MQGMO_FAIL_IF_QUIESCING,
-                        MQGMO_BROWSE_NEXT, MQWI_UNLIMITED, MQGI_NONE,
-                        MQCI_NONE, MQOO_BROWSE)
+import os
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager, suppress
+from queue import Queue as _Buffer, Empty, Full
+from pymqiwm.mqi import Queue, QueueManager
+from pymqiwm.mqi import MQMIError, PYIFError
+from pymqiwm.mqi import MD, GMO, PMO, OD
+from pymqiwm.mqi.CMQC import (MQIA_CURRENT_Q_DEPTH, MQRC_NO_MSG_AVAILABLE,
+                              MQMI_NONE, MQGMO_WAIT, MQGMO_NO_WAIT, MQGMO_FAIL_IF_QUIESCING,
+                              MQGMO_BROWSE_FIRST, MQGMO_BROWSE_NEXT, MQWI_UNLIMITED, MQGI_NONE,
+                              MQCI_NONE, MQOO_BROWSE, MQGMO_SYNCPOINT, MQPMO_SYNCPOINT,
+                              MQPMO_FAIL_IF_QUIESCING, MQFMT_NONE, MQOO_INPUT_AS_Q_DEF,
+                              MQOO_INPUT_SHARED, MQOO_INPUT_EXCLUSIVE, MQOO_OUTPUT, MQOO_INQUIRE,
+                              MQRC_TRUNCATED_MSG_FAILED, MQGMO_ACCEPT_TRUNCATED_MSG, MQMO_MATCH_MSG_ID,
+                              MQMO_MATCH_CORREL_ID, MQMT_REQUEST, MQ_CORREL_ID_LENGTH, MQPMO_ASYNC_RESPONSE,
+                              MQRC_OPTIONS_ERROR, MQRC_PMO_ERROR, MQRC_NONE, MQOO_READ_AHEAD, MQOO_FAIL_IF_QUIESCING,
+                              MQMO_MATCH_GROUP_ID, MQRC_TRUNCATED_MSG_ACCEPTED, MQGMO_VERSION_2, MQMD_VERSION_2,
+                              MQOD_VERSION_4, MQIA_BACKOUT_THRESHOLD, MQCA_BACKOUT_REQ_Q_NAME, MQPMO_LOGICAL_ORDER,
+                              MQGMO_LOGICAL_ORDER, MQGMO_ALL_MSGS_AVAILABLE, MQMF_MSG_IN_GROUP, MQMF_LAST_MSG_IN_GROUP,
+                              MQMO_NONE)
+from pymqiwm.codec import get_codec
+from pymqiwm.consts import CONNECTION_BROKEN_REASONS
+from pymqiwm.message import WMMessage, BrowseCursor
+
+_INPUT_OPTIONS = MQOO_INPUT_AS_Q_DEF | MQOO_INPUT_SHARED | MQOO_INPUT_EXCLUSIVE
+
+# `with_descriptor` of the read generators that yields (body, MD) with the MD of the generator itself,
+# which is only valid until the next message, for the callers that need all of its fields
+_RAW_MD = object()
+
+
+class _BufferSize(object):
+    """
+    The max_length passed to MQGET when the caller did not set one.
+    Starts like pymqi at 4096 bytes, grows to the next power of two that fits the largest message seen
+    (up to `cap`), and shrinks by half after `_SHRINK_AFTER` messages in a row fit in a quarter of it,
+    so a queue of big messages costs one MQGET per message instead of a truncated MQGET and a second one.
+    """
+
+    _INITIAL = 4096
+    _SHRINK_AFTER = 256
+
+    def __init__(self, cap):
+        self.cap = cap
+        self.size = min(self._INITIAL, cap)
+        self._small_in_a_row = 0
+
+    def fit(self, length):
+        """ Returns the length to pass to MQGET for a message of `length` bytes, and grows for the next ones """
+        size = self._INITIAL
+        while size < length:
+            size *= 2
+        self.size = max(self.size, min(size, self.cap))
+        self._small_in_a_row = 0
+        return max(self.size, length)
+
+    def seen(self, length):
+        if length * 4 <= self.size and self.size > self._INITIAL:
+            self._small_in_a_row += 1
+            if self._small_in_a_row >= self._SHRINK_AFTER:
+                self.size //= 2
+                self._small_in_a_row = 0
+        else:
+            self._small_in_a_row = 0
+
+
+class _SyncpointBatch(object):
+    """
+    Keeps count of the messages in the current unit of work of a connection,
+    and commits it every `size` messages or every `interval_ms` milliseconds, whichever comes first.
+    """
+
+    def __init__(self, qmgr, size, interval_ms=None):
+        assert size > 0, "The batch size has to be positive"
+        self.qmgr = qmgr
+        self.size = size
+        self.interval = interval_ms / 1000.0 if interval_ms else None
+        self.pending = 0
+        self.before_commit = None  # called before every commit, an exception it raises stops the commit
+        self.after_commit = None  # called once a commit succeeded
+        self.on_drop = None  # called when the unit of work was lost with a broken connection, see `drop`
+        self._started = 0.0
+
+    def add(self):
+        """ Counts a message that was put or got under syncpoint """
+        if not self.pending:
+            self._started = time.monotonic()
+            open_batches = getattr(self.qmgr, "_open_batches", None)  # not tracked on a raw pymqi QueueManager
+            if open_batches is not None:
+                open_batches.add(self)
+        self.pending += 1
+
+    @property
+    def due(self) -> bool:
+        return self.pending >= self.size or (
+            self.pending and self.interval is not None and time.monotonic() - self._started >= self.interval)
+
+    def commit_if_due(self):
+        if self.due:
+            self.commit()
+
+    def commit(self):
+        if self.pending:
+            if self.before_commit is not None:
+                self.before_commit()
+            self.qmgr.commit()
+            self._close()
+            if self.after_commit is not None:
+                self.after_commit()
+
+    def backout(self):
+        """ Backs out the unit of work, never hides the exception that caused the backout """
+        if self.pending:
+            self._close()
+            with suppress(Exception):
+                self.qmgr.backout()
+
+    def drop(self):
+        """ Forgets the unit of work that the queue manager backed out when the connection broke """
+        self._close()
+        if self.on_drop is not None:
+            self.on_drop()
+
+    def _close(self):
+        self.pending = 0
+        open_batches = getattr(self.qmgr, "_open_batches", None)
+        if open_batches is not None:
+            open_batches.discard(self)
+
+
+class _AsyncProducer(object):
+    """
+    Puts messages with MQPMO_ASYNC_RESPONSE, see `WMQueue.async_producer`.
+    Every `check_every` messages, the results of the puts are collected with MQSTAT, or when the backend
+    can't get them (or `syncpoint` is set), the messages are put under syncpoint and the unit of work is committed.
+    """
+
+    # The reasons a put fails with when the client or the server does not support asynchronous put
+    _UNSUPPORTED_REASONS = frozenset((MQRC_OPTIONS_ERROR, MQRC_PMO_ERROR))
+
+    def __init__(self, queue, check_every, syncpoint):
+        assert check_every > 0, "check_every has to be positive"
+        self.queue = queue
+        self.check_every = check_every
+        self.report = {
+            "put": 0,
+            "confirmed": 0,
+            "warnings": 0,
+            "failed": 0,
+            "reasons": Counter(),  # reason code to the number of messages that failed with it
+            "asynchronous": True,
+        }
+        self._status = getattr(queue.qmgr, "async_put_status", None)
+        self._batch = _SyncpointBatch(queue.qmgr, check_every) if syncpoint else None
+        self._unchecked = 0
+        self._md = queue._get_message_descriptor()
+        self._pmo = PMO()
+        self._pmo.Options = MQPMO_ASYNC_RESPONSE | MQPMO_FAIL_IF_QUIESCING
+
+    def __enter__(self):
+        if self._batch is None and (self._status is None or self._status() is None):
+            # no MQSTAT, the only way to know the puts succeeded is the commit
+            self._batch = _SyncpointBatch(self.queue.qmgr, self.check_every)
+        if self._batch is not None:
+            self._pmo.Options |= MQPMO_SYNCPOINT
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is not None and self._batch is not None:
+            self._batch.backout()
+            self.report["failed"] += self._unchecked
+            self._unchecked = 0
+            return
+        self.check()
+
+    def put(self, msg, md=None):
+        """
+        Puts a message without waiting for the queue manager to confirm it.
+        A failure is only known on the next check, and is counted in `report` instead of being raised,
+        apart from the connection breaking or the queue manager quiescing.
+        """
+        if md is None:
+            md = self._md
+            self.queue._reset_md(md)
+            md.Format = MQFMT_NONE
+        if self.queue.codec is not None:
+            msg, (md,) = self.queue._encode(msg, (md,))
+        try:
+            # not `queue.put`, its retry after a reconnect would hide that the unchecked puts are unknown
+            self.queue._handle(MQOO_OUTPUT).put(msg, md, self._pmo)
+        except MQMIError as e:
+            if self.report["asynchronous"] and e.reason in self._UNSUPPORTED_REASONS:
+                self._fall_back_to_synchronous()
+                return self.put(msg, md)
+            self._failed(e)
+        else:
+            if self.report["asynchronous"] or self._batch is not None:
+                self._unchecked += 1
+            else:
+                self.report["confirmed"] += 1  # a synchronous put outside of syncpoint is done once it returns
+        self.report["put"] += 1
+        if self._batch is not None:
+            self._batch.add()
+        if self._unchecked >= self.check_every:
+            self.check()
+
+    def check(self):
+        """ Collects the results of the puts made since the previous check """
+        if self._batch is not None:
+            try:
+                self._batch.commit()
+            except MQMIError as e:
+                if e.reason in CONNECTION_BROKEN_REASONS:
+                    raise
+                self.report["failed"] += self._unchecked
+                self.report["reasons"][e.reason] += self._unchecked
+            else:
+                self.report["confirmed"] += self._unchecked
+            self._unchecked = 0
+            return
+
+        if not self._unchecked:
+            return
+        status = self._status()
+        self.report["confirmed"] += status["success"]
+        self.report["warnings"] += status["warning"]
+        self.report["failed"] += status["failure"]
+        if status["failure"] and status["reason"] != MQRC_NONE:
+            # MQSTAT only returns the reason of the first failure
+            self.report["reasons"][status["reason"]] += status["failure"]
+        self._unchecked = 0
+
+    def _fall_back_to_synchronous(self):
+        self.report["asynchronous"] = False
+        self._pmo.Options &= ~MQPMO_ASYNC_RESPONSE
+
+    def _failed(self, error):
+        if error.reason in CONNECTION_BROKEN_REASONS:
+            raise error
+        self.report["failed"] += 1
+        self.report["reasons"][error.reason] += 1
+
+
+class _MessageStream(object):
+    """
+    Gets messages on a background thread into a buffer of `prefetch` messages, see `WMQueue.stream_messages`.
+    """
+
+    _END = object()
+
+    def __init__(self, queue, handle, seconds_wait_interval, prefetch, max_length):
+        assert prefetch > 0, "The prefetch window has to be positive"
+        self.queue = queue
+        self.handle = handle
+        self.seconds_wait_interval = seconds_wait_interval
+        self.max_length = max_length
+        self._buffer = _Buffer(prefetch)
+        self._unsent = []
+        self._error = None
+        self._stopping = threading.Event()
+        self._thread = threading.Thread(target=self._get_messages, name="{0}-stream".format(queue.name), daemon=True)
+        self._thread.start()
+
+    def __iter__(self):
+        while True:
+            item = self._buffer.get()
+            if item is self._END:
+                if self._error is not None:
+                    raise self._error
+                return
+            yield item
+
+    def close(self):
+        """ Stops the getter, puts the messages that were got but not yielded back on the queue """
+        self._stopping.set()
+        leftovers = []
+        while self._thread.is_alive():
+            leftovers.extend(self._drain())
+            self._thread.join(0.05)
+        leftovers.extend(self._drain())
+        try:
+            for message, md in leftovers + self._unsent:
+                self.queue._put(message, md)  # not decoded yet
+        finally:
+            self.handle.close()
+
+    def _drain(self):
+        items = []
+        with suppress(Empty):
+            while True:
+                item = self._buffer.get_nowait()
+                if item is not self._END:
+                    items.append(item)
+        return items
+
+    def _get_messages(self):
+        # gets that wait at most this long, so a stop is noticed quickly
+        wait_slice = 0.1 if self.seconds_wait_interval == -1 else min(0.1, self.seconds_wait_interval)
+        gmo = self.queue._get_and_wait_gmo(wait_interval=int(wait_slice * 1000))
+        md = self.queue._get_message_descriptor()
+        idle_since = time.monotonic()
+        try:
+            while not self._stopping.is_set():
+                try:
+                    message = self.queue._get_from(self.handle, self.max_length, md, gmo)
+                except MQMIError as e:
+                    if e.reason != MQRC_NO_MSG_AVAILABLE:
+                        raise
+                    if self.seconds_wait_interval != -1 and \
+                            time.monotonic() - idle_since >= self.seconds_wait_interval:
+                        return
+                    continue
+                idle_since = time.monotonic()
+                self._hand_over((message, md))
+                md = self.queue._get_message_descriptor()  # handed over with the message, to put it back on close
+        except BaseException as e:
+            self._error = e
+        finally:
+            self._hand_over(self._END)
+
+    def _hand_over(self, item):
+        """ Waits for room in the prefetch window, keeps the message to put it back if the stream is closed """
+        while True:
+            try:
+                self._buffer.put(item, timeout=0.1)
+                return
+            except Full:
+                if self._stopping.is_set():
+                    if item is not self._END:
+                        self._unsent.append(item)
+                    return
 
 
 class WMQueue(object):
@@ -21,23 +345,63 @@ class WMQueue(object):
              >>> with queue:
              >>>     ...
 
+        Every access type (input, output, browse, inquire) gets its own handle, opened on first use
+        and kept open until the `with` exits, so mixing put/get/browse never closes and reopens the queue.
+        When `open_options` is given, the queue is opened once with them on enter and that handle is used
+        for every access type the options include, for example:
+
+             >>> queue = WMQueue(qmgr=..., name=..., open_options=MQOO_INPUT_AS_Q_DEF | MQOO_OUTPUT | MQOO_BROWSE)
+
+        `depth` (and so the comparison operators) makes an MQINQ per call, unless the depth is cached for
+        `depth_ttl` seconds, or read from the cache of a `QueueStatsPoller` passed as `stats`.
+
+        When the queue manager was made with `reconnect=True`, the handles are reopened after a reconnect,
+        and a put, get or read that failed because the connection broke is retried on the new connection.
+
+        With a `codec` (see `pymqiwm.codec`), `put` takes objects and sets the Format of the messages,
+        and `get` and every read generator return the decoded objects:
+
+             >>> with WMQueue(qmgr=..., name=..., codec="json") as queue:
+             >>>     queue.put({"id": 7})
+             >>>     orders = queue.get_many(100)  # decoded a batch at a time
+
     """
 
-    def __init__(self, qmgr, name: str):
+    def __init__(self, qmgr, name: str, open_options=None, max_buffer_size=4194304, depth_ttl=0, stats=None,
+                 codec=None):
         self.qmgr = qmgr
         self.name = name
-        if isinstance(qmgr, QueueManager):
-            self.queue = Queue(qmgr, name)
-        else:  # if the qmgr passed is of type WMQueueManager
-            self.queue = Queue(qmgr.qmgr, name)
+        self.open_options = open_options
+        self._resilient = getattr(qmgr, "reconnect", False)
+        self._generation = getattr(qmgr, "generation", 0)
+        self.depth_ttl = depth_ttl
+        self.stats = stats
+        self.codec = get_codec(codec)
+        self._depth = None
+        self._depth_at = 0.0
+        self.queue = self._new_queue()
+        self.truncation_retries = 0  # gets of a message bigger than the buffer, that needed a second MQGET
+        self.poison_messages = 0  # messages moved to the backout queue by `read_messages_in_batches(poison=True)`
+        self._backout_policy = None
+        self._backout_queue = None
+        self._buffer = _BufferSize(max_buffer_size)
+        self._handles = {}
 
     def __enter__(self):
         assert self.qmgr.is_connected, "Has to be connected to the queue manager"
-        self.queue.open(self.name)
+        self._open()
         return self
 
+    def _open(self):
+        if self.open_options is None:
+            self.queue.open(self.name)  # deferred, the handles per access type are opened on first use
+        else:
+            self.queue.open(self.name, self.open_options)
+
     def __exit__(self, exc_type, exc_val, exc_tb):
-        self.queue.close()
+        self._close_handles()
+        with suppress(PYIFError):  # the deferred open was never used
+            self.queue.close()
 
     """
     For the following operators, the usage is:
@@ -69,29 +433,35 @@ class WMQueue(object):
     def put(self, msg, *opts):
         """
         A function that lets you perform the 'put' action without worrying about anything.
-        If the queue is not open for performing the 'put' action, it will reset the open options accordingly.
+        If the queue is not open for performing the 'put' action yet, an output handle is opened and kept.
         Usage:
          >>> queue = WMQueue(qmgr=..., name=...)
          >>> with queue:
          >>>     queue.put(msg="Test")
-        :param msg: The body of the message that will be written to the queue
+        :param msg: The body of the message that will be written to the queue, or the object to encode with the codec.
         :param opts: can be specified for further instructions.
         :type msg: str
         """
-        try:
-            self.queue.put(msg, *opts)
-        except MQMIError as e:
-            if e.reason == MQRC_NOT_OPEN_FOR_OUTPUT:
-                self._reset_open_options()
-                self.queue.put(msg, *opts)
-                return
-            raise
+        if self.codec is not None:
+            msg, opts = self._encode(msg, opts)
+        return self._put(msg, *opts)
+
+    def _put(self, msg, *opts):
+        """ Puts a body that is already encoded """
+        while True:
+            try:
+                return self._handle(MQOO_OUTPUT).put(msg, *opts)
+            except MQMIError as e:
+                syncpoint = len(opts) > 1 and opts[1] is not None and opts[1].Options & MQPMO_SYNCPOINT
+                if syncpoint or not self._recover(e):
+                    raise
 
     def get(self, max_length=None, *opts):
         """
         A function that lets you perform the 'get' action without worrying about anything.
-        If the queue is not open for performing the 'get' action, it will reset the open options accordingly.
+        If the queue is not open for performing the 'get' action yet, an input handle is opened and kept.
         If there are no messages to pull from the queue it will only raise the exception.
+        If `max_length` is not set, the buffer is sized from the messages got before, see `buffer_size`.
         Usage:
          >>> queue = WMQueue(qmgr=..., name=...)
          >>> with queue:
@@ -99,25 +469,312 @@ class WMQueue(object):
         :param max_length: max can length can be set for the message that is being red
         :param opts: can be specified for further instructions.
         :type max_length: int or None
-        :return: Option 1: A message from the queue
+        :return: Option 1: A message from the queue, decoded if the queue has a codec
                  Option 2: None meaning that there are no more messages in the queue
         """
+        message = self._get(max_length, *opts)
+        return message if self.codec is None else self.codec.decode(message)
+
+    def _get(self, max_length=None, *opts):
+        """ Gets a body without decoding it """
+        while True:
+            try:
+                return self._get_from(self._handle(MQOO_INPUT_AS_Q_DEF), max_length, *opts)
+            except MQMIError as e:
+                syncpoint = len(opts) > 1 and opts[1] is not None and opts[1].Options & MQGMO_SYNCPOINT
+                if syncpoint or not self._recover(e):
+                    raise
+
+    def get_message(self, max_length=None, *opts) -> WMMessage:
+        """
+        The same as `get`, but returns a `WMMessage` with the MsgId, CorrelId and the other MD fields of the message.
+        Usage:
+         >>> queue = WMQueue(qmgr=..., name=...)
+         >>> with queue:
+         >>>     message = queue.get_message()
+         >>>     print(message.msg_id, message.body)
+        """
+        md = opts[0] if opts else self._get_message_descriptor()
+        return WMMessage.from_md(self.get(max_length, md, *opts[1:]), md)
+
+    def get_by_msg_id(self, msg_id: bytes, seconds_wait_interval=0, max_length=None, with_descriptor=False):
+        """
+        Gets the message with the given MsgId, the queue manager finds it, the other messages are not red.
+        Raises MQMIError with MQRC_NO_MSG_AVAILABLE if it is not on the queue within `seconds_wait_interval`.
+        Usage:
+         >>> queue = WMQueue(qmgr=..., name=...)
+         >>> with queue:
+         >>>     message = queue.get_by_msg_id(message.msg_id)
+        :param seconds_wait_interval: Seconds to wait for the message to arrive, -1 waits forever.
+        :param with_descriptor: Return a `WMMessage` instead of the body.
+        """
+        md = self._get_message_descriptor()
+        md.MsgId = msg_id
+        return self._get_matching(md, MQMO_MATCH_MSG_ID, seconds_wait_interval, max_length, with_descriptor)
+
+    def get_by_correl_id(self, correl_id: bytes, seconds_wait_interval=0, max_length=None, with_descriptor=False):
+        """
+        Gets the first message with the given CorrelId, for example the reply to a request.
+        Same as `get_by_msg_id` otherwise.
+        """
+        md = self._get_message_descriptor()
+        md.CorrelId = correl_id
+        return self._get_matching(md, MQMO_MATCH_CORREL_ID, seconds_wait_interval, max_length, with_descriptor)
+
+    def request(self, msg, reply_queue, timeout=5, max_length=None, with_descriptor=False):
+        """
+        Puts a request message with a new CorrelId and waits for the reply with the same CorrelId on `reply_queue`.
+        The server is expected to copy the CorrelId of the request to the reply (MQRO_PASS_CORREL_ID).
+        For many requests in flight at once, `WMRequester` waits for all of them with a single reader.
+        Usage:
+         >>> with WMQueue(qmgr, "REQUESTS") as requests, WMQueue(qmgr, "REPLIES") as replies:
+         >>>     reply = requests.request("ping", replies, timeout=5)
+        :param reply_queue: The `WMQueue` the reply will arrive to, its name is set as the ReplyToQ of the request.
+        :param timeout: Seconds to wait for the reply, the request expires from the queue after them too.
+                        Raises MQMIError with MQRC_NO_MSG_AVAILABLE when there is no reply by then.
+        """
+        correl_id = self.put_request(msg, reply_queue.name, timeout)
+        return reply_queue.get_by_correl_id(correl_id, timeout, max_length, with_descriptor)
+
+    def put_request(self, msg, reply_to_q: str, timeout=None) -> bytes:
+        """
+        Puts a request message with a new CorrelId and `reply_to_q` as its ReplyToQ.
+        :param timeout: Seconds after which the request expires if nobody got it, None never expires.
+        :return: The CorrelId of the request.
+        """
+        md = self._get_message_descriptor()
+        md.CorrelId = os.urandom(MQ_CORREL_ID_LENGTH)
+        md.MsgType = MQMT_REQUEST
+        md.ReplyToQ = reply_to_q.encode()
+        if timeout is not None and timeout != -1:
+            md.Expiry = max(1, int(timeout * 10))  # in tenths of a second
+        self.put(msg, md)
+        return md.CorrelId
+
+    @property
+    def buffer_size(self) -> int:
+        """ The max length passed to MQGET when none is given, fitted to the sizes of the messages seen """
+        return self._buffer.size
+
+    def put_many(self, messages, batch_size=100, batch_interval_ms=None):
+        """
+        Puts all the messages under syncpoint, committing every `batch_size` messages
+        or every `batch_interval_ms` milliseconds, so persistent messages share a single log force per batch.
+        If a put fails, the messages of the current batch are backed out and the exception is raised,
+        the batches that were committed before it stay on the queue.
+        Usage:
+         >>> queue = WMQueue(qmgr=..., name=...)
+         >>> with queue:
+         >>>     queue.put_many(["Test1", "Test2", "Test3"], batch_size=2)
+        :param messages: An iterable of message bodies, can be a generator.
+        :param batch_size: Max number of messages in a single unit of work.
+        :param batch_interval_ms: Max time in milliseconds to keep a unit of work open, None for no limit.
+        :return: The number of messages that were put.
+        """
+        batch = _SyncpointBatch(self.qmgr, batch_size, batch_interval_ms)
+        md = self._get_message_descriptor()
+        pmo = self._syncpoint_pmo()
+        count = 0
         try:
-            message = self.queue.get(max_length, *opts)
-        except MQMIError as e:
-            if e.reason == MQRC_NOT_OPEN_FOR_INPUT:  # if queue was not open for reading
-                self._reset_open_options()
-                return self.queue.get(max_length, *opts)
+            for message in messages:
+                self.put(message, md, pmo)
+                batch.add()
+                count += 1
+                self._reset_md(md)
+                md.Format = MQFMT_NONE  # put sets the format of str messages, so it can't be left for the next one
+                batch.commit_if_due()
+            batch.commit()
+        except BaseException:
+            batch.backout()
             raise
-        else:
-            return message
+        return count
+
+    def put_stream(self, fileobj, chunk_size=1048576, md=None) -> bytes:
+        """
+        Puts the content of a file-like object (an open file, an mmap, a socket file, ...) as a message group,
+        one message per `chunk_size` bytes read from it, so a payload of any size is put with at most
+        two chunks in memory and no message is bigger than `chunk_size` (keep it under the MAXMSGL of the queue).
+        The group is put in a single unit of work, the readers see it only once all of it was put,
+        and if a put fails the messages that were put are backed out and the exception is raised.
+        The bodies are put as they were read, the codec of the queue is not used.
+        The stream owns the unit of work of the connection: it commits or backs out everything done under syncpoint
+        on it, so it can't be called while a batch of the connection (`put_many`, `get_many`, ...) is open.
+        Usage:
+         >>> queue = WMQueue(qmgr=..., name=...)
+         >>> with queue, open("dump.tar", "rb") as dump:
+         >>>     group_id = queue.put_stream(dump, chunk_size=4 * 1024 * 1024)
+        :param md: The MD of the messages, for example to set their persistence or CorrelId.
+        :return: The GroupId of the group, given by the queue manager.
+        """
+        assert chunk_size > 0, "The chunk size has to be positive"
+        self._assert_no_open_batch()
+        md = md if md is not None else self._get_message_descriptor()
+        md.Version = MQMD_VERSION_2
+        pmo = self._syncpoint_pmo()
+        pmo.Options |= MQPMO_LOGICAL_ORDER  # the queue manager sets the GroupId and the sequence numbers
+        handle = self._handle(MQOO_OUTPUT)
+        try:
+            chunk = fileobj.read(chunk_size)
+            while True:
+                following = fileobj.read(chunk_size)  # read ahead, the last message of the group has to be flagged
+                md.MsgFlags = MQMF_MSG_IN_GROUP if following else MQMF_LAST_MSG_IN_GROUP
+                md.MsgId = MQMI_NONE
+                handle.put(chunk, md, pmo)
+                if not following:
+                    break
+                chunk = following
+            self.qmgr.commit()
+        except BaseException:
+            with suppress(Exception):
+                self.qmgr.backout()
+            raise
+        return md.GroupId
+
+    def get_stream(self, fileobj, seconds_wait_interval=0, max_length=None) -> int:
+        """
+        Gets the next message group whose messages are all on the queue (like the ones of `put_stream`),
+        and writes their bodies in order to a file-like object, a message at a time.
+        The group is got in a single unit of work, it is committed once all of it was written,
+        and if a get or a write fails it is backed out to the queue and the exception is raised.
+        A message that is not in a group counts as a group of one message.
+        Raises MQMIError with MQRC_NO_MSG_AVAILABLE if no complete group is on the queue within `seconds_wait_interval`.
+        Like `put_stream`, it owns the unit of work of the connection and can't be called while a batch is open.
+        Usage:
+         >>> queue = WMQueue(qmgr=..., name=...)
+         >>> with queue, open("dump.tar", "wb") as dump:
+         >>>     size = queue.get_stream(dump, seconds_wait_interval=60)
+        :param seconds_wait_interval: Seconds to wait for a complete group, -1 waits forever.
+        :param max_length: Max length of a message of the group, by default the adaptive buffer size.
+        :return: The number of bytes written.
+        """
+        self._assert_no_open_batch()
+        md = self._get_message_descriptor()
+        md.Version = MQMD_VERSION_2
+        gmo = self._get_and_wait_gmo(
+            wait_interval=MQWI_UNLIMITED if seconds_wait_interval == -1 else int(seconds_wait_interval * 1000)
+        )
+        gmo.Version = MQGMO_VERSION_2
+        gmo.Options |= MQGMO_SYNCPOINT | MQGMO_LOGICAL_ORDER | MQGMO_ALL_MSGS_AVAILABLE
+        gmo.MatchOptions = MQMO_NONE  # the queue manager keeps the position in the group
+        handle = self._handle(MQOO_INPUT_AS_Q_DEF)
+        written = 0
+        got = False
+        try:
+            while True:
+                chunk = self._get_from(handle, max_length, md, gmo)
+                got = True
+                fileobj.write(chunk)
+                written += len(chunk)
+                if not md.MsgFlags & MQMF_MSG_IN_GROUP or md.MsgFlags & MQMF_LAST_MSG_IN_GROUP:
+                    break
+                self._reset_md(md)
+            self.qmgr.commit()
+        except BaseException:
+            if got:
+                with suppress(Exception):
+                    self.qmgr.backout()
+            raise
+        return written
+
+    def _assert_no_open_batch(self):
+        assert not getattr(self.qmgr, "has_open_batch", False), \
+            "A batch of this connection is not committed yet, a stream would commit or back it out with its own"
+
+    def async_producer(self, check_every=1000, syncpoint=False):
+        """
+        Returns a producer that puts messages with asynchronous put response (MQPMO_ASYNC_RESPONSE),
+        so a client does not wait for a network round trip per message.
+        The results of the puts are collected every `check_every` messages and when the `with` exits,
+        and the failures are counted in `producer.report` instead of being raised.
+        If the server does not support asynchronous put, the producer falls back to synchronous puts.
+        Usage:
+         >>> queue = WMQueue(qmgr=..., name=...)
+         >>> with queue:
+         >>>     with queue.async_producer(check_every=500) as producer:
+         >>>         for message in messages:
+         >>>             producer.put(message)
+         >>>     print(producer.report)
+        :param check_every: Number of messages between two checks of the results of the puts.
+        :param syncpoint: Put under syncpoint and commit on every check, this is also what happens
+                          when the backend can't get the results of the puts with MQSTAT.
+                          If the `with` body raises, the messages since the last check are backed out.
+        """
+        return _AsyncProducer(self, check_every, syncpoint)
+
+    def get_many(self, count, batch_size=100, batch_interval_ms=None, max_length=None, with_descriptor=False):
+        """
+        Gets up to `count` messages under syncpoint, committing every `batch_size` messages
+        or every `batch_interval_ms` milliseconds.
+        Does not wait for new messages, returns less than `count` messages if the queue runs out of them.
+        If a get fails, the messages of the current batch are backed out to the queue, and the exception is raised
+        with the messages of the batches that were committed before it (they are off the queue)
+        in its `committed_messages` attribute.
+        With a codec, the messages of a batch are decoded together (`Codec.decode_many`) before it is committed,
+        so a batch with a message that can't be decoded is backed out too.
+        Usage:
+         >>> queue = WMQueue(qmgr=..., name=...)
+         >>> with queue:
+         >>>     messages = queue.get_many(500, batch_size=100)
+        :param count: Max number of messages to get.
+        :param batch_size: Max number of messages in a single unit of work.
+        :param batch_interval_ms: Max time in milliseconds to keep a unit of work open, None for no limit.
+        :param max_length: max length of a message that will be red from the queue
+        :param with_descriptor: Return `WMMessage` objects instead of the bodies.
+        :return: list of the messages.
+        """
+        messages = []  # the messages of the batches that were committed
+        if count <= 0:
+            return messages
+        got = []  # the messages of the current batch, not decoded yet
+        decoded = []  # the messages of the batch that is being committed
+
+        def decode_batch():
+            decoded.extend(self._decode_many(got, with_descriptor))
+            del got[:]
+
+        def keep_batch():
+            messages.extend(decoded)
+            del decoded[:]
+
+        def drop_batch():  # backed out with a broken connection, its messages are got again
+            del got[:]
+            del decoded[:]
+
+        batch = _SyncpointBatch(self.qmgr, batch_size, batch_interval_ms)
+        batch.before_commit = decode_batch
+        batch.after_commit = keep_batch
+        batch.on_drop = drop_batch
+        try:
+            for message in self._read_under_syncpoint(batch, 0, max_length, with_descriptor, decode=False):
+                got.append(message)
+                if len(messages) + len(got) == count:
+                    break
+            self._commit(batch)
+        except BaseException as e:
+            batch.backout()
+            e.committed_messages = messages
+            raise
+        return messages
 
     def depth(self):
-        return self.queue.inquire(MQIA_CURRENT_Q_DEPTH)
+        if self.stats is not None:
+            return self.stats.depth(self.name)
+        if self.depth_ttl and self._depth is not None and time.monotonic() - self._depth_at <= self.depth_ttl:
+            return self._depth
+        while True:
+            try:
+                self._depth = self._handle(MQOO_INQUIRE).inquire(MQIA_CURRENT_Q_DEPTH)
+                break
+            except MQMIError as e:
+                if not self._recover(e):
+                    raise
+        self._depth_at = time.monotonic()
+        return self._depth
 
     def read_messages_while_waiting(self,
                                     seconds_wait_interval=0,
-                                    max_length=None):
+                                    max_length=None,
+                                    with_descriptor=False):
         """
         Yields messages that are being red from the queue.
         Handles any "No more message on the queue" errors.
@@ -132,20 +789,21 @@ class WMQueue(object):
                         IF not specified:  Will exit as soon as there are no messages left on queue.
                         IF -1 specified: Will enter into an infinite loop yielding any message that enters the queue.
                         ELSE : Will wait the time specified before exiting the loop.
+        :param with_descriptor: Yield `WMMessage` objects with the MsgId, CorrelId etc. instead of the bodies.
         :type seconds_wait_interval: int
         :type max_length: int
         """
         keep_running = True
 
         gmo = self._get_and_wait_gmo(
-            wait_interval=abs(seconds_wait_interval) * 1000
+            wait_interval=int(abs(seconds_wait_interval) * 1000)
         )
         md = self._get_message_descriptor()
 
         while keep_running:
             try:
-                message = self.get(max_length, md, gmo)  # Wait up to gmo.WaitInterval for a new message.
-                yield message
+                message = self._get(max_length, md, gmo)  # Wait up to gmo.WaitInterval for a new message.
+                yield self._received(message, md, with_descriptor)
                 self._reset_md(md)
 
             except MQMIError as e:
@@ -155,10 +813,167 @@ class WMQueue(object):
                 else:
                     raise
 
-    def browse_messages(self, max_length=None):
+    @contextmanager
+    def read_messages_in_batches(self,
+                                 seconds_wait_interval=0,
+                                 max_length=None,
+                                 batch_size=100,
+                                 batch_interval_ms=None,
+                                 with_descriptor=False,
+                                 poison=False):
+        """
+        The same as `read_messages_while_waiting`, but the messages are red under syncpoint
+        and committed every `batch_size` messages or every `batch_interval_ms` milliseconds.
+        A message counts as done once the loop asks for the next one, and the open batch is also committed
+        as soon as the queue is empty, so messages are not held while waiting for new ones.
+        If the body of the `with` raises, the messages of the current batch are backed out to the queue,
+        leaving the `with` in any other way (including `break`) commits them.
+        With a codec, the messages of a batch are got first and decoded together (`Codec.decode_many`),
+        then yielded one by one, so a batch with a message that can't be decoded is backed out as a whole.
+        Usage:
+         >>> queue = WMQueue(qmgr=..., name=...)
+         >>> with queue:
+         >>>     with queue.read_messages_in_batches(5, batch_size=50) as messages:
+         >>>         for message in messages:
+         >>>             process(message)  # if process raises, the current batch goes back to the queue
+        :param seconds_wait_interval: Same as in `read_messages_while_waiting`.
+        :param max_length: max length of a message that will be red from the queue
+        :param batch_size: Max number of messages in a single unit of work.
+        :param batch_interval_ms: Max time in milliseconds to keep a unit of work open, None for no limit.
+        :param with_descriptor: Same as in `read_messages_while_waiting`.
+        :param poison: Move the messages that were backed out BOTHRESH times to the BOQNAME queue of the queue
+                       (see `backout_policy`) in the same unit of work instead of yielding them,
+                       so a message that always fails can't keep the batches behind it from being committed.
+        """
+        batch = _SyncpointBatch(self.qmgr, batch_size, batch_interval_ms)
+        try:
+            yield self._read_under_syncpoint(batch, seconds_wait_interval, max_length, with_descriptor, poison=poison)
+        except BaseException:
+            batch.backout()
+            raise
+        else:
+            self._commit(batch)
+
+    def _read_under_syncpoint(self, batch, seconds_wait_interval, max_length, with_descriptor, decode=True,
+                              poison=False):
+        wait_gmo = self._get_and_wait_gmo(
+            wait_interval=int(abs(seconds_wait_interval) * 1000)
+        )
+        wait_gmo.Options |= MQGMO_SYNCPOINT
+        no_wait_gmo = self._syncpoint_no_wait_gmo()
+        md = self._get_message_descriptor()
+        # with a codec, the messages of a unit of work are got first and decoded together (`Codec.decode_many`)
+        by_batch = decode and self.codec is not None and with_descriptor is not _RAW_MD
+        got = []  # the messages of the unit of work that were not yielded yet, not decoded
+
+        while True:
+            # While a batch is open, check for a message without waiting so the batch can be committed first.
+            gmo = no_wait_gmo if batch.pending else wait_gmo
+            try:
+                message = self._get(max_length, md, gmo)
+            except MQMIError as e:
+                if e.reason != MQRC_NO_MSG_AVAILABLE:
+                    if not self._recover(e):
+                        raise
+                    batch.drop()  # backed out with the broken connection, its messages are got again
+                    del got[:]
+                    continue
+                if got:
+                    yield from self._decode_many(got, with_descriptor)
+                    del got[:]
+                if batch.pending:
+                    self._commit(batch)
+                    if seconds_wait_interval == 0:
+                        return
+                elif seconds_wait_interval != -1:
+                    return
+                continue
+
+            batch.add()
+            if poison and self._is_poison(md):
+                self._move_to_backout_queue(message, md)
+            elif by_batch:
+                got.append(self._received(message, md, with_descriptor, decode=False))
+            else:
+                yield self._received(message, md, with_descriptor, decode)
+            self._reset_md(md)
+            if batch.due:
+                if got:
+                    yield from self._decode_many(got, with_descriptor)
+                    del got[:]
+                self._commit(batch)
+
+    def backout_policy(self) -> tuple:
+        """
+        Returns the backout threshold (BOTHRESH) and the backout queue (BOQNAME) of the queue,
+        they are inquired on the first call and cached for the life of the object.
+        A threshold of 0 or an empty queue name means the queue has no backout handling.
+        """
+        if self._backout_policy is None:
+            handle = self._handle(MQOO_INQUIRE)
+            threshold = handle.inquire(MQIA_BACKOUT_THRESHOLD)
+            name = handle.inquire(MQCA_BACKOUT_REQ_Q_NAME)
+            name = name.decode() if isinstance(name, bytes) else name
+            self._backout_policy = threshold, name.strip("\0 ")
+        return self._backout_policy
+
+    def _is_poison(self, md: MD) -> bool:
+        """ Whether the message got with `md` was backed out enough times to be moved to the backout queue """
+        threshold, name = self.backout_policy()
+        return bool(threshold and name) and md.BackoutCount >= threshold
+
+    def _move_to_backout_queue(self, message, md: MD):
+        """ Puts the (not decoded) message on the backout queue, in the unit of work it was got in """
+        if self._backout_queue is None:
+            self._backout_queue = WMQueue(self.qmgr, self.backout_policy()[1])
+            self._backout_queue.__enter__()
+        self._backout_queue._put(message, md, self._syncpoint_pmo())  # keeps the MsgId, CorrelId and Format
+        self.poison_messages += 1
+
+    def _commit(self, batch: _SyncpointBatch):
+        """ Commits the batch, if the connection broke it is dropped in the reconnect mode, like it was backed out """
+        try:
+            batch.commit()
+        except MQMIError as e:
+            if not self._recover(e):
+                raise
+            batch.drop()
+
+    def stream_messages(self, seconds_wait_interval=0, prefetch=1000, max_length=None, with_descriptor=False):
+        """
+        The same as `read_messages_while_waiting`, for high rates of small non-persistent messages.
+        The queue is opened with MQOO_READ_AHEAD, so the MQ client gets the next non-persistent messages
+        in the same network round trip (if read-ahead is allowed by the queue DEFREADA and the client config),
+        and a background thread keeps up to `prefetch` messages ready for the loop,
+        so the gets overlap with the processing of the messages.
+        Messages that were prefetched but not yielded are put back on the queue when the loop stops,
+        but the messages the MQ client read ahead and were not got yet are discarded by MQ on close,
+        like with any read-ahead, so use it for messages that can be lost.
+        The gets are made outside of syncpoint, on the same connection.
+        Usage:
+         >>> queue = WMQueue(qmgr=..., name=...)
+         >>> with queue:
+         >>>     for message in queue.stream_messages(-1, prefetch=5000):
+         >>>         process(message)
+        :param seconds_wait_interval: Same as in `read_messages_while_waiting`.
+        :param prefetch: Max number of messages got ahead of the loop.
+        :param with_descriptor: Yield `WMMessage` objects with the MsgId, CorrelId etc. instead of the bodies.
+        """
+        handle = self._new_queue()
+        handle.open(self.name, MQOO_INPUT_AS_Q_DEF | MQOO_READ_AHEAD | MQOO_FAIL_IF_QUIESCING)
+        stream = _MessageStream(self, handle, seconds_wait_interval, prefetch, max_length)
+        try:
+            for message, md in stream:
+                yield self._received(message, md, with_descriptor)
+        finally:
+            stream.close()
+
+    def browse_messages(self, max_length=None, with_descriptor=False, cursor: BrowseCursor = None,
+                        group_id=None, selector=None):
         """
         Lets you browse the messages that are on the queue atm by yielding them.
         Stops after it goes over all of the messages in the queue.
+        Every call starts again from the head of the queue, unless a `cursor` is passed.
         Browsing a message does not mean the message will be red form the queue.
         Usage:
          >>> queue = WMQueue(qmgr=..., name=...)
@@ -166,26 +981,136 @@ class WMQueue(object):
          >>>     for message in queue.browse_messages():
          >>>         print(str(message))
         :param max_length: Max length of message located on the queue that will be red
+        :param with_descriptor: Yield `WMMessage` objects with the MsgId, CorrelId etc. instead of the bodies.
+        :param cursor: A `BrowseCursor`, the browse resumes after the message it points to and moves it
+                       to every message that is yielded. The message is found again by its MsgId, if it was
+                       already removed from the queue, the messages put at or before its put time are skipped
+                       (the put time has a resolution of 1/100 second, so a message put in the same 1/100 second
+                       as the removed one is skipped too).
+        :param group_id: Browse only the messages of this GroupId.
+        :param selector: Browse only the messages whose properties match this selection string
+                         (for example "Region = 'EU'"), the queue is opened for this browse with it.
         :type max_length: int
         :return:
         """
-        self._reset_open_options(MQOO_BROWSE)
+        handle = self._handle(MQOO_BROWSE) if selector is None else self._selecting_handle(selector)
 
         keep_running = True
 
         gmo = self._browse_messages_gmo()
         md = self._get_message_descriptor()
+        position = cursor if cursor is not None else BrowseCursor()
+        put_at_or_before = None
+        try:
+            if position.msg_id:
+                put_at_or_before = self._resume_browse(handle, position, gmo)
+
+            while keep_running:
+                self._select_group(md, gmo, group_id)
+                try:
+                    message = self._get_from(handle, max_length, md, gmo)
+                    gmo.Options = MQGMO_BROWSE_NEXT
+                    if put_at_or_before is not None:
+                        if md.PutDate + md.PutTime <= put_at_or_before:
+                            self._reset_md(md)
+                            continue
+                        put_at_or_before = None
+                    position.advance(md.MsgId, md.PutDate, md.PutTime)
+                    yield self._received(message, md, with_descriptor)
+                    self._reset_md(md)
+                except MQMIError as e:
+                    if e.reason == MQRC_NO_MSG_AVAILABLE:
+                        keep_running = False  # There are no more messages on the queue to browse
+                    elif self._recover(e):
+                        # the browse cursor was lost with the connection, continue after the last message
+                        handle = self._handle(MQOO_BROWSE) if selector is None else self._selecting_handle(selector)
+                        gmo = self._browse_messages_gmo()
+                        self._reset_md(md)
+                        if position.msg_id:
+                            put_at_or_before = self._resume_browse(handle, position, gmo)
+                    else:
+                        raise  # there was an error browsing the queue
+        finally:
+            if selector is not None:
+                with suppress(Exception):
+                    handle.close()
+
+    def _resume_browse(self, handle, cursor: BrowseCursor, gmo: GMO):
+        """
+        Moves the browse cursor of `handle` to the message of `cursor`, so the next browse is of the message after it.
+        :return: None, or the put date and time to skip messages up to if the message is not on the queue anymore.
+        """
+        if self._browse_to(handle, cursor.msg_id):
+            gmo.Options = MQGMO_BROWSE_NEXT
+            return None
+        return cursor.put_date + cursor.put_time
+
+    def _browse_to(self, handle, msg_id) -> bool:
+        """ Moves the browse cursor of `handle` to the message with `msg_id`, False if it is not on the queue """
+        md = self._get_message_descriptor()
+        md.MsgId = msg_id
+        gmo = self._browse_messages_gmo()
+        gmo.Options |= MQGMO_ACCEPT_TRUNCATED_MSG
+        gmo.Version = MQGMO_VERSION_2
+        gmo.MatchOptions = MQMO_MATCH_MSG_ID
+        try:
+            handle.get(0, md, gmo)
+        except MQMIError as e:
+            if e.reason == MQRC_NO_MSG_AVAILABLE:
+                return False
+            if e.reason != MQRC_TRUNCATED_MSG_ACCEPTED:
+                raise
+        return True
 
-        while keep_running:
-            try:
-                message = self.get(max_length, md, gmo)
-                yield message
-                self._reset_md(md)
-            except MQMIError as e:
-                if e.reason == MQRC_NO_MSG_AVAILABLE:
-                    keep_running = False  # There are no more messages on the queue to browse
-                else:
-                    raise  # there was an error browsing the queue
+    def _select_group(self, md: MD, gmo: GMO, group_id):
+        """ Makes the next browse match only the messages of `group_id`, does nothing for None """
+        if group_id is not None:
+            md.Version = MQMD_VERSION_2
+            md.GroupId = group_id
+            gmo.Version = MQGMO_VERSION_2
+            gmo.MatchOptions = MQMO_MATCH_MSG_ID | MQMO_MATCH_CORREL_ID | MQMO_MATCH_GROUP_ID
+
+    def _selecting_handle(self, selector: str):
+        """ Returns a new browse handle that only sees the messages whose properties match `selector` """
+        od = OD(ObjectName=self.name.encode() if isinstance(self.name, str) else self.name, Version=MQOD_VERSION_4)
+        od.set_vs("SelectionString", selector.encode())
+        handle = self._new_queue()
+        handle.open(od, MQOO_BROWSE)
+        return handle
+
+    def _get_matching(self, md, match_options, seconds_wait_interval, max_length, with_descriptor):
+        gmo = self._get_and_wait_gmo(
+            wait_interval=MQWI_UNLIMITED if seconds_wait_interval == -1 else int(seconds_wait_interval * 1000)
+        )
+        gmo.MatchOptions = match_options
+        message = self.get(max_length, md, gmo)
+        return WMMessage.from_md(message, md) if with_descriptor else message
+
+    def _encode(self, msg, opts):
+        """ Encodes `msg` with the codec, and sets the format of the codec on the MD of `opts` (or a new one) """
+        md = opts[0] if opts and opts[0] is not None else self._get_message_descriptor()
+        md.Format = self.codec.format
+        if self.codec.ccsid is not None:
+            md.CodedCharSetId = self.codec.ccsid
+        return self.codec.encode(msg), (md,) + tuple(opts[1:])
+
+    def _received(self, message, md, with_descriptor, decode=True):
+        """ What the read generators yield for a message that was got with `md` """
+        if with_descriptor is _RAW_MD:
+            return message, md
+        if decode and self.codec is not None:
+            message = self.codec.decode(message)
+        return WMMessage.from_md(message, md) if with_descriptor else message
+
+    def _decode_many(self, messages, with_descriptor) -> list:
+        """ Decodes a batch of bodies or of `WMMessage` objects that were got without decoding """
+        if self.codec is None or not messages:
+            return list(messages)
+        if not with_descriptor:
+            return self.codec.decode_many(messages)
+        for message, body in zip(messages, self.codec.decode_many([message.body for message in messages])):
+            message.body = body
+        return list(messages)
 
     def _get_message_descriptor(self):
         """ Returns an empty message descriptor object """
@@ -209,26 +1134,122 @@ class WMQueue(object):
         """
         gmo = GMO()
         gmo.Options = MQGMO_WAIT | MQGMO_FAIL_IF_QUIESCING
-        gmo.WaitInterval = wait_interval  # 5000 = 5 seconds
+        gmo.WaitInterval = int(wait_interval)  # 5000 = 5 seconds, pymqi only takes an int
         return gmo
 
+    def _syncpoint_no_wait_gmo(self):
+        """
+        Creates a GMO object for reading a message under syncpoint without waiting.
+        :return: GMO object.
+        """
+        gmo = GMO()
+        gmo.Options = MQGMO_NO_WAIT | MQGMO_SYNCPOINT | MQGMO_FAIL_IF_QUIESCING
+        return gmo
+
+    def _syncpoint_pmo(self):
+        """
+        Creates a PMO object for writing a message under syncpoint.
+        :return: PMO object.
+        """
+        pmo = PMO()
+        pmo.Options = MQPMO_SYNCPOINT | MQPMO_FAIL_IF_QUIESCING
+        return pmo
+
     def _browse_messages_gmo(self):
         """
         Creates a GMO object for browsing messages from a queue.
+        Starts from the head of the queue, since the browse cursor belongs to the handle which stays open
+        between browses, the options have to be changed to MQGMO_BROWSE_NEXT after the first message.
         :return: GMO object.
         """
         gmo = GMO()
-        gmo.Options = MQGMO_BROWSE_NEXT
+        gmo.Options = MQGMO_BROWSE_FIRST
         gmo.WaitInterval = MQWI_UNLIMITED
         return gmo
 
-    def _reset_open_options(self, *open_opts):
+    def _new_queue(self):
+        """ Returns a new queue object on the connection of this queue, the open is deferred """
+        if isinstance(self.qmgr, QueueManager):
+            return Queue(self.qmgr, self.name)
+        # if the qmgr passed is of type WMQueueManager
+        return self.qmgr.backend.queue(self.qmgr.qmgr, self.name)
+
+    def _handle(self, access):
         """
-        Resets the mode that the queue is opened with.
-        If `*open_opts` is specified, will open the queue with the
-        options passed in.
-        :param open_opts: An optional new mode to open the queue with.
+        Returns a queue object that is open for `access`, opening it on first use.
+        :param access: One of MQOO_INPUT_AS_Q_DEF, MQOO_OUTPUT, MQOO_BROWSE, MQOO_INQUIRE.
         """
-        with suppress(Exception):
-            self.queue.close()
-        self.queue.open(self.name, *open_opts)
+        if self._resilient and self._generation != self.qmgr.generation:
+            self._reopen()  # another queue reconnected, the handles of the broken connection are gone with it
+        handle = self._handles.get(access)
+        if handle is None:
+            declared = self.open_options or 0
+            if declared & (_INPUT_OPTIONS if access == MQOO_INPUT_AS_Q_DEF else access):
+                handle = self.queue
+            else:
+                handle = self._new_queue()
+                handle.open(self.name, access)
+            self._handles[access] = handle
+        return handle
+
+    def _get_from(self, handle, max_length=None, md=None, gmo=None):
+        """
+        MQGET on `handle`. Without `max_length`, uses the adaptive buffer size, and if the message is bigger
+        gets it again with its real length. If another consumer took it in between, gets the next message.
+        """
+        if max_length is not None or (gmo is not None and gmo.Options & MQGMO_ACCEPT_TRUNCATED_MSG):
+            return handle.get(max_length, md, gmo)
+
+        md = md if md is not None else self._get_message_descriptor()
+        gmo = gmo if gmo is not None else GMO()
+        selection = md.MsgId, md.CorrelId, md.GroupId
+        while True:
+            try:
+                message = handle.get(self._buffer.size, md, gmo)
+            except MQMIError as e:
+                if e.reason != MQRC_TRUNCATED_MSG_FAILED:
+                    raise
+                self.truncation_retries += 1
+                # the MD now holds the ids of the truncated message, so the second get matches it
+                length = self._buffer.fit(getattr(e, "original_length", None) or self._buffer.cap)
+                try:
+                    message = handle.get(length, md, gmo)
+                except MQMIError as e:
+                    if e.reason != MQRC_NO_MSG_AVAILABLE:
+                        raise
+                    md.MsgId, md.CorrelId, md.GroupId = selection
+                    continue
+            self._buffer.seen(len(message))
+            return message
+
+    def _recover(self, error: MQMIError) -> bool:
+        """
+        In the reconnect mode, makes the connection again if `error` means it broke, and reopens the queue.
+        :return: True if the call that failed with `error` can be retried.
+        """
+        if not self._resilient or not self.qmgr._recover(error, self._generation):
+            return False
+        self._reopen()
+        return True
+
+    def _reopen(self):
+        """ Opens the queue again on the current connection of the queue manager """
+        self._handles = {}
+        self.queue = self._new_queue()
+        self._generation = self.qmgr.generation
+        self._open()
+        metrics = getattr(self.qmgr.backend, "metrics", None)
+        if metrics is not None:
+            metrics.inc("pymqiwm_reopens_total", (("queue", self.name),))
+
+    def _close_handles(self):
+        """ Closes the handles that were opened per access type """
+        if self._backout_queue is not None:
+            backout_queue, self._backout_queue = self._backout_queue, None
+            with suppress(Exception):
+                backout_queue.__exit__(None, None, None)
+        handles, self._handles = self._handles, {}
+        for handle in handles.values():
+            if handle is not self.queue:
+                with suppress(Exception):
+                    handle.close()
@@ -1,13 +1,20 @@
+import random
+import threading
+import time
+import warnings
+from contextlib import contextmanager, suppress
 from functools import wraps
-from pymqi import QueueManager, PCFExecute, CD, MQMIError
-from pymqiwm.consts import DEFAULT_CHANNEL
-from pymqi.CMQC import (
+from pymqiwm.mqi import QueueManager, CD, MQMIError, PYIFError
+from pymqiwm.backend import PymqiBackend
+from pymqiwm.consts import DEFAULT_CHANNEL, CONNECTION_BROKEN_REASONS, RECONNECT_REASONS
+from pymqiwm.mqi.CMQC import (
     MQIA_MAX_Q_DEPTH, MQQT_LOCAL, MQIA_MSG_DEQ_COUNT, MQIA_TIME_SINCE_RESET,
     MQIA_HIGH_Q_DEPTH, MQCA_Q_NAME, MQIA_Q_TYPE,
     MQIA_MSG_ENQ_COUNT, MQCHT_CLNTCONN, MQXPT_TCP, MQCNO_HANDLE_SHARE_BLOCK,
-    MQQT_ALL, MQRC_UNKNOWN_OBJECT_NAME
+    MQQT_ALL, MQRC_UNKNOWN_OBJECT_NAME, MQIA_CURRENT_Q_DEPTH, MQIA_OPEN_INPUT_COUNT, MQIA_OPEN_OUTPUT_COUNT
 )
-from pymqi.CMQCFC import MQIACF_PURGE, MQPO_YES, MQCACH_CHANNEL_NAME
+from pymqiwm.mqi.CMQCFC import (MQIACF_PURGE, MQPO_YES, MQCACH_CHANNEL_NAME, MQIACF_Q_ATTRS, MQIACF_Q_STATUS_ATTRS,
+                                MQIACF_UNCOMMITTED_MSGS, MQIACF_OLDEST_MSG_AGE)
 
 
 def has_to_be_connected(func):
@@ -36,6 +43,30 @@ class WMQueueManager(object):
 
         Example for conn_info: "host_name(port),another_host(other_port)"
 
+        The pymqi objects are created by `backend`, which defaults to `PymqiBackend`.
+        Passing `FakeBackend()` runs everything in-process without a live MQ server.
+
+        The admin methods share a single PCF session (and its reply queue) per connection,
+        opened on the first admin call and closed with the connection.
+
+        With `reconnect`, a call of a `WMQueue` that fails because the connection broke makes the connection again
+        and is retried, so the read generators go on as if nothing happened:
+
+            >>> with WMQueueManager(name=..., conn_info="host1(1414),host2(1414)", reconnect=True) as qmgr:
+            >>>     with WMQueue(qmgr, "DAVAY") as queue:
+            >>>         for message in queue.read_messages_while_waiting(-1):  # survives a failover to host2
+            >>>             ...
+            >>>     print(qmgr.reconnect_stats())
+
+        Every host of `conn_info` is tried in turn, starting with the one of the broken connection,
+        and after every round of them the next one waits a random time up to `min_backoff` doubled per round
+        (at most `max_backoff`), until `reconnect_timeout` seconds passed.
+        The queues reopen their handles on the new connection. A unit of work is lost with the connection:
+        `read_messages_in_batches` goes on and gets the messages of the lost batch again, while puts under syncpoint,
+        `stream_messages` and the asynchronous producer raise like without `reconnect`.
+        A put or a get that failed may have been done before the connection broke, so it can be done twice.
+        A queue manager that is quiescing or stopping is not a broken connection, its reason is raised to the caller.
+
     """
 
     def __init__(self,
@@ -43,12 +74,41 @@ class WMQueueManager(object):
                  conn_info: str,
                  channel=DEFAULT_CHANNEL,
                  user=None,
-                 password=None):
+                 password=None,
+                 backend=None,
+                 reconnect=False,
+                 reconnect_timeout=300,
+                 min_backoff=0.5,
+                 max_backoff=30):
+        """
+        :param reconnect: Make the connection again when a call of a `WMQueue` finds it broken.
+        :param reconnect_timeout: Max seconds to keep trying to reconnect, None to never give up.
+        :param min_backoff: Seconds of the first backoff between two rounds of the hosts, doubled every round.
+        :param max_backoff: Max seconds of a backoff.
+        """
         self._name = name
+        self._conn_info = conn_info
         self._user = user
         self._password = password
         self._cd = self._get_cd(channel, conn_info)
-        self.qmgr = QueueManager(None)
+        self._backend = backend or PymqiBackend()
+        self.qmgr = self._backend.queue_manager()
+        self._pcf = None
+        self._pcf_lock = threading.RLock()
+
+        self.reconnect = reconnect
+        self.reconnect_timeout = reconnect_timeout
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.generation = 0  # incremented on every reconnect, the handles of older generations are gone
+        self._hosts = [host.strip() for host in conn_info.split(",") if host.strip()]
+        assert self._hosts, "conn_info has to name at least one host, for example \"mq1(1414)\""
+        self._host_index = 0
+        self._reconnect_lock = threading.Lock()
+        self._reconnects = 0
+        self._failed_attempts = 0
+        self._downtime_seconds = 0.0
+        self._open_batches = set()  # the batches with messages in the unit of work of the connection
 
     @property
     def qmgr_name(self) -> str:
@@ -56,7 +116,7 @@ class WMQueueManager(object):
 
     @property
     def conn_info(self) -> str:
-        return self.conn_info
+        return self._conn_info
 
     @property
     def user(self) -> str:
@@ -66,6 +126,15 @@ class WMQueueManager(object):
     def connection_details(self) -> CD:
         return self._cd
 
+    @property
+    def backend(self):
+        return self._backend
+
+    @property
+    def has_open_batch(self) -> bool:
+        """ True while a batch (`put_many`, `get_many`, ...) has uncommitted messages on this connection """
+        return bool(self._open_batches)
+
     @property
     def is_connected(self):
         """ Checks if the connection to the qmgr is active """
@@ -78,22 +147,101 @@ class WMQueueManager(object):
 
     def __exit__(self, exc_type, exc_val, exc_tb):
         """ Makes sure that the connection is closed if its active """
+        self._close_pcf()
         if self.qmgr.is_connected:
             self.qmgr.disconnect()
 
+    def commit(self):
+        """ Commits the gets and puts made under syncpoint on this connection since the last commit/backout """
+        self.qmgr.commit()
+
+    def backout(self):
+        """ Backs out the gets and puts made under syncpoint on this connection since the last commit/backout """
+        self.qmgr.backout()
+
+    def async_put_status(self):
+        """
+        Returns the results of the asynchronous puts made on this connection since the previous call,
+        or None if the backend can't get them (see `PymqiBackend.async_put_status`).
+        """
+        return self._backend.async_put_status(self.qmgr)
+
     def _safe_connect(self):
         """
         A function for connecting safely to the queue manager.
         If the there is already an open connection to the queue manager, the open connection will be used,
         so the developer does'nt have to deal with the check for the connection.
         """
+        self._connect(self._conn_info)
+
+    def _connect(self, conn_info):
         opts = self._get_connection_options()
+        self._pcf = None  # a PCF session of a previous connection can't be used on this one
+        self._cd.ConnectionName = conn_info
         self.qmgr.connect_with_options(self._name,
                                        user=self._user,
                                        password=self._password,
                                        cd=self._cd,
                                        opts=opts)
 
+    def reconnect_stats(self) -> dict:
+        """
+        Returns the number of reconnects, the connect attempts that failed while reconnecting,
+        the total seconds from the detection of a broken connection to the new connection, and the current host.
+        """
+        return {
+            "reconnects": self._reconnects,
+            "failed attempts": self._failed_attempts,
+            "downtime seconds": self._downtime_seconds,
+            "host": self._hosts[self._host_index] if self._hosts else None,
+        }
+
+    def _recover(self, error: MQMIError, generation: int) -> bool:
+        """
+        Called by a queue when one of its calls failed with `error` on the connection of `generation`.
+        :return: True if the connection was made again (by this thread or another one) and the call can be retried.
+        """
+        if not self.reconnect or error.reason not in CONNECTION_BROKEN_REASONS:
+            return False
+        with self._reconnect_lock:
+            if generation == self.generation:  # no other thread reconnected since the call failed
+                self._reconnect()
+        return True
+
+    def _reconnect(self):
+        started = time.monotonic()
+        deadline = None if self.reconnect_timeout is None else started + self.reconnect_timeout
+        self._close_pcf()
+        with suppress(MQMIError, PYIFError):
+            self.qmgr.disconnect()
+        attempt = 0
+        while True:
+            host_index = (self._host_index + attempt) % len(self._hosts)
+            self.qmgr = self._backend.queue_manager()
+            try:
+                self._connect(self._hosts[host_index])
+                break
+            except MQMIError as e:
+                if e.reason not in RECONNECT_REASONS:
+                    raise
+                self._failed_attempts += 1
+                attempt += 1
+                if attempt % len(self._hosts) == 0:  # every host was tried, back off before the next round
+                    rounds = attempt // len(self._hosts)
+                    delay = random.uniform(0, min(self.max_backoff, self.min_backoff * 2 ** (rounds - 1)))
+                    if deadline is not None and time.monotonic() + delay > deadline:
+                        raise
+                    time.sleep(delay)
+        self._host_index = host_index
+        self.generation += 1
+        self._reconnects += 1
+        downtime = time.monotonic() - started
+        self._downtime_seconds += downtime
+        metrics = getattr(self._backend, "metrics", None)
+        if metrics is not None:
+            metrics.inc("pymqiwm_reconnects_total", (("host", self._hosts[host_index]),))
+            metrics.observe("pymqiwm_reconnect_seconds", (), downtime)
+
     def _get_cd(self, channel, conn) -> CD:
         """
         Initializes a ConnectionDetails object.
@@ -113,7 +261,30 @@ class WMQueueManager(object):
         return MQCNO_HANDLE_SHARE_BLOCK
 
     def _get_pcf(self):
-        return PCFExecute(self.qmgr)
+        return self._backend.pcf(self.qmgr)
+
+    @contextmanager
+    def _pcf_session(self):
+        """
+        Yields the PCF session of the connection, opening it on first use.
+        Only one thread at a time can use it, since the replies of all the commands arrive on its reply queue.
+        """
+        with self._pcf_lock:
+            if self._pcf is None:
+                self._pcf = self._get_pcf()
+            try:
+                yield self._pcf
+            except MQMIError as e:
+                if e.reason in CONNECTION_BROKEN_REASONS:
+                    self._pcf = None
+                raise
+
+    def _close_pcf(self):
+        with self._pcf_lock:
+            pcf, self._pcf = self._pcf, None
+            if pcf is not None and self.qmgr.is_connected:
+                with suppress(MQMIError):
+                    pcf.disconnect()
 
     @has_to_be_connected
     def display_queues(self, value_for_search) -> [str]:
@@ -125,9 +296,9 @@ class WMQueueManager(object):
             MQCA_Q_NAME: value_for_search,
             MQIA_Q_TYPE: MQQT_ALL
         }
-        pcf = self._get_pcf()
         try:
-            response = pcf.MQCMD_INQUIRE_Q(args)
+            with self._pcf_session() as pcf:
+                response = pcf.MQCMD_INQUIRE_Q(args)
         except MQMIError as e:
             if e.reason == MQRC_UNKNOWN_OBJECT_NAME:
                 return []  # No queue found
@@ -143,9 +314,9 @@ class WMQueueManager(object):
         :return: list of found channels or an empty one
         """
         args = {MQCACH_CHANNEL_NAME: value_for_search}
-        pcf = self._get_pcf()
         try:
-            response = pcf.MQCMD_INQUIRE_CHANNEL(args)
+            with self._pcf_session() as pcf:
+                response = pcf.MQCMD_INQUIRE_CHANNEL(args)
         except MQMIError as e:
             if e.reason == MQRC_UNKNOWN_OBJECT_NAME:
                 return []  # No channels found
@@ -157,14 +328,28 @@ class WMQueueManager(object):
     @has_to_be_connected
     def create_local_queue(self, name, depth=5000):
         """ Creates a local queue with a name and depth provided """
-        args = {
-            MQCA_Q_NAME: name,
-            MQIA_Q_TYPE: MQQT_LOCAL,
-            MQIA_MAX_Q_DEPTH: depth,
-        }
+        with self._pcf_session() as pcf:
+            pcf.MQCMD_CREATE_Q(self._local_queue_args(name, depth))
 
-        pcf = self._get_pcf()
-        pcf.MQCMD_CREATE_Q(args)
+    @has_to_be_connected
+    def create_local_queues(self, names, depth=5000) -> dict:
+        """
+        Creates many local queues over the same PCF session.
+        A queue that fails, for example because it already exists, does not stop the others.
+        Usage:
+            >>> with qmgr:
+            >>>     results = qmgr.create_local_queues(["A", "B", ("C", 100)])
+            >>>     failed = {name: error for name, error in results.items() if error is not None}
+        :param names: The names of the queues, or (name, depth) tuples.
+        :param depth: The max depth of the queues that are given only by name.
+        :return: dict of queue name to None if it was created, or to the MQMIError it failed with.
+        """
+        results = {}
+        with self._pcf_session() as pcf:
+            for name in names:
+                name, max_depth = name if isinstance(name, tuple) else (name, depth)
+                results[name] = self._per_item(pcf.MQCMD_CREATE_Q, self._local_queue_args(name, max_depth))
+        return results
 
     @has_to_be_connected
     def delete_queue(self, name, purge=False):
@@ -176,36 +361,167 @@ class WMQueueManager(object):
         if purge:
             args[MQIACF_PURGE] = MQPO_YES
 
-        pcf = self._get_pcf()
-        pcf.MQCMD_DELETE_Q(args)
+        with self._pcf_session() as pcf:
+            pcf.MQCMD_DELETE_Q(args)
 
     @has_to_be_connected
-    def get_stats_from_queue(self, name) -> dict:
-        """ Return dict containing different stats about the queue """
-        pcf = self._get_pcf()
+    def delete_queues(self, value_for_search, purge=False) -> dict:
+        """
+        Deletes all the queues that match over the same PCF session.
+        A queue that fails, for example because it is open or not empty, does not stop the others.
+        The SYSTEM queues are never deleted, unless `value_for_search` itself starts with "SYSTEM.".
+        :param value_for_search: For example, "APP.TEST.*" will delete all the queues with APP.TEST. at the start
+        :return: dict of queue name to None if it was deleted, or to the MQMIError it failed with.
+        """
+        names = [name for name in self.inquire_queues(value_for_search, [MQCA_Q_NAME])
+                 if not name.startswith("SYSTEM.") or value_for_search.startswith("SYSTEM.")]
+        results = {}
+        with self._pcf_session() as pcf:
+            for name in names:
+                args = {MQCA_Q_NAME: name}
+                if purge:
+                    args[MQIACF_PURGE] = MQPO_YES
+                results[name] = self._per_item(pcf.MQCMD_DELETE_Q, args)
+        return results
+
+    @has_to_be_connected
+    def inquire_queues(self, value_for_search, attrs=None, queue_type=MQQT_ALL) -> dict:
+        """
+        Returns the attributes of all the queues that match in a single PCF call.
+        Usage:
+            >>> with qmgr:
+            >>>     depths = qmgr.inquire_queues("APP.*", [MQIA_CURRENT_Q_DEPTH, MQIA_MAX_Q_DEPTH])
+        :param value_for_search: For example, "SYSTEM.*" will get all the queues with SYSTEM at the start
+        :param attrs: The MQCA_*/MQIA_* attributes to return, None for all of them.
+        :return: dict of queue name to a dict of attribute to value (str values are stripped), empty if none match.
+        """
         args = {
-            MQCA_Q_NAME: name
+            MQCA_Q_NAME: value_for_search,
+            MQIA_Q_TYPE: queue_type,
+        }
+        if attrs is not None:
+            args[MQIACF_Q_ATTRS] = list(attrs)
+        try:
+            with self._pcf_session() as pcf:
+                response = pcf.MQCMD_INQUIRE_Q(args)
+        except MQMIError as e:
+            if e.reason == MQRC_UNKNOWN_OBJECT_NAME:
+                return {}
+            raise
+        return {
+            _name(queue_info): {attr: value.decode().strip() if isinstance(value, bytes) else value
+                                for attr, value in queue_info.items() if attrs is None or attr in attrs}
+            for queue_info in response
         }
 
-        queue_stats = pcf.MQCMD_RESET_Q_STATS(args)[0]
+    def _local_queue_args(self, name, depth) -> dict:
+        return {
+            MQCA_Q_NAME: name,
+            MQIA_Q_TYPE: MQQT_LOCAL,
+            MQIA_MAX_Q_DEPTH: depth,
+        }
+
+    def _per_item(self, command, args):
+        """ Runs a command of a bulk operation, returns the error instead of raising it unless the connection broke """
+        try:
+            command(args)
+        except MQMIError as e:
+            if e.reason in CONNECTION_BROKEN_REASONS:
+                raise
+            return e
+        return None
+
+    @has_to_be_connected
+    def get_stats_from_queue(self, name) -> dict:
+        """
+        Return dict containing different stats about the queue.
+        Deprecated: it resets the statistics of the queue (MQCMD_RESET_Q_STATS), so any other tool that reads them
+        loses the counts. Use `inquire_queue_status` for stats that don't reset anything,
+        or `reset_queue_stats` when the enqueue/dequeue counters are needed.
+        """
+        warnings.warn("get_stats_from_queue resets the queue statistics, use inquire_queue_status "
+                      "or reset_queue_stats instead", DeprecationWarning, stacklevel=3)
+        with self._pcf_session() as pcf:
+            queue_stats = pcf.MQCMD_RESET_Q_STATS({MQCA_Q_NAME: name})[0]
 
         return {
             "time since last queue reset": queue_stats[MQIA_TIME_SINCE_RESET],
-            "current depth": queue_stats[MQIA_HIGH_Q_DEPTH],
+            "current depth": queue_stats[MQIA_HIGH_Q_DEPTH],  # the high depth since the last reset, kept as it was
             "messages red recently": queue_stats[MQIA_MSG_DEQ_COUNT],  # recently - since last reset time
             "messages put recently": queue_stats[MQIA_MSG_ENQ_COUNT]   # recently - since last reset time
         }
 
+    @has_to_be_connected
+    def inquire_queue_status(self, name) -> dict:
+        """
+        Returns the stats of a local queue, see `inquire_queues_status`, without resetting its statistics.
+        Usage:
+            >>> with qmgr:
+            >>>     print(qmgr.inquire_queue_status("APP.IN")["current depth"])
+        :param name: A queue name, a generic name returns the stats of the first queue the queue manager returns.
+        """
+        statuses = self.inquire_queues_status(name)
+        # looked up by the name the queue manager returns, which is not always the one that was asked for
+        return statuses[name] if name in statuses else next(iter(statuses.values()))
 
+    @has_to_be_connected
+    def inquire_queues_status(self, value_for_search) -> dict:
+        """
+        Returns the stats of all the local queues that match in two PCF calls (INQUIRE_Q_STATUS and INQUIRE_Q),
+        whatever the number of queues is.
+        :param value_for_search: A queue name, or a generic one like "APP.*"
+        :return: dict of queue name to its stats, raises MQMIError with MQRC_UNKNOWN_OBJECT_NAME if none match.
+        """
+        with self._pcf_session() as pcf:
+            statuses = pcf.MQCMD_INQUIRE_Q_STATUS({
+                MQCA_Q_NAME: value_for_search,
+                MQIACF_Q_STATUS_ATTRS: [MQCA_Q_NAME, MQIA_CURRENT_Q_DEPTH, MQIA_OPEN_INPUT_COUNT,
+                                        MQIA_OPEN_OUTPUT_COUNT, MQIACF_UNCOMMITTED_MSGS, MQIACF_OLDEST_MSG_AGE],
+            })
+            attributes = pcf.MQCMD_INQUIRE_Q({
+                MQCA_Q_NAME: value_for_search,
+                MQIA_Q_TYPE: MQQT_LOCAL,
+                MQIACF_Q_ATTRS: [MQCA_Q_NAME, MQIA_MAX_Q_DEPTH],
+            })
+
+        max_depths = {_name(queue_info): queue_info[MQIA_MAX_Q_DEPTH] for queue_info in attributes}
+        return {
+            _name(status): {
+                "current depth": status[MQIA_CURRENT_Q_DEPTH],
+                "max depth": max_depths.get(_name(status)),
+                "open input count": status[MQIA_OPEN_INPUT_COUNT],
+                "open output count": status[MQIA_OPEN_OUTPUT_COUNT],
+                "uncommitted messages": status[MQIACF_UNCOMMITTED_MSGS],
+                "oldest message age": status[MQIACF_OLDEST_MSG_AGE],  # seconds, -1 when the queue is empty
+            }
+            for status in statuses
+        }
 
+    @has_to_be_connected
+    def reset_queue_stats(self, value_for_search) -> dict:
+        """
+        Returns the enqueue/dequeue counters of the matching queues and resets them (MQCMD_RESET_Q_STATS),
+        so anything else that reads them, like a monitoring tool, loses the counts.
+        :param value_for_search: A queue name, or a generic one like "APP.*"
+        :return: dict of queue name to its counters since the previous reset.
+        """
+        with self._pcf_session() as pcf:
+            response = pcf.MQCMD_RESET_Q_STATS({MQCA_Q_NAME: value_for_search})
 
+        return {
+            _name(queue_stats): {
+                "time since last queue reset": queue_stats[MQIA_TIME_SINCE_RESET],
+                "high depth": queue_stats[MQIA_HIGH_Q_DEPTH],  # since last reset time
+                "messages red since reset": queue_stats[MQIA_MSG_DEQ_COUNT],
+                "messages put since reset": queue_stats[MQIA_MSG_ENQ_COUNT],
+            }
+            for queue_stats in response
+        }
 
 
-
-
-
-
-
-
-
-
+def _name(response) -> str:
+    """ Returns the queue name of a PCF response, which is blank padded bytes """
+    name = response[MQCA_Q_NAME]
+    if isinstance(name, bytes):
+        name = name.decode()
+    return name.strip()
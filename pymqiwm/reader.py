@@ -0,0 +1,307 @@
+import threading
+import time
+from collections import deque
+from contextlib import suppress
+from pymqiwm.mqi import MQMIError
+from pymqiwm.mqi.CMQC import MQRC_NO_MSG_AVAILABLE
+from pymqiwm.codec import get_codec
+from pymqiwm.consumer import QUIESCING_REASONS
+from pymqiwm.queue import WMQueue
+
+SCHEDULING = ("weighted", "priority")
+
+
+class _Source(object):
+    """ A queue of the reader: its weight, the messages got ahead of the loop and its counters """
+
+    __slots__ = ("name", "weight", "queue", "buffer", "uncommitted", "in_flight", "current", "idle", "polled_at",
+                 "received", "yielded", "empty_polls")
+
+    def __init__(self, name, weight):
+        self.name = name
+        self.weight = weight
+        self.queue = None  # opened by the thread of its connection
+        self.buffer = deque()  # (body, md) got but not yielded yet
+        self.uncommitted = 0  # got in the unit of work of its connection
+        self.in_flight = 0  # yielded, the loop did not ask for the next message yet
+        self.current = 0  # the credit of the weighted round robin
+        self.idle = False  # the last get found the queue empty
+        self.polled_at = 0.0
+        self.received = 0
+        self.yielded = 0
+        self.empty_polls = 0
+
+
+class MultiQueueReader(object):
+    """
+
+        Reads many queues over a few connections, and yields their messages in a weighted-fair or priority order.
+
+        The queues are spread over `connections` connections, each with a thread that makes non-blocking gets
+        from its queues and keeps up to `prefetch` messages per queue ready for the loop. A queue that was found
+        empty is polled again every `poll_interval` seconds, or, with a `QueueStatsPoller` as `stats_poller`,
+        once its cached depth is above 0, so idle queues cost a single PCF call per refresh for all of them.
+        The loop picks the next message among the queues that have one ready:
+        "weighted" yields from them in proportion to their weights (a smooth weighted round robin),
+        "priority" yields from the one with the highest weight first and round robins between equal weights.
+
+        Usage:
+            >>> def connect():
+            >>>     return WMQueueManager(name=..., conn_info=...)
+
+            >>> queues = {"ORDERS.EU": 5, "ORDERS.US": 5, "AUDIT": 1}
+            >>> with MultiQueueReader(connect, queues, connections=2, seconds_wait_interval=-1) as reader:
+            >>>     for queue_name, message in reader:
+            >>>         handle(queue_name, message)
+
+        The gets are made under syncpoint, every connection gets up to `prefetch` messages per queue in a unit of
+        work, and commits it once all of them were yielded and the loop came back for the next message.
+        The messages that were got but not yielded when the reader stops, or when the process dies or the connection
+        breaks, are backed out in their place on their queues, so no message is lost. The ones that were yielded
+        in the same unit of work are backed out with them and yielded again, the messages are read at least once.
+        pymqi has no MQCB, so the queues are polled instead of having the queue manager call back.
+
+    """
+
+    def __init__(self,
+                 connect,
+                 queues,
+                 connections=1,
+                 scheduling="weighted",
+                 seconds_wait_interval=0,
+                 poll_interval=0.1,
+                 prefetch=10,
+                 max_length=None,
+                 with_descriptor=False,
+                 codec=None,
+                 stats_poller=None):
+        """
+        :param connect: A function that returns a new (not connected) `WMQueueManager`, called once per connection.
+        :param queues: Queue names, or a dict of queue name to weight (a positive int, 1 for the names of a list).
+        :param connections: The number of connections the queues are spread over, by their weights.
+        :param scheduling: "weighted" or "priority", see above.
+        :param seconds_wait_interval: Same as in `WMQueue.read_messages_while_waiting`, for all the queues together.
+        :param poll_interval: Seconds between two gets from a queue that was empty.
+        :param prefetch: Max messages got ahead of the loop per queue, and in a unit of work.
+        :param with_descriptor: Yield `WMMessage` objects with the MsgId, CorrelId etc. instead of the bodies.
+        :param codec: The codec to decode the messages of all the queues with.
+        :param stats_poller: A `QueueStatsPoller` that watches the queues, to skip polling the empty ones.
+        """
+        weights = dict(queues) if isinstance(queues, dict) else dict.fromkeys(queues, 1)
+        assert weights, "There has to be at least one queue"
+        assert all(isinstance(weight, int) and weight > 0 for weight in weights.values()), \
+            "The weights have to be positive ints"
+        assert scheduling in SCHEDULING, "The scheduling is one of {0}".format(", ".join(SCHEDULING))
+        assert connections > 0 and prefetch > 0 and poll_interval > 0, "The sizes have to be positive"
+        self.connect = connect
+        self.connections = min(connections, len(weights))
+        self.scheduling = scheduling
+        self.seconds_wait_interval = seconds_wait_interval
+        self.poll_interval = poll_interval
+        self.prefetch = prefetch
+        self.max_length = max_length
+        self.with_descriptor = with_descriptor
+        self.codec = get_codec(codec)
+        self.stats_poller = stats_poller
+        self.errors = []
+
+        self._sources = [_Source(name, weight) for name, weight in weights.items()]
+        self._ready = threading.Condition()
+        self._stopping = threading.Event()
+        self._threads = []
+        self._started = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    @property
+    def is_running(self):
+        return any(thread.is_alive() for thread in self._threads)
+
+    def start(self):
+        assert not self.is_running, "The reader is already running"
+        self._stopping.clear()
+        self.errors = []
+        self._started = time.monotonic()
+        self._threads = [threading.Thread(target=self._read_connection, args=(sources,),
+                                          name="multi-reader_{0}".format(number), daemon=True)
+                         for number, sources in enumerate(self._spread())]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self):
+        """ Stops the gets, and backs out the messages that were got but not yielded, see above """
+        self._stopping.set()
+        with self._ready:
+            self._ready.notify_all()
+        for thread in self._threads:
+            thread.join()
+
+    def __iter__(self):
+        """ Yields (queue name, message) """
+        assert self._threads, "The reader has to be started"
+        idle_since = time.monotonic()
+        while True:
+            with self._ready:
+                source = self._next_source()
+                while source is None:
+                    if self.errors:
+                        raise self.errors[0]
+                    if self._stopping.is_set() or not self.is_running:
+                        return
+                    if self.seconds_wait_interval != -1 and self._all_idle() and \
+                            time.monotonic() - idle_since >= self.seconds_wait_interval:
+                        return
+                    self._ready.wait(self.poll_interval)
+                    source = self._next_source()
+                message, md = source.buffer.popleft()
+                source.yielded += 1
+                source.in_flight += 1
+            idle_since = time.monotonic()
+            try:
+                yield source.name, source.queue._received(message, md, self.with_descriptor)
+            finally:
+                with self._ready:
+                    source.in_flight -= 1
+                    self._ready.notify_all()  # the unit of work of its connection may be committed now
+
+    def stats(self) -> dict:
+        """ Returns the messages yielded and their rate, in total and per queue, and the polls of empty queues """
+        elapsed = time.monotonic() - self._started if self._started else 0.0
+        with self._ready:
+            queues = {source.name: {"weight": source.weight,
+                                    "received": source.received,
+                                    "yielded": source.yielded,
+                                    "buffered": len(source.buffer),
+                                    "uncommitted": source.uncommitted,
+                                    "empty polls": source.empty_polls,
+                                    "idle": source.idle,
+                                    "msgs per sec": source.yielded / elapsed if elapsed else 0.0}
+                      for source in self._sources}
+        yielded = sum(queue["yielded"] for queue in queues.values())
+        return {"yielded": yielded, "msgs per sec": yielded / elapsed if elapsed else 0.0, "queues": queues}
+
+    def _all_idle(self) -> bool:
+        return all(source.idle for source in self._sources)
+
+    def _spread(self) -> list:
+        """ The queues of every connection, the heaviest first to the connection with the least weight so far """
+        shares = [[] for _ in range(self.connections)]
+        for source in sorted(self._sources, key=lambda source: -source.weight):
+            min(shares, key=lambda share: sum(source.weight for source in share)).append(source)
+        return shares
+
+    def _next_source(self):
+        """ The queue to yield from next among the ones with messages ready (a smooth weighted round robin) """
+        ready = [source for source in self._sources if source.buffer]
+        if not ready:
+            return None
+        if self.scheduling == "priority":
+            top = max(source.weight for source in ready)
+            ready = [source for source in ready if source.weight == top]
+        total = 0
+        for source in ready:
+            source.current += source.weight
+            total += source.weight
+        chosen = max(ready, key=lambda source: source.current)
+        chosen.current -= total
+        return chosen
+
+    def _read_connection(self, sources):
+        opened = []
+        try:
+            with self.connect() as qmgr:
+                try:
+                    for source in sources:
+                        source.queue = WMQueue(qmgr, source.name, codec=self.codec, stats=self.stats_poller).__enter__()
+                        opened.append(source.queue)
+                    self._poll(qmgr, sources)
+                finally:
+                    try:
+                        self._back_out(qmgr, sources)
+                    finally:
+                        for queue in opened:
+                            queue.__exit__(None, None, None)
+        except MQMIError as e:
+            if e.reason not in QUIESCING_REASONS:
+                self.errors.append(e)
+        except Exception as e:
+            self.errors.append(e)
+        finally:
+            with self._ready:
+                self._ready.notify_all()
+
+    def _poll(self, qmgr, sources):
+        gmo = sources[0].queue._syncpoint_no_wait_gmo()
+        while not self._stopping.is_set():
+            got = 0
+            for source in sources:
+                got += self._fill(source, gmo)
+            with self._ready:
+                delivered = not any(source.buffer or source.in_flight for source in sources)
+            if delivered and any(source.uncommitted for source in sources):
+                qmgr.commit()
+                for source in sources:
+                    source.uncommitted = 0
+                continue
+            if not got:
+                with self._ready:
+                    self._ready.wait(self.poll_interval)  # the loop wakes it up when it is done with a message
+
+    def _fill(self, source, gmo) -> int:
+        """
+        Gets from `source` until it has `prefetch` messages in the unit of work or the queue is empty, so the queues
+        that are yielded from more are also got from more, and the weights hold when the gets are slower than the loop.
+        """
+        got = 0
+        while self._due(source) and not self._stopping.is_set():
+            md = source.queue._get_message_descriptor()
+            try:
+                message = source.queue._get(self.max_length, md, gmo)
+            except MQMIError as e:
+                if e.reason != MQRC_NO_MSG_AVAILABLE:
+                    raise
+                source.polled_at = time.monotonic()
+                with self._ready:
+                    source.idle = True
+                    source.empty_polls += 1
+                    self._ready.notify_all()  # the loop may be waiting for all the queues to be empty
+                break
+            with self._ready:
+                source.buffer.append((message, md))  # decoded by the loop
+                source.uncommitted += 1
+                source.received += 1
+                source.idle = False
+                self._ready.notify_all()
+            got += 1
+        return got
+
+    def _due(self, source) -> bool:
+        """ If it is time to get from `source`: its unit of work has room, and it had messages or was polled lately """
+        if source.uncommitted >= self.prefetch:
+            return False
+        if not source.idle:
+            return True
+        if time.monotonic() - source.polled_at < self.poll_interval:
+            return False
+        if self.stats_poller is not None:
+            try:
+                return source.queue.depth() > 0  # from the cache of the poller
+            except KeyError:  # the poller does not know the queue
+                return True
+        return True
+
+    def _back_out(self, qmgr, sources):
+        """ Backs out the unit of work of the connection, the messages go back in their place on their queues """
+        with self._ready:
+            for source in sources:
+                source.buffer.clear()
+        if any(source.uncommitted for source in sources):
+            for source in sources:
+                source.uncommitted = 0
+            with suppress(Exception):  # the connection may be gone, which backs it out too
+                qmgr.backout()
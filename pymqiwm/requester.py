@@ -0,0 +1,162 @@
+import threading
+from contextlib import suppress
+from concurrent.futures import Future, InvalidStateError
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from pymqiwm.queue import WMQueue
+
+
+class WMRequester(object):
+    """
+
+        Request/reply over MQ with many requests in flight at once.
+        Requests are put on `request_queue` with a new CorrelId, and a single reader thread gets every message
+        that arrives on `reply_queue` and hands it to the request with the same CorrelId,
+        so waiting for a reply never scans the queue and does not cost an MQGET per waiting thread.
+
+        Usage:
+            >>> def connect():
+            >>>     return WMQueueManager(name=..., conn_info=...)
+
+            >>> with WMRequester(connect, "REQUESTS", "REPLIES") as requester:
+            >>>     reply = requester.request("ping", timeout=5)
+            >>>     futures = [requester.submit(body) for body in bodies]
+            >>>     replies = [future.result(timeout=5) for future in futures]
+
+        The reply queue has to be used only by this requester, the reader gets all of its messages.
+        A reply that arrives after its request timed out is dropped and counted in `late_replies`.
+        The replies are `WMMessage` objects when `with_descriptor` is set, otherwise their bodies.
+
+    """
+
+    def __init__(self,
+                 connect,
+                 request_queue: str,
+                 reply_queue: str,
+                 seconds_wait_interval=1,
+                 max_length=None,
+                 with_descriptor=False):
+        """
+        :param connect: A function that returns a new (not connected) `WMQueueManager`,
+                        the requester makes one connection for the puts and one for the reader.
+        :param seconds_wait_interval: How long a get of the reader waits, this is also how long it takes
+                                      the reader to notice it has to stop. Has to be positive.
+        """
+        assert seconds_wait_interval > 0, "The reader has to wake up to check if it should stop"
+        self.connect = connect
+        self.request_queue = request_queue
+        self.reply_queue = reply_queue
+        self.seconds_wait_interval = seconds_wait_interval
+        self.max_length = max_length
+        self.with_descriptor = with_descriptor
+        self.late_replies = 0
+        self.errors = []
+
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._stopping = threading.Event()
+        self._ready = threading.Event()
+        self._reader = None
+        self._qmgr = None
+        self._requests = None
+
+    def __enter__(self):
+        self._stopping.clear()
+        self._ready.clear()
+        self.errors = []
+        self._reader = threading.Thread(target=self._read_replies, name="{0}-reader".format(self.reply_queue),
+                                        daemon=True)
+        self._reader.start()
+        self._ready.wait()
+        if self.errors:
+            self._reader.join()
+            raise self.errors[0]
+        try:
+            self._qmgr = self.connect().__enter__()
+            self._requests = WMQueue(self._qmgr, self.request_queue).__enter__()
+        except BaseException:
+            self._stopping.set()
+            self._reader.join()
+            if self._qmgr is not None:
+                self._qmgr.__exit__(None, None, None)
+                self._qmgr = None
+            raise
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._stopping.set()
+        self._reader.join()
+        try:
+            self._requests.__exit__(exc_type, exc_val, exc_tb)
+        finally:
+            self._qmgr.__exit__(exc_type, exc_val, exc_tb)
+            self._qmgr = None
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        for future in pending.values():
+            future.cancel()
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._pending)
+
+    def submit(self, msg, timeout=None) -> Future:
+        """
+        Puts a request and returns a future of its reply.
+        :param timeout: Seconds after which the request expires from the request queue, None never expires.
+                        It is up to the caller to wait for the future with a timeout (and to `cancel` it).
+        """
+        assert self._reader is not None and self._reader.is_alive(), "The requester has to be started"
+        future = Future()
+        with self._lock:
+            correl_id = self._requests.put_request(msg, self.reply_queue, timeout)
+            self._pending[correl_id] = future
+        future.add_done_callback(lambda _: self._forget(correl_id))
+        return future
+
+    def request(self, msg, timeout=5):
+        """
+        Puts a request and waits for its reply.
+        Raises TimeoutError if the reply did not arrive within `timeout` seconds.
+        """
+        future = self.submit(msg, timeout)
+        try:
+            return future.result(timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            raise TimeoutError("No reply on {0} after {1} seconds".format(self.reply_queue, timeout))
+
+    def _forget(self, correl_id):
+        with self._lock:
+            self._pending.pop(correl_id, None)
+
+    def _read_replies(self):
+        try:
+            with self.connect() as qmgr:
+                with WMQueue(qmgr, self.reply_queue) as replies:
+                    self._ready.set()
+                    while not self._stopping.is_set():
+                        for message in replies.read_messages_while_waiting(self.seconds_wait_interval,
+                                                                           self.max_length, with_descriptor=True):
+                            self._dispatch(message)
+                            if self._stopping.is_set():
+                                break
+        except Exception as e:
+            self.errors.append(e)
+            with self._lock:
+                pending = list(self._pending.values())
+            for future in pending:
+                with suppress(InvalidStateError):
+                    future.set_exception(e)
+        finally:
+            self._ready.set()
+
+    def _dispatch(self, message):
+        with self._lock:
+            future = self._pending.pop(message.correl_id, None)
+        if future is not None:
+            try:
+                future.set_result(message if self.with_descriptor else message.body)
+                return
+            except InvalidStateError:  # the request timed out and was cancelled
+                pass
+        self.late_replies += 1
@@ -0,0 +1,302 @@
+import calendar
+import mmap
+import os
+import struct
+import time
+from pymqiwm.mqi import MD
+from pymqiwm.mqi.CMQC import MQMI_NONE
+from pymqiwm.message import WMMessage
+from pymqiwm.queue import WMQueue, _SyncpointBatch, _RAW_MD
+
+# The layout of a dump file:
+#   header | record | record | ... | index | footer
+# a record is its header, the packed MQMD of the message and the body, the index is the offset of every record
+# and the footer points to the index. The records are only ever appended, the index and the footer are written
+# again after them when the writer closes, and a file without them (the writer died) is indexed by a scan.
+MAGIC = b"PYMQIWMD"
+VERSION = 1
+_HEADER = struct.Struct("<8sI4x")  # magic, version
+_RECORD = struct.Struct("<4sII")  # marker, length of the MD, length of the body
+_RECORD_MARKER = b"MSG\0"
+_FOOTER = struct.Struct("<QQ8s")  # offset of the index, number of records, marker
+_FOOTER_MARKER = b"PYMQIIDX"
+_OFFSET = struct.Struct("<Q")
+
+
+class DumpWriter(object):
+    """
+
+        Appends messages with their MQMD to a dump file, see `dump`.
+
+        Usage:
+            >>> with DumpWriter("orders.dump") as writer:
+            >>>     writer.write(body, md)
+
+        `sync` flushes the records written so far to the disk and keeps them, `rollback` drops the records written
+        after the last `sync`, so a dump can follow the units of work of the gets it writes. `flush` and `keep`
+        are its two halves, to flush the records before a commit and keep them only once it succeeded.
+        With `append`, the records of an existing file are kept and the new ones are written after them.
+
+    """
+
+    def __init__(self, path, append=False):
+        self.path = path
+        self.append = append
+        self._file = None
+        self._offsets = []
+        self._kept = 0  # records that `rollback` does not drop
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __len__(self):
+        return len(self._offsets)
+
+    def open(self):
+        if self.append and os.path.exists(self.path):
+            with DumpReader(self.path) as reader:
+                self._offsets = list(reader.offsets)
+                end = reader.end
+            self._file = open(self.path, "r+b")
+            self._file.truncate(end)  # the old index and footer, they are written again on close
+            self._file.seek(end)
+        else:
+            self._file = open(self.path, "wb")
+            self._file.write(_HEADER.pack(MAGIC, VERSION))
+        self._kept = len(self._offsets)
+
+    def write(self, body, md: MD):
+        packed = md.pack()
+        self._offsets.append(self._file.tell())
+        self._file.write(_RECORD.pack(_RECORD_MARKER, len(packed), len(body)))
+        self._file.write(packed)
+        self._file.write(body)
+
+    def flush(self):
+        """ Flushes the records written so far to the disk, `rollback` can still drop them """
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def keep(self):
+        """ Keeps the records written so far, `rollback` does not drop them anymore """
+        self._kept = len(self._offsets)
+
+    def sync(self):
+        self.flush()
+        self.keep()
+
+    def rollback(self):
+        """ Drops the records written after the last `keep` (or `sync`) """
+        if len(self._offsets) > self._kept:
+            self._file.seek(self._offsets[self._kept])
+            self._file.truncate()
+            del self._offsets[self._kept:]
+
+    def close(self):
+        if self._file is None:
+            return
+        try:
+            index_offset = self._file.tell()
+            self._file.write(b"".join(_OFFSET.pack(offset) for offset in self._offsets))
+            self._file.write(_FOOTER.pack(index_offset, len(self._offsets), _FOOTER_MARKER))
+            self.sync()
+        finally:
+            self._file.close()
+            self._file = None
+
+
+class DumpReader(object):
+    """
+
+        Reads a dump file through a memory map, without reading it into memory: the index is read once on open,
+        and `read` copies only the MD and the body of the record it reads.
+
+        Usage:
+            >>> with DumpReader("orders.dump") as reader:
+            >>>     print(len(reader))
+            >>>     for message in reader:  # WMMessage objects
+            >>>         print(message.msg_id, message.put_date_time, message.body)
+            >>>     last = reader[-1]
+
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.offsets = []
+        self.end = _HEADER.size  # the end of the last record
+        self._file = None
+        self._map = None
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __getitem__(self, number) -> WMMessage:
+        md = MD()
+        return WMMessage.from_md(self.read(self.offsets[number], md), md)
+
+    def __iter__(self):
+        md = MD()
+        for offset in self.offsets:
+            yield WMMessage.from_md(self.read(offset, md), md)
+
+    def open(self):
+        self._file = open(self.path, "rb")
+        size = os.fstat(self._file.fileno()).st_size
+        assert size >= _HEADER.size, "{0} is not a dump file".format(self.path)
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version = _HEADER.unpack_from(self._map)
+        assert magic == MAGIC, "{0} is not a dump file".format(self.path)
+        assert version == VERSION, "{0} is a dump file of version {1}".format(self.path, version)
+        self.offsets, self.end = self._index(size)
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._file.close()
+            self._map = self._file = None
+
+    def read(self, offset, md: MD) -> bytes:
+        """ Reads the record at `offset`, its MD into `md`, and returns its body (copied once, pymqi puts bytes) """
+        _, md_length, body_length = _RECORD.unpack_from(self._map, offset)
+        start = offset + _RECORD.size
+        md.unpack(self._map[start:start + md_length])
+        start += md_length
+        return self._map[start:start + body_length]
+
+    def _index(self, size):
+        """ The offsets of the records and the end of the last one, from the footer, or by a scan without it """
+        if size >= _HEADER.size + _FOOTER.size:
+            index_offset, count, marker = _FOOTER.unpack_from(self._map, size - _FOOTER.size)
+            if marker == _FOOTER_MARKER and index_offset + count * _OFFSET.size + _FOOTER.size == size:
+                index = self._map[index_offset:index_offset + count * _OFFSET.size]
+                return [offset for offset, in _OFFSET.iter_unpack(index)], index_offset
+        offsets = []
+        offset = _HEADER.size
+        while offset + _RECORD.size <= size:
+            marker, md_length, body_length = _RECORD.unpack_from(self._map, offset)
+            end = offset + _RECORD.size + md_length + body_length
+            if marker != _RECORD_MARKER or end > size:
+                break  # the record the writer was writing when it died
+            offsets.append(offset)
+            offset = end
+        return offsets, offset
+
+
+def dump(queue: WMQueue, path, destructive=False, limit=None, append=False, batch_size=100, max_length=None) -> int:
+    """
+    Writes the messages of a queue with their MQMD to a dump file, to replay them later with `restore`.
+    By default the messages are browsed and stay on the queue. With `destructive` they are got under syncpoint,
+    and every unit of work of `batch_size` messages is committed only once its messages were synced to the disk,
+    if the dump fails the messages of the current unit of work are backed out and dropped from the file.
+    The bodies are written as they were got, the codec of the queue is not used.
+    Usage:
+     >>> with WMQueue(qmgr, "ORDERS") as queue:
+     >>>     dump(queue, "orders.dump")
+    :param limit: Max number of messages to dump, None for all the messages on the queue.
+    :param append: Add the messages to the ones of an existing dump file.
+    :return: The number of messages written.
+    """
+    written = 0
+    with DumpWriter(path, append=append) as writer:
+        if not destructive:
+            for message, md in queue.browse_messages(max_length, with_descriptor=_RAW_MD):
+                if limit is not None and written >= limit:
+                    break
+                writer.write(message, md)
+                written += 1
+            return written
+
+        kept = len(writer)  # the records of the file that was appended to
+        batch = _SyncpointBatch(queue.qmgr, batch_size)
+        batch.before_commit = writer.flush
+        batch.after_commit = writer.keep
+        # a reconnect loses the unit of work, its messages are got again, so their records go with it
+        batch.on_drop = writer.rollback
+        try:
+            if limit is None or limit > 0:
+                for message, md in queue._read_under_syncpoint(batch, 0, max_length, _RAW_MD, decode=False):
+                    writer.write(message, md)
+                    if len(writer) - kept == limit:
+                        break
+            queue._commit(batch)
+        except BaseException:
+            batch.backout()
+            writer.rollback()
+            raise
+        return len(writer) - kept
+
+
+def restore(path, queue: WMQueue, start=0, stop=None, batch_size=100, rate=None, speed=None,
+            new_msg_ids=False) -> int:
+    """
+    Puts the messages of a dump file on a queue, with their MQMD, in units of work of `batch_size` messages.
+    At full speed (no `rate` nor `speed`) the puts are only limited by the queue manager, with `rate` they are
+    spread to that many messages per second, and with `speed` they follow the put times of the dump,
+    1 for the pace the messages were put at, 2 for twice as fast. A unit of work is committed before every wait,
+    so the messages show up on the queue when they are due.
+    The put date and time and the other context fields are set by the queue manager, like for any put.
+    If a put fails, the messages of the current unit of work are backed out and the exception is raised.
+    Usage:
+     >>> with WMQueue(qmgr, "ORDERS.REPLAY") as queue:
+     >>>     restore("orders.dump", queue, speed=1)
+    :param start: The number of the first message to put.
+    :param stop: The number of the message to stop before, None for the end of the file.
+    :param new_msg_ids: Let the queue manager give the messages new MsgIds, to restore a dump more than once.
+    :return: The number of messages put.
+    """
+    assert rate is None or speed is None, "The pace is set by rate or by speed, not both"
+    assert (rate is None or rate > 0) and (speed is None or speed > 0), "The rate and speed have to be positive"
+    md = MD()
+    pmo = queue._syncpoint_pmo()
+    batch = _SyncpointBatch(queue.qmgr, batch_size)
+    put = 0
+    with DumpReader(path) as reader:
+        offsets = reader.offsets[start:stop]
+        started = time.monotonic()
+        first_put_at = None
+        try:
+            for offset in offsets:
+                body = reader.read(offset, md)
+                if rate is not None:
+                    due = started + put / rate
+                elif speed is not None:
+                    put_at = _put_seconds(md.PutDate, md.PutTime)
+                    first_put_at = put_at if first_put_at is None else first_put_at
+                    due = started + (put_at - first_put_at) / speed
+                else:
+                    due = None
+                if due is not None and due > time.monotonic():
+                    batch.commit()
+                    time.sleep(max(0.0, due - time.monotonic()))
+                if new_msg_ids:
+                    md.MsgId = MQMI_NONE
+                queue._put(body, md, pmo)
+                batch.add()
+                put += 1
+                batch.commit_if_due()
+            batch.commit()
+        except BaseException:
+            batch.backout()
+            raise
+    return put
+
+
+def _put_seconds(put_date: bytes, put_time: bytes) -> float:
+    """ The PutDate and PutTime of an MD in seconds since the epoch, 0 if they are not set """
+    try:
+        date, put_time = put_date.decode("ascii"), put_time.decode("ascii")
+        return calendar.timegm((int(date[:4]), int(date[4:6]), int(date[6:8]),
+                                int(put_time[:2]), int(put_time[2:4]), int(put_time[4:6]))) + int(put_time[6:8]) / 100
+    except (ValueError, UnicodeDecodeError):
+        return 0.0
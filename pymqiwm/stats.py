@@ -0,0 +1,217 @@
+import threading
+import time
+from pymqiwm.mqi import MQMIError
+from pymqiwm.mqi.CMQC import MQRC_UNKNOWN_OBJECT_NAME
+
+
+class QueueStats(object):
+    """
+    A snapshot of the stats of a queue, taken by `QueueStatsPoller`.
+    The rates are in messages per second, derived from the previous snapshot of the queue (None for the first one).
+    `depth_rate` is the net change of the depth, `enqueue_rate` and `dequeue_rate` (and the `enqueued` and `dequeued`
+    totals since the poller started) are only known when the poller resets the queue counters.
+    """
+
+    __slots__ = ("name", "timestamp", "depth", "max_depth", "open_input_count", "open_output_count",
+                 "uncommitted_messages", "oldest_message_age", "depth_rate",
+                 "enqueued", "dequeued", "enqueue_rate", "dequeue_rate")
+
+    def __init__(self, name, timestamp, status: dict, previous=None, counters=None):
+        self.name = name
+        self.timestamp = timestamp
+        self.depth = status["current depth"]
+        self.max_depth = status["max depth"]
+        self.open_input_count = status["open input count"]
+        self.open_output_count = status["open output count"]
+        self.uncommitted_messages = status["uncommitted messages"]
+        self.oldest_message_age = status["oldest message age"]
+
+        elapsed = timestamp - previous.timestamp if previous is not None else 0
+        self.depth_rate = (self.depth - previous.depth) / elapsed if elapsed > 0 else None
+
+        self.enqueued = self.dequeued = self.enqueue_rate = self.dequeue_rate = None
+        if counters is not None:
+            put, red = counters["messages put since reset"], counters["messages red since reset"]
+            counted_before = previous is not None and previous.enqueued is not None
+            self.enqueued = put + (previous.enqueued if counted_before else 0)
+            self.dequeued = red + (previous.dequeued if counted_before else 0)
+            if counted_before and elapsed > 0:
+                self.enqueue_rate = put / elapsed
+                self.dequeue_rate = red / elapsed
+
+    @property
+    def age(self) -> float:
+        """ Seconds since the snapshot was taken """
+        return time.monotonic() - self.timestamp
+
+    def as_dict(self) -> dict:
+        return {field: getattr(self, field) for field in self.__slots__}
+
+
+class QueueStatsPoller(object):
+    """
+
+        Keeps the stats of many queues in a cache, refreshed by a background thread every `interval` seconds.
+        Every refresh is a single INQUIRE_Q_STATUS and a single INQUIRE_Q PCF call for all the watched queues,
+        and never resets the statistics of the queues, unless `reset_counters` is set.
+
+        Usage:
+            >>> def connect():
+            >>>     return WMQueueManager(name=..., conn_info=...)
+
+            >>> with QueueStatsPoller(connect, ["APP.IN", "APP.OUT", "BATCH.*"], interval=5) as stats:
+            >>>     print(stats.depth("APP.IN"))
+            >>>     with WMQueue(qmgr, "APP.IN", stats=stats) as queue:
+            >>>         while queue > 50:  # served from the cache, no MQINQ per comparison
+            >>>             time.sleep(1)
+
+        A snapshot older than `ttl` seconds is refreshed on the spot by the thread asking for it,
+        so with `interval=None` there is no background thread and the cache is only refreshed on demand.
+        Queue names that differ only by their last qualifier are inquired with a generic name (for example "APP.*"),
+        a queue that does not exist is left out of the cache, and `get` raises KeyError for it.
+        With `reset_counters`, the enqueue/dequeue counters of the queues are read with MQCMD_RESET_Q_STATS
+        to get the enqueue and dequeue rates, this resets them for any other tool that reads them.
+        The reset is made once per exact watched name, never with a generic name, so only the queues that are
+        watched by name are reset, and the queues watched through a generic name have no enqueue/dequeue counts.
+
+    """
+
+    def __init__(self, connect, names=(), interval=5, ttl=None, reset_counters=False):
+        """
+        :param connect: A function that returns a new (not connected) `WMQueueManager`,
+                        the poller makes its own connection.
+        :param names: Queue names or generic names ("APP.*") to watch, `get` of another name adds it.
+        :param interval: Seconds between refreshes of the background thread, None for no thread.
+        :param ttl: Max age in seconds of a snapshot returned from the cache, defaults to `interval`.
+        """
+        assert interval is None or interval > 0, "The interval has to be positive"
+        self.connect = connect
+        self.interval = interval
+        self.ttl = ttl if ttl is not None else (interval or 0)
+        self.reset_counters = reset_counters
+        self.polls = 0
+        self.errors = []
+
+        self._names = set(names)
+        self._polled_names = set()
+        self._polled_at = None
+        self._snapshots = {}
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._thread = None
+        self._qmgr = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def start(self):
+        self._stopping.clear()
+        self._qmgr = self.connect().__enter__()
+        if self._names:
+            self.poll()
+        if self.interval is not None:
+            self._thread = threading.Thread(target=self._poll_periodically, name="pymqiwm-stats-poller", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        with self._lock:
+            if self._qmgr is not None:
+                self._qmgr.__exit__(None, None, None)
+                self._qmgr = None
+
+    def watch(self, *names):
+        """ Adds queue names (or generic names) to the next refreshes """
+        with self._lock:
+            self._names.update(names)
+
+    def get(self, name) -> QueueStats:
+        """ Returns the stats of a queue, refreshing them first if they are older than `ttl` """
+        snapshot = self._snapshots.get(name)
+        if snapshot is None or snapshot.age > self.ttl:
+            if name not in self._names:
+                self.watch(name)
+            self.poll(max_age=self.ttl)
+            snapshot = self._snapshots.get(name)
+            if snapshot is None:
+                raise KeyError(name)
+        return snapshot
+
+    def depth(self, name) -> int:
+        return self.get(name).depth
+
+    def snapshot(self) -> dict:
+        """ Returns the last stats of all the watched queues, without refreshing them """
+        return {name: stats.as_dict() for name, stats in self._snapshots.items()}
+
+    def poll(self, max_age=None) -> dict:
+        """
+        Refreshes the stats of all the watched queues now.
+        :param max_age: Skip the refresh if another thread refreshed them less than `max_age` seconds ago.
+        :return: dict of queue name to `QueueStats`.
+        """
+        with self._lock:
+            assert self._qmgr is not None, "The poller has to be started"
+            if max_age is not None and self._polled_at is not None and self._names <= self._polled_names and \
+                    time.monotonic() - self._polled_at <= max_age:
+                return dict(self._snapshots)
+            now = time.monotonic()
+            snapshots = {}
+            counters = {}
+            if self.reset_counters:
+                # only the exact names that were given, a reset of a queue that is not watched would lose its counts
+                for name in sorted(name for name in self._names if not name.endswith("*")):
+                    counters.update(self._inquire(self._qmgr.reset_queue_stats, name))
+            for pattern, names in self._patterns():
+                statuses = self._inquire(self._qmgr.inquire_queues_status, pattern)
+                for name, status in statuses.items():
+                    if (names is None or name in names) and name not in snapshots:
+                        snapshots[name] = QueueStats(name, now, status, self._snapshots.get(name),
+                                                     counters.get(name) if self.reset_counters else None)
+            self._snapshots = snapshots
+            self._polled_names = set(self._names)
+            self._polled_at = now
+            self.polls += 1
+            return dict(snapshots)
+
+    def _patterns(self):
+        """
+        Yields (generic name, names to keep or None for all) to inquire, every generic name is a single PCF call.
+        The exact names with the same qualifiers but the last one ("APP1.IN" and "APP1.OUT") are inquired together
+        with the generic name of these qualifiers ("APP1.*"), and the other ones one by one,
+        so a poll never inquires the queues of other applications, let alone all the queues ("*").
+        """
+        groups = {}
+        for name in self._names:
+            if name.endswith("*"):
+                yield name, None
+            else:
+                groups.setdefault(name[:name.rfind(".") + 1], []).append(name)
+        for qualifiers, names in sorted(groups.items()):
+            if qualifiers and len(names) > 1:
+                yield qualifiers + "*", set(names)
+            else:
+                for name in sorted(names):
+                    yield name, {name}
+
+    def _inquire(self, inquire, pattern) -> dict:
+        try:
+            return inquire(pattern)
+        except MQMIError as e:
+            if e.reason == MQRC_UNKNOWN_OBJECT_NAME:
+                return {}
+            raise
+
+    def _poll_periodically(self):
+        while not self._stopping.wait(self.interval):
+            try:
+                self.poll()
+            except Exception as e:
+                self.errors.append(e)
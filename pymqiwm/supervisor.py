@@ -0,0 +1,280 @@
+import math
+import multiprocessing
+import threading
+import time
+from pymqiwm.consumer import QueueConsumer
+from pymqiwm.queue import WMQueue
+
+# The counters of `QueueConsumer.stats` every worker process publishes to the supervisor
+_FIELDS = ("received", "handled", "errors", "backouts", "poison")
+
+
+def _worker_main(connect, queue_name, handler, options, stop, counters, slot, stats_interval):
+    """ The body of a worker process: a `QueueConsumer` that publishes its counters to `counters[slot]` """
+    consumer = QueueConsumer(connect, queue_name, handler, **options)
+    base = slot * len(_FIELDS)
+
+    def publish():
+        stats = consumer.stats()
+        for index, field in enumerate(_FIELDS):
+            counters[base + index] = stats[field]
+
+    try:
+        with consumer:  # raises the error of a failed getter, the process exits with 1 and is started again
+            while not stop.wait(stats_interval):
+                publish()
+                if not consumer.is_running:
+                    break
+    finally:
+        publish()
+
+
+class _Seat(object):
+    """ A place for a worker process, the counters of the process are in the shared array at `slot` """
+
+    __slots__ = ("slot", "process", "stop", "started_at", "restart_at", "retired")
+
+    def __init__(self, slot):
+        self.slot = slot
+        self.process = None
+        self.stop = None
+        self.started_at = 0.0
+        self.restart_at = 0.0
+        self.retired = False  # asked to stop, it is not started again when it exits
+
+
+class ProcessSupervisor(object):
+    """
+
+        Consumes a queue with several worker processes, for handlers that need more than one core.
+
+        Every worker process makes its own connection with `connect` and runs a `QueueConsumer` on it,
+        so the options of `QueueConsumer` (`threads` is its `workers`, `syncpoint`, `codec`, ...) apply per process.
+        The supervisor starts a worker process again when it dies, and when `max_processes` is above `processes`,
+        adds and removes worker processes every `scale_interval` seconds so there is one per `messages_per_process`
+        messages on the queue, as reported by `WMQueue.depth()` on a connection of its own.
+
+        Usage:
+            >>> def connect():
+            >>>     return WMQueueManager(name=..., conn_info=...)
+
+            >>> def handle(message):
+            >>>     ...  # CPU heavy
+
+            >>> if __name__ == "__main__":
+            >>>     with ProcessSupervisor(connect, "DAVAY", handle, processes=2, max_processes=8) as supervisor:
+            >>>         time.sleep(60)
+            >>>         print(supervisor.stats())
+
+        The worker processes are started with the "spawn" method by default, so `connect` and `handler` have to be
+        functions of a module (not lambdas or closures), and the script needs the `if __name__ == "__main__"` guard.
+        "fork" is faster to start, but only safe when the parent process did not use the MQ client before.
+        The counters of the workers are kept in shared memory, the messages themselves never go through the parent.
+
+    """
+
+    def __init__(self,
+                 connect,
+                 queue_name: str,
+                 handler,
+                 processes=2,
+                 max_processes=None,
+                 messages_per_process=1000,
+                 scale_interval=5,
+                 threads=1,
+                 restart_delay=1,
+                 stats_interval=1,
+                 start_method="spawn",
+                 **consumer_options):
+        """
+        :param connect: A function that returns a new (not connected) `WMQueueManager`, called in every process.
+        :param handler: A function that gets the body of every message, called in the worker processes.
+        :param processes: The number of worker processes, the minimum when scaling.
+        :param max_processes: The most worker processes to scale up to, None does not scale.
+        :param threads: The handler threads of every worker process.
+        :param restart_delay: Seconds to wait before starting a worker process that died again.
+        :param stats_interval: Seconds between two updates of the counters of a worker process.
+        :param consumer_options: Passed to the `QueueConsumer` of every worker process.
+        """
+        max_processes = max_processes or processes
+        assert 0 < processes <= max_processes, "Has to run at least one and at most max_processes processes"
+        assert messages_per_process > 0, "messages_per_process has to be positive"
+        self.connect = connect
+        self.queue_name = queue_name
+        self.handler = handler
+        self.processes = processes
+        self.max_processes = max_processes
+        self.messages_per_process = messages_per_process
+        self.scale_interval = scale_interval
+        self.restart_delay = restart_delay
+        self.stats_interval = stats_interval
+        self.consumer_options = dict(consumer_options, workers=threads)
+        self.errors = []  # errors of the depth checks, the errors of the workers are in their stderr
+        self.restarts = 0
+
+        self._context = multiprocessing.get_context(start_method)
+        self._counters = self._context.RawArray("d", max_processes * len(_FIELDS))
+        self._seats = [_Seat(slot) for slot in range(max_processes)]
+        self._finished = dict.fromkeys(_FIELDS, 0)  # the counters of the worker processes that exited
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._thread = None
+        self._depth = None
+        self._started = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    @property
+    def is_running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        assert not self.is_running, "The supervisor is already running"
+        self._stopping.clear()
+        self._started = time.monotonic()
+        with self._lock:
+            for seat in self._seats[:self.processes]:
+                self._spawn(seat)
+        self._thread = threading.Thread(target=self._supervise, name="{0}-supervisor".format(self.queue_name),
+                                        daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        """
+        Asks every worker process to stop once its messages in flight were handled, and waits for them.
+        :param timeout: Max seconds to wait, the worker processes that did not stop by then are terminated.
+        """
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._lock:
+            for seat in self._seats:
+                self._ask_to_stop(seat)
+            for seat in self._seats:
+                if seat.process is None:
+                    continue
+                seat.process.join(None if deadline is None else max(0, deadline - time.monotonic()))
+                if seat.process.is_alive():
+                    seat.process.terminate()
+                    seat.process.join()
+                self._collect(seat)
+
+    def stats(self) -> dict:
+        """
+        Returns the counters of all the worker processes together (including the ones that exited),
+        the throughput since the start, and the counters of every running worker process by its pid.
+        """
+        elapsed = time.monotonic() - self._started if self._started else 0.0
+        with self._lock:
+            totals = dict(self._finished)
+            workers = {}
+            for seat in self._seats:
+                if seat.process is not None:
+                    counters = self._read(seat.slot)
+                    workers[seat.process.pid] = dict(counters, alive=seat.process.is_alive())
+                    for field in _FIELDS:
+                        totals[field] += counters[field]
+        totals.update({
+            "processes": sum(1 for worker in workers.values() if worker["alive"]),
+            "restarts": self.restarts,
+            "depth": self._depth,
+            "msgs per sec": totals["handled"] / elapsed if elapsed else 0.0,
+            "workers": workers,
+        })
+        return totals
+
+    def _supervise(self):
+        next_scale = time.monotonic()
+        scaling = self.max_processes > self.processes
+        qmgr = queue = None
+        try:
+            while not self._stopping.wait(0.2):
+                with self._lock:
+                    self._restart_dead()
+                if scaling and time.monotonic() >= next_scale:
+                    next_scale = time.monotonic() + self.scale_interval
+                    try:
+                        if queue is None:
+                            qmgr = self.connect().__enter__()
+                            queue = WMQueue(qmgr, self.queue_name).__enter__()
+                        self._depth = queue.depth()
+                    except Exception as e:
+                        self.errors.append(e)
+                        qmgr = queue = self._close(qmgr, queue)
+                        continue
+                    with self._lock:
+                        self._scale(self._depth)
+        finally:
+            self._close(qmgr, queue)
+
+    def _close(self, qmgr, queue):
+        for opened in (queue, qmgr):
+            if opened is not None:
+                try:
+                    opened.__exit__(None, None, None)
+                except Exception as e:
+                    self.errors.append(e)
+        return None
+
+    def _restart_dead(self):
+        now = time.monotonic()
+        for seat in self._seats:
+            if seat.process is None:
+                continue
+            if seat.process.is_alive():
+                continue
+            if seat.restart_at == 0.0:  # just found dead
+                seat.process.join()
+                self._collect(seat)
+                if seat.retired or self._stopping.is_set():
+                    seat.process = None
+                    continue
+                seat.restart_at = now + self.restart_delay
+            if now >= seat.restart_at:
+                self.restarts += 1
+                self._spawn(seat)
+
+    def _scale(self, depth):
+        wanted = min(self.max_processes, max(self.processes, math.ceil(depth / self.messages_per_process)))
+        running = [seat for seat in self._seats if seat.process is not None and not seat.retired]
+        for seat in running[wanted:]:  # the newest ones first, the seats are in order
+            seat.retired = True
+            self._ask_to_stop(seat)
+        free = [seat for seat in self._seats if seat.process is None]
+        for seat in free[:max(0, wanted - len(running))]:
+            self._spawn(seat)
+
+    def _ask_to_stop(self, seat):
+        # only a live process, one that died while waiting on its event may have left the lock of the event taken
+        if seat.process is not None and seat.process.is_alive():
+            seat.stop.set()
+
+    def _spawn(self, seat):
+        seat.stop = self._context.Event()  # a new one every time, see `_ask_to_stop`
+        seat.retired = False
+        seat.restart_at = 0.0
+        seat.started_at = time.monotonic()
+        seat.process = self._context.Process(
+            target=_worker_main,
+            args=(self.connect, self.queue_name, self.handler, self.consumer_options, seat.stop,
+                  self._counters, seat.slot, self.stats_interval),
+            name="{0}-worker_{1}".format(self.queue_name, seat.slot), daemon=True)
+        seat.process.start()
+
+    def _collect(self, seat):
+        """ Moves the counters of an exited worker process to the totals, so the slot can be reused """
+        for field, value in self._read(seat.slot).items():
+            self._finished[field] += value
+        base = seat.slot * len(_FIELDS)
+        for index in range(len(_FIELDS)):
+            self._counters[base + index] = 0
+
+    def _read(self, slot) -> dict:
+        base = slot * len(_FIELDS)
+        return {field: int(self._counters[base + index]) for index, field in enumerate(_FIELDS)}
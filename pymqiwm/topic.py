@@ -1,19 +1,229 @@
-from pymqi import Topic
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import suppress
+from pymqiwm.mqi import Topic, Subscription, QueueManager
+from pymqiwm.mqi import PYIFError
+from pymqiwm.mqi import MD, PMO
+from pymqiwm.mqi.CMQC import (MQOO_OUTPUT, MQOO_FAIL_IF_QUIESCING, MQOO_INPUT_AS_Q_DEF, MQOO_BROWSE, MQOO_INQUIRE,
+                              MQSO_CREATE, MQSO_RESUME, MQSO_DURABLE, MQSO_NON_DURABLE, MQSO_MANAGED,
+                              MQSO_FAIL_IF_QUIESCING, MQCO_NONE, MQCO_REMOVE_SUB, MQFMT_STRING,
+                              MQPMO_SYNCPOINT, MQPMO_FAIL_IF_QUIESCING)
+from pymqiwm.codec import get_codec
+from pymqiwm.queue import WMQueue, _SyncpointBatch
+
+_NO_MESSAGE = object()
 
 
 class WMTopic(object):
-    def __init__(self, queue_manager, topic_name=None, topic_string=None, topic_desc=None, open_opts=None):
-        super(WMTopic, self).__init__(queue_manager, topic_name, topic_string, topic_desc, open_opts)
+    """
+
+        A wrapper class for the pymqi.Topic class.
+
+        Usage:
+
+             >>> with WMTopic(qmgr, "prices/eur") as topic:
+             >>>     topic.publish("1.0712")
+             >>>     topic.publish_many(prices, batch_size=100)
+
+        The topic is opened for output once when the `with` enters, every publish reuses that handle.
+        `topic_name` is the name of an administrative topic object, when both are given
+        the topic string of the object is the prefix of `topic_string`.
+        With a `codec` the publications are objects encoded like by `WMQueue(..., codec=...)`.
+
+    """
+
+    def __init__(self, qmgr, topic_string: str = None, topic_name: str = None, codec=None):
+        assert topic_string or topic_name, "A topic string or a topic name is needed"
+        self.qmgr = qmgr
+        self.topic_string = topic_string
         self.topic_name = topic_name
-        self.qmgr = queue_manager
+        self.codec = get_codec(codec)
+        self.topic = self._new_topic()
+
+    def __enter__(self):
+        assert self.qmgr.is_connected, "Has to be connected to the queue manager"
+        self.topic.open(open_opts=MQOO_OUTPUT | MQOO_FAIL_IF_QUIESCING)
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        with suppress(PYIFError):  # the topic was never opened
+            self.topic.close()
+
+    def publish(self, msg, *opts):
+        """
+        Publishes a message on the topic.
+        Usage:
+         >>> with WMTopic(qmgr=..., topic_string=...) as topic:
+         >>>     topic.publish(msg="Test")
+        :param msg: The body of the message, a str is encoded as utf-8 with the MQFMT_STRING format,
+                    or the object to encode with the codec.
+        :param opts: can be specified for further instructions (MD, PMO).
+        """
+        if self.codec is not None:
+            md = opts[0] if opts and opts[0] is not None else MD()
+            md.Format = self.codec.format
+            if self.codec.ccsid is not None:
+                md.CodedCharSetId = self.codec.ccsid
+            msg, opts = self.codec.encode(msg), (md,) + opts[1:]
+        elif isinstance(msg, str):
+            md = opts[0] if opts and opts[0] is not None else MD()
+            md.Format = MQFMT_STRING
+            msg, opts = msg.encode("utf-8"), (md,) + opts[1:]
+        self.topic.pub(msg, *opts)
+
+    def publish_many(self, messages, batch_size=100, batch_interval_ms=None):
+        """
+        Publishes all the messages under syncpoint, committing every `batch_size` messages
+        or every `batch_interval_ms` milliseconds, the same way as `WMQueue.put_many`.
+        The subscribers get the messages of a batch when it is committed.
+        If a publish fails, the messages of the current batch are backed out and the exception is raised.
+        :param messages: An iterable of message bodies, can be a generator.
+        :return: The number of messages that were published.
+        """
+        batch = _SyncpointBatch(self.qmgr, batch_size, batch_interval_ms)
+        pmo = PMO()
+        pmo.Options = MQPMO_SYNCPOINT | MQPMO_FAIL_IF_QUIESCING
+        count = 0
+        try:
+            for message in messages:
+                self.publish(message, MD(), pmo)
+                batch.add()
+                count += 1
+                batch.commit_if_due()
+            batch.commit()
+        except BaseException:
+            batch.backout()
+            raise
+        return count
+
+    def _new_topic(self):
+        """ Returns a new topic object on the connection, the open is deferred """
+        if isinstance(self.qmgr, QueueManager):
+            return Topic(self.qmgr, topic_name=self.topic_name, topic_string=self.topic_string)
+        # if the qmgr passed is of type WMQueueManager
+        return self.qmgr.backend.topic(self.qmgr.qmgr, self.topic_string, self.topic_name)
+
+
+class WMSubscription(WMQueue):
+    """
+
+        A subscription to a topic, read like a queue.
+
+        Usage:
+
+             >>> with WMSubscription(qmgr, "prices/#") as subscription:
+             >>>     for message in subscription.read_messages_while_waiting(5):
+             >>>         print(message)
+
+        Every read of `WMQueue` works on the publications, with the same semantics
+        (`read_messages_while_waiting`, `read_messages_in_batches`, `get_many`, `browse_messages`, ...).
+
+        By default the subscription is managed and non durable: the queue manager creates a queue for it,
+        and both are removed when the `with` exits.
+        A `durable` subscription needs a `subscription_name`, it keeps collecting publications while nobody reads it,
+        and the next `WMSubscription` with the same name resumes it. It is removed only with `remove_on_exit`.
+        With `queue_name` the publications are put on an existing queue instead of a managed one.
+
+        A managed subscription can be read by one handle at a time, `fan_out` spreads its publications
+        over several handler threads. To get them in parallel over several connections, subscribe durably
+        to a `queue_name` and consume that queue with `QueueConsumer(..., getters=N)`.
+
+    """
+
+    def __init__(self,
+                 qmgr,
+                 topic_string: str = None,
+                 topic_name: str = None,
+                 subscription_name: str = None,
+                 durable=False,
+                 queue_name: str = None,
+                 remove_on_exit=False,
+                 max_buffer_size=4194304,
+                 codec=None):
+        assert topic_string or topic_name, "A topic string or a topic name is needed"
+        assert subscription_name or not durable, "A durable subscription needs a name"
+        open_options = MQOO_INPUT_AS_Q_DEF | MQOO_BROWSE | MQOO_INQUIRE | MQOO_FAIL_IF_QUIESCING
+        super(WMSubscription, self).__init__(qmgr, queue_name or "", open_options, max_buffer_size, codec=codec)
         self.topic_string = topic_string
-        self.topic_desc = topic_desc
-        self.open_opts = open_opts
+        self.topic_name = topic_name
+        self.subscription_name = subscription_name
+        self.durable = durable
+        self.managed = queue_name is None
+        self.remove_on_exit = remove_on_exit
+        self.subscription = None
+
+    def _open(self):
+        """ Subscribes, and subscribes again after a reconnect, which resumes a durable subscription """
+        if not self.managed:
+            self.queue.open(self.name, self.open_options)
+        options = MQSO_CREATE | MQSO_FAIL_IF_QUIESCING
+        options |= MQSO_DURABLE | MQSO_RESUME if self.durable else MQSO_NON_DURABLE
+        if self.managed:
+            options |= MQSO_MANAGED
+        subscription = self._new_subscription()
+        try:
+            subscription.sub(sub_queue=None if self.managed else self.queue, sub_name=self.subscription_name,
+                             sub_opts=options, topic_name=self.topic_name, topic_string=self.topic_string)
+        except BaseException:
+            if not self.managed:
+                self.queue.close()
+            raise
+        self.subscription = subscription
+        if self.managed:
+            self.queue = subscription.sub_queue  # opened by MQSUB, for input, browse and inquire
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._close_handles()
+        try:
+            if self.subscription is not None:
+                self.subscription.close(MQCO_REMOVE_SUB if self.remove_on_exit else MQCO_NONE)
+        finally:
+            self.subscription = None
+            with suppress(PYIFError):
+                self.queue.close()
+            self.queue = self._new_queue()
+
+    def fan_out(self, handler, workers=4, seconds_wait_interval=0, max_in_flight=100, max_length=None) -> dict:
+        """
+        Reads the publications with `read_messages_while_waiting` and calls `handler(message)` on `workers` threads,
+        with at most `max_in_flight` messages read but not handled yet.
+        Returns when the read stops (see `seconds_wait_interval` of `read_messages_while_waiting`)
+        and all the messages were handled. A message whose handler raised is counted as failed and dropped.
+        :return: dict of the "handled" and "failed" counts.
+        """
+        assert workers > 0 and max_in_flight > 0, "The sizes have to be positive"
+        slots = threading.BoundedSemaphore(max_in_flight)
+        lock = threading.Lock()
+        counts = Counter()
 
-    def publish(self, msg):
-        pass
+        def handle(message):
+            outcome = "failed"  # also when the handler raised something that is not an Exception
+            try:
+                handler(message)
+                outcome = "handled"
+            except Exception:
+                pass
+            finally:
+                with lock:
+                    counts[outcome] += 1
+                slots.release()
 
-"""
-NOT FINISHED YET
-"""
+        prefix = "{0}-worker".format(self.subscription_name or self.topic_string)
+        messages = self.read_messages_while_waiting(seconds_wait_interval, max_length)
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix=prefix) as pool:
+            while True:
+                slots.acquire()  # before the read, so at most `max_in_flight` messages are read ahead
+                message = next(messages, _NO_MESSAGE)
+                if message is _NO_MESSAGE:
+                    slots.release()
+                    break
+                pool.submit(handle, message)
+        return {"handled": counts["handled"], "failed": counts["failed"]}
 
+    def _new_subscription(self):
+        """ Returns a new subscription object on the connection, `sub` makes the MQSUB """
+        if isinstance(self.qmgr, QueueManager):
+            return Subscription(self.qmgr)
+        # if the qmgr passed is of type WMQueueManager
+        return self.qmgr.backend.subscription(self.qmgr.qmgr)
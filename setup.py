@@ -8,8 +8,14 @@ setup(name='pymqiwm',
       author='Maxim Vovshin',
       author_email='hyaxia@gmail.com',
       license='DAVAY',
-      packages=['pymqiwm'],
+      packages=['pymqiwm', 'pymqiwm.mqi'],
       install_requires=[
           'py3mqi',
       ],
+      extras_require={
+          'msgpack': ['msgpack'],
+      },
+      entry_points={
+          'console_scripts': ['pymqiwm=pymqiwm.cli:main'],
+      },
       zip_safe=False)
@@ -0,0 +1,38 @@
+import pytest
+import pymqiwm.queue
+from pymqiwm import FakeBackend, WMQueueManager
+from pymqiwm.fake_backend import FakeQueue, FakeQueueManager
+
+QMGR = "QM"
+
+
+@pytest.fixture
+def backend():
+    backend = FakeBackend()
+    backend.define_queue(QMGR, "Q")
+    return backend
+
+
+@pytest.fixture
+def connect(backend):
+    """ Returns a function that makes a new (not connected) `WMQueueManager` on the fake backend """
+    def connect(**options):
+        return WMQueueManager(QMGR, "host1(1414)", backend=backend, **options)
+    return connect
+
+
+@pytest.fixture
+def qmgr(connect):
+    with connect() as qmgr:
+        yield qmgr
+
+
+@pytest.fixture
+def raw_qmgr(backend, monkeypatch):
+    """ A connected fake in place of a raw `pymqi.QueueManager` """
+    monkeypatch.setattr(pymqiwm.queue, "QueueManager", FakeQueueManager)
+    monkeypatch.setattr(pymqiwm.queue, "Queue", FakeQueue)
+    qmgr = backend.queue_manager()
+    qmgr.connect(QMGR)
+    yield qmgr
+    qmgr.disconnect()
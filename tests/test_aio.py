@@ -0,0 +1,115 @@
+import asyncio
+import time
+import pytest
+from pymqiwm import AsyncWMQueue, AsyncWMQueueManager, WMQueue
+from pymqiwm.mqi import MQMIError
+from pymqiwm.mqi.CMQC import MQRC_NO_MSG_AVAILABLE
+
+
+def run(backend, coroutine_function):
+    async def main():
+        async with AsyncWMQueueManager("QM", "host1(1414)", backend=backend) as qmgr:
+            return await coroutine_function(qmgr)
+    return asyncio.run(main())
+
+
+def test_put_get_and_read(backend):
+    async def main(qmgr):
+        async with AsyncWMQueue(qmgr, "Q") as queue:
+            await queue.put_many([b"1", b"2", b"3"])
+            assert await queue.depth() == 3
+            assert await queue.get() == b"1"
+            assert [message async for message in queue.read_messages_while_waiting()] == [b"2", b"3"]
+            with pytest.raises(MQMIError) as raised:
+                await queue.get()
+            assert raised.value.reason == MQRC_NO_MSG_AVAILABLE
+
+    run(backend, main)
+
+
+def test_a_waiting_get_does_not_block_the_event_loop(backend):
+    async def main(qmgr):
+        ticks = []
+
+        async def tick():
+            while True:
+                ticks.append(time.monotonic())
+                await asyncio.sleep(0.01)
+
+        async with AsyncWMQueue(qmgr, "Q", cancel_check_interval=0.05) as queue:
+            ticker = asyncio.ensure_future(tick())
+            started = time.monotonic()
+            with pytest.raises(MQMIError):
+                await queue.get(seconds_wait_interval=0.3)
+            ticker.cancel()
+        assert time.monotonic() - started >= 0.25
+        assert len(ticks) >= 10
+
+    run(backend, main)
+
+
+def test_a_waiting_get_returns_a_message_put_on_another_connection(backend, qmgr):
+    async def main(async_qmgr):
+        async with AsyncWMQueue(async_qmgr, "Q", cancel_check_interval=0.05) as queue:
+            get = asyncio.ensure_future(queue.get(seconds_wait_interval=-1))
+            await asyncio.sleep(0.1)
+            assert not get.done()
+            with WMQueue(qmgr, "Q") as other:
+                other.put(b"m")
+            assert await asyncio.wait_for(get, 5) == b"m"
+
+    run(backend, main)
+
+
+def test_cancelling_a_waiting_get_stops_it_within_the_check_interval(backend):
+    async def main(qmgr):
+        async with AsyncWMQueue(qmgr, "Q", cancel_check_interval=0.05) as queue:
+            get = asyncio.ensure_future(queue.get(seconds_wait_interval=-1))
+            await asyncio.sleep(0.1)
+            get.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await get
+            started = time.monotonic()
+            await queue.put(b"m")  # runs after the cancelled MQGETs on the executor of the connection
+            assert time.monotonic() - started < 1
+            assert await queue.get() == b"m"
+
+    run(backend, main)
+
+
+def test_a_message_got_while_cancelling_is_returned_by_the_next_get(backend):
+    backend.latencies["MQGET"] = 0.2
+
+    async def main(qmgr):
+        async with AsyncWMQueue(qmgr, "Q") as queue:
+            await queue.put_many([b"first", b"second"])
+            get = asyncio.ensure_future(queue.get())
+            await asyncio.sleep(0.05)  # the MQGET of the first message is in flight
+            get.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await get
+            await asyncio.sleep(0.3)
+            assert await queue.get() == b"first"
+            assert await queue.get() == b"second"
+
+    run(backend, main)
+
+
+def test_close_puts_back_the_message_of_a_cancelled_get(backend, qmgr):
+    backend.latencies["MQGET"] = 0.2
+
+    async def main(async_qmgr):
+        async with AsyncWMQueue(async_qmgr, "Q") as queue:
+            await queue.put_many([b"first", b"second"])
+            get = asyncio.ensure_future(queue.get())
+            await asyncio.sleep(0.05)
+            get.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await get
+            await asyncio.sleep(0.3)
+            assert len(queue._pending) == 1
+
+    run(backend, main)
+    del backend.latencies["MQGET"]
+    with WMQueue(qmgr, "Q") as queue:
+        assert sorted(queue.read_messages_while_waiting()) == [b"first", b"second"]
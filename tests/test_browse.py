@@ -0,0 +1,88 @@
+import json
+import time
+import pytest
+from pymqiwm import BrowseCursor, ParallelBrowser, WMQueue
+from pymqiwm.mqi import MD, MQMIError
+from pymqiwm.mqi.CMQC import MQRC_SELECTION_NOT_AVAILABLE
+
+
+def put_numbered(queue, count, **md_fields):
+    for i in range(count):
+        queue.put(b"m%02d" % i, MD(**md_fields))
+
+
+def test_a_browse_resumes_from_a_saved_cursor(qmgr):
+    with WMQueue(qmgr, "Q") as queue:
+        put_numbered(queue, 10)
+        cursor = BrowseCursor()
+        browsed = []
+        for message in queue.browse_messages(cursor=cursor):
+            browsed.append(message)
+            if len(browsed) == 4:
+                break
+        saved = json.dumps(cursor.to_dict())
+        resumed = BrowseCursor.from_dict(json.loads(saved))
+        assert (resumed.msg_id, resumed.position) == (cursor.msg_id, 4)
+        browsed.extend(queue.browse_messages(cursor=resumed))
+        assert browsed == [b"m%02d" % i for i in range(10)]
+        assert resumed.position == 10
+        assert queue.depth() == 10
+
+
+def test_a_browse_resumes_after_the_message_of_the_cursor_was_removed(qmgr):
+    with WMQueue(qmgr, "Q") as queue:
+        put_numbered(queue, 3)
+        time.sleep(0.02)  # the put time has a resolution of 1/100 second
+        queue.put(b"later")
+        cursor = BrowseCursor()
+        assert next(queue.browse_messages(cursor=cursor)) == b"m00"
+        assert [queue.get() for _ in range(3)] == [b"m00", b"m01", b"m02"]
+        assert list(queue.browse_messages(cursor=cursor)) == [b"later"]
+        assert cursor.position == 2
+
+
+def test_a_browse_of_a_group_or_a_selection(qmgr):
+    with WMQueue(qmgr, "Q") as queue:
+        queue.put(b"a", MD(GroupId=b"G1", Priority=1))
+        queue.put(b"b", MD(GroupId=b"G2", Priority=7))
+        queue.put(b"c", MD(GroupId=b"G1", Priority=8))
+        assert list(queue.browse_messages(group_id=b"G1")) == [b"a", b"c"]
+        assert list(queue.browse_messages(selector="Root.MQMD.Priority > 5")) == [b"b", b"c"]
+        with pytest.raises(MQMIError) as raised:
+            list(queue.browse_messages(selector="Region = 'EU'"))  # the fake messages have no properties
+        assert raised.value.reason == MQRC_SELECTION_NOT_AVAILABLE
+
+
+@pytest.mark.parametrize("partitions", [
+    [b"G0", b"G1", b"G2"],
+    ["Root.MQMD.Priority < 3", "Root.MQMD.Priority >= 3 AND Root.MQMD.Priority < 6", "Root.MQMD.Priority >= 6"],
+])
+def test_parallel_browser_yields_every_message_once(connect, qmgr, partitions):
+    with WMQueue(qmgr, "Q") as queue:
+        for i in range(60):
+            queue.put(b"m%02d" % i, MD(GroupId=b"G%d" % (i % 3), Priority=i % 10))
+    with ParallelBrowser(connect, "Q", partitions, prefetch=7) as browser:
+        bodies = [message.body for message in browser]
+    assert sorted(bodies) == [b"m%02d" % i for i in range(60)]
+    assert browser.browsed == 60 and not browser.errors
+    progress = browser.progress()
+    assert progress["depth"] == 60 and progress["percent"] == 100.0
+    assert all(partition["done"] for partition in progress["partitions"])
+
+
+def test_parallel_browser_resumes_from_its_saved_cursors(connect, qmgr):
+    partitions = [b"G0", b"G1"]
+    with WMQueue(qmgr, "Q") as queue:
+        for i in range(40):
+            queue.put(b"m%02d" % i, MD(GroupId=b"G%d" % (i % 2)))
+    with ParallelBrowser(connect, "Q", partitions, prefetch=4) as browser:
+        first = []
+        for message in browser:
+            first.append(message.body)
+            if len(first) == 15:
+                break
+        saved = json.loads(json.dumps(browser.saved_cursors()))
+    with ParallelBrowser(connect, "Q", partitions, cursors=saved) as browser:
+        rest = [message.body for message in browser]
+    assert sorted(first + rest) == [b"m%02d" % i for i in range(40)]
+    assert browser.progress()["percent"] == 100.0
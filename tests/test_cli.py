@@ -0,0 +1,109 @@
+import io
+import os
+import subprocess
+import sys
+import pytest
+from pymqiwm import WMQueue, cli
+from pymqiwm.fake_backend import FakeQueueManager
+from pymqiwm.mqi import MD
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def run(backend):
+    """ Runs the command line on the fake backend, returns its exit code """
+    def run(*argv):
+        return cli.main(["--qmgr", "QM", "--conn-info", "host1(1414)"] + list(argv), backend=backend)
+    return run
+
+
+@pytest.fixture
+def stdin(monkeypatch):
+    def stdin(data):
+        monkeypatch.setattr(sys, "stdin", io.TextIOWrapper(io.BytesIO(data)))
+    return stdin
+
+
+@pytest.fixture
+def passwords(monkeypatch):
+    """ The passwords the connections were made with """
+    passwords = []
+    connect_with_options = FakeQueueManager.connect_with_options
+
+    def spy(self, name, *args, **kwargs):
+        passwords.append(kwargs.get("password"))
+        return connect_with_options(self, name, *args, **kwargs)
+
+    monkeypatch.setattr(FakeQueueManager, "connect_with_options", spy)
+    return passwords
+
+
+def test_depth_browse_and_put(run, qmgr, capsys):
+    with WMQueue(qmgr, "Q") as queue:
+        queue.put(b"first", MD(MsgId=b"ID"))
+    assert run("put", "Q", "second", "third") == 0
+    assert run("depth", "Q") == 0
+    assert run("browse", "Q", "--limit", "2") == 0
+    assert run("browse", "Q", "--limit", "1", "--descriptor") == 0
+    out, err = capsys.readouterr()
+    lines = out.splitlines()
+    assert lines[:3] == ["Q 3", "first", "second"]
+    assert lines[3].startswith(b"ID".hex() + " ") and lines[3].endswith(" 5 first")
+    assert "Put 2 messages on Q" in err
+
+
+def test_put_reads_the_lines_of_stdin(run, qmgr, stdin):
+    stdin(b"a\nb\r\nc\n")
+    assert run("put", "Q") == 0
+    with WMQueue(qmgr, "Q") as queue:
+        assert list(queue.browse_messages()) == [b"a", b"b", b"c"]
+
+
+def test_create_and_delete(run, backend, qmgr, capsys):
+    assert run("create", "NEW1", "NEW2", "--max-depth", "10") == 0
+    assert {"NEW1", "NEW2"} <= set(backend.broker("QM").queues)
+    assert run("create", "NEW1") == 1
+    with WMQueue(qmgr, "NEW1") as queue:
+        queue.put(b"m")
+    assert run("delete", "NEW1", "NEW2") == 1  # NEW1 is not empty
+    assert "Failed to delete NEW1" in capsys.readouterr().err
+    assert set(backend.broker("QM").queues) & {"NEW1", "NEW2"} == {"NEW1"}
+    assert run("delete", "NEW1", "--purge") == 0
+    assert "NEW1" not in backend.broker("QM").queues
+
+
+def test_the_password_comes_from_stdin_before_the_messages(run, qmgr, stdin, passwords):
+    stdin(b"secret\nmessage\n")
+    assert run("--user", "app", "--password-stdin", "put", "Q") == 0
+    assert passwords == ["secret"]
+    with WMQueue(qmgr, "Q") as queue:
+        assert queue.get() == b"message"
+
+
+def test_the_password_comes_from_the_environment(run, monkeypatch, passwords):
+    monkeypatch.setenv(cli.PASSWORD_ENV, "from env")
+    assert run("--user", "app", "depth", "Q") == 0
+    monkeypatch.delenv(cli.PASSWORD_ENV)
+    assert run("depth", "Q") == 0
+    assert passwords == ["from env", None]
+
+
+@pytest.mark.parametrize("argv, error", [
+    (["--qmgr", "QM", "--conn-info", "", "depth", "Q"], "conn_info has to name at least one host"),
+    (["--qmgr", "QM", "--conn-info", "host1(1414)", "depth", "MISSING"], "2085"),
+    (["--qmgr", "QM", "--conn-info", "host1(1414)", "restore", "missing.dump", "Q"], "No such file"),
+])
+def test_a_failed_command_prints_its_error(backend, capsys, argv, error):
+    assert cli.main(argv, backend=backend) == 1
+    assert error in capsys.readouterr().err
+
+
+@pytest.mark.parametrize("code", [
+    "import pymqiwm",
+    "from pymqiwm import cli\ntry:\n    cli.main(['--help'])\nexcept SystemExit:\n    pass",
+])
+def test_import_and_help_do_not_load_pymqi(code):
+    check = "\nimport sys\nassert not [name for name in sys.modules if name.startswith(('pymqi.', 'pymqiwm.mqi'))" \
+            " or name == 'pymqi'], sorted(sys.modules)"
+    subprocess.run([sys.executable, "-c", code + check], cwd=ROOT, check=True, stdout=subprocess.DEVNULL)
@@ -0,0 +1,67 @@
+import pytest
+from pymqiwm import Codec, JsonCodec, WMQueue
+from pymqiwm.codec import get_codec
+
+
+def test_codec_is_abstract():
+    with pytest.raises(TypeError):
+        Codec()
+
+
+def test_json_decode_many_decodes_every_body():
+    assert JsonCodec().decode_many([b"1", b'{"a":[2]}', b'"x"']) == [1, {"a": [2]}, "x"]
+
+
+def test_json_decode_many_does_not_join_bodies():
+    # joined into one array they would read as ['],[', 1, 2]
+    with pytest.raises(ValueError):
+        JsonCodec().decode_many([b'"', b'"', b"1],[2"])
+
+
+def test_msgpack_decode_many_checks_every_body_is_one_object():
+    pytest.importorskip("msgpack")
+    codec = get_codec("msgpack")
+    bodies = [codec.encode(obj) for obj in (1, {"a": [1, 2]}, "x", None)]
+    assert codec.decode_many(bodies) == [1, {"a": [1, 2]}, "x", None]
+    two = codec.encode(1) + codec.encode(2)
+    with pytest.raises(ValueError):
+        codec.decode_many([two, b"", codec.encode(3)])  # as many objects as bodies, in the wrong bodies
+    with pytest.raises(ValueError):
+        codec.decode_many([b"", two])
+
+
+def test_get_many_decodes_with_the_codec_of_the_queue(qmgr):
+    with WMQueue(qmgr, "Q", codec="json+zlib") as queue:
+        queue.put_many([{"i": i} for i in range(12)])
+        assert queue.get_many(100, batch_size=5) == [{"i": i} for i in range(12)]
+
+
+class _CountingCodec(JsonCodec):
+    def __init__(self):
+        super().__init__()
+        self.batches = []
+
+    def decode_many(self, bodies) -> list:
+        self.batches.append(len(bodies))
+        return super().decode_many(bodies)
+
+
+def test_read_messages_in_batches_decodes_a_batch_at_a_time(qmgr):
+    codec = _CountingCodec()
+    with WMQueue(qmgr, "Q", codec=codec) as queue:
+        queue.put_many([{"i": i} for i in range(12)])
+        with queue.read_messages_in_batches(batch_size=5, with_descriptor=True) as messages:
+            assert [message.body for message in messages] == [{"i": i} for i in range(12)]
+        assert codec.batches == [5, 5, 2]
+
+
+def test_a_batch_with_a_message_that_cant_be_decoded_is_backed_out(qmgr):
+    with WMQueue(qmgr, "Q", codec="json") as queue, WMQueue(qmgr, "Q") as raw:
+        queue.put_many([{"i": i} for i in range(6)])
+        raw.put(b"not json")
+        read = []
+        with pytest.raises(ValueError):
+            with queue.read_messages_in_batches(batch_size=4) as messages:
+                read.extend(messages)
+        assert read == [{"i": i} for i in range(4)]  # the first batch was committed
+        assert queue.depth() == 3
@@ -0,0 +1,31 @@
+import pytest
+from pymqiwm.mqi import MQMIError
+from pymqiwm.mqi.CMQC import MQRC_UNKNOWN_OBJECT_NAME
+from pymqiwm import QueueConsumer, WMQueue
+
+
+def test_a_float_wait_interval_is_sent_in_whole_milliseconds(qmgr):
+    with WMQueue(qmgr, "Q") as queue:
+        assert queue._get_and_wait_gmo(wait_interval=0.5 * 1000).WaitInterval == 500
+        queue.put(b"m")
+        assert list(queue.read_messages_while_waiting(0.05)) == [b"m"]
+
+
+def test_consumer_drains_the_queue(connect, qmgr):
+    with WMQueue(qmgr, "Q") as queue:
+        queue.put_many([b"m%d" % i for i in range(20)])
+    handled = []
+    consumer = QueueConsumer(connect, "Q", handled.append, getters=2, seconds_wait_interval=0.05)
+    consumer.start()
+    consumer.drain()
+    assert sorted(handled) == sorted(b"m%d" % i for i in range(20))
+
+
+def test_a_failed_getter_stops_the_consumer_and_is_raised(connect):
+    consumer = QueueConsumer(connect, "MISSING", print, getters=2, seconds_wait_interval=0.05)
+    with pytest.raises(MQMIError) as raised:
+        with consumer:
+            for thread in consumer._threads:
+                thread.join(5)
+            assert not consumer.is_running
+    assert raised.value.reason == MQRC_UNKNOWN_OBJECT_NAME
@@ -0,0 +1,52 @@
+import pytest
+from pymqiwm import FakeBackend, WMQueue, WMQueueManager
+from pymqiwm.mqi import HAS_PYMQI, MD, MQMIError
+from pymqiwm.mqi._structs import MD as PureMD, QueueManager as PureQueueManager
+from pymqiwm.mqi.CMQC import MQCC_FAILED, MQRC_UNKNOWN_OBJECT_NAME, MQRC_Q_FULL
+
+
+def test_the_pure_python_md_packs_like_the_pymqi_one():
+    md = PureMD(MsgId=b"id", Priority=4)
+    copy = PureMD()
+    copy.unpack(md.pack())
+    assert copy.pack() == md.pack()
+    assert (copy.MsgId, copy.Priority) == (b"id".ljust(24, b"\0"), 4)
+    if HAS_PYMQI:
+        assert md.pack() == MD(MsgId=b"id", Priority=4).pack()
+
+
+def test_the_pure_python_objects_that_need_a_queue_manager_raise_import_error():
+    with pytest.raises(ImportError):
+        PureQueueManager(None)
+
+
+def test_put_get_round_trip_keeps_the_md(qmgr):
+    with WMQueue(qmgr, "Q") as queue:
+        queue.put(b"m", MD(Priority=7, CorrelId=b"c"))
+        md = MD()
+        assert queue.get(None, md) == b"m"
+    assert md.Priority == 7
+    assert md.CorrelId == b"c".ljust(24, b"\0")
+    assert len(md.MsgId) == 24 and md.PutDate
+
+
+def test_an_unknown_queue_fails_with_its_reason_code(qmgr):
+    with WMQueue(qmgr, "MISSING") as queue:
+        with pytest.raises(MQMIError) as raised:
+            queue.put(b"m")
+    assert (raised.value.comp, raised.value.reason) == (MQCC_FAILED, MQRC_UNKNOWN_OBJECT_NAME)
+    assert "MQRC_UNKNOWN_OBJECT_NAME" in str(raised.value)
+
+
+def test_max_depth_and_call_counts():
+    backend = FakeBackend()
+    backend.define_queue("QM", "SMALL", max_depth=2)
+    with WMQueueManager("QM", "host1(1414)", backend=backend) as qmgr, WMQueue(qmgr, "SMALL") as queue:
+        backend.reset_calls()
+        queue.put(b"1")
+        queue.put(b"2")
+        with pytest.raises(MQMIError) as raised:
+            queue.put(b"3")
+        assert raised.value.reason == MQRC_Q_FULL
+        assert backend.calls["MQPUT"] == 3
+        assert len(backend.broker("QM").queues["SMALL"].messages) == 2
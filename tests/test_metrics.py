@@ -0,0 +1,89 @@
+import pytest
+from pymqiwm import FakeBackend, InstrumentedBackend, Metrics, WMQueue, WMQueueManager, WMSubscription, WMTopic
+from pymqiwm.mqi import MQMIError
+
+
+@pytest.fixture
+def metrics():
+    return Metrics(buckets=(0.001, 1.0))
+
+
+@pytest.fixture
+def instrumented(backend, metrics):
+    with WMQueueManager("QM", "host1(1414)", backend=InstrumentedBackend(backend, metrics)) as qmgr:
+        yield qmgr
+
+
+def test_render_in_the_prometheus_text_format(metrics):
+    metrics.inc("pymqiwm_bytes_total", (("direction", "put"),), 10)
+    metrics.inc("pymqiwm_bytes_total", (("direction", "put"),), 5)
+    metrics.inc("pymqiwm_reopens_total", (("queue", 'A "quoted" \\ name'),))
+    metrics.observe("pymqiwm_mqi_call_seconds", (("verb", "MQGET"),), 0.0009765625)
+    metrics.observe("pymqiwm_mqi_call_seconds", (("verb", "MQGET"),), 0.5)
+    metrics.observe("pymqiwm_mqi_call_seconds", (("verb", "MQGET"),), 2.0)
+    assert metrics.render().splitlines() == [
+        "# HELP pymqiwm_bytes_total Bytes of the message bodies put and got.",
+        "# TYPE pymqiwm_bytes_total counter",
+        'pymqiwm_bytes_total{direction="put"} 15',
+        "# HELP pymqiwm_reopens_total Queues opened again because their connection was made again.",
+        "# TYPE pymqiwm_reopens_total counter",
+        'pymqiwm_reopens_total{queue="A \\"quoted\\" \\\\ name"} 1',
+        "# HELP pymqiwm_mqi_call_seconds Latency of the MQI calls and PCF commands by verb.",
+        "# TYPE pymqiwm_mqi_call_seconds histogram",
+        'pymqiwm_mqi_call_seconds_bucket{verb="MQGET",le="0.001"} 1',
+        'pymqiwm_mqi_call_seconds_bucket{verb="MQGET",le="1.0"} 2',
+        'pymqiwm_mqi_call_seconds_bucket{verb="MQGET",le="+Inf"} 3',
+        'pymqiwm_mqi_call_seconds_sum{verb="MQGET"} 2.5009765625',
+        'pymqiwm_mqi_call_seconds_count{verb="MQGET"} 3',
+    ]
+
+
+def test_render_of_no_metrics(metrics):
+    assert metrics.render() == "\n"
+
+
+def test_the_calls_are_counted_by_verb_and_reason(instrumented, metrics):
+    with WMQueue(instrumented, "Q") as queue:
+        queue.put(b"m")
+        assert queue.get() == b"m"
+        with pytest.raises(MQMIError):
+            queue.get()
+    values = metrics.snapshot()
+    assert values[("pymqiwm_mqi_calls_total", (("verb", "MQPUT"), ("reason", "0")))] == 1
+    assert values[("pymqiwm_mqi_calls_total", (("verb", "MQGET"), ("reason", "0")))] == 1
+    assert values[("pymqiwm_mqi_calls_total", (("verb", "MQGET"), ("reason", "2033")))] == 1
+    assert values[("pymqiwm_mqi_calls_total", (("verb", "MQCONNX"), ("reason", "0")))] == 1
+    assert values[("pymqiwm_mqi_call_seconds", (("verb", "MQGET"),))]["count"] == 2
+
+
+def test_the_bytes_are_counted_encoded(instrumented, metrics):
+    with WMQueue(instrumented, "Q") as queue:
+        queue.put("é€")  # 2 characters, 5 bytes in utf-8
+        queue.put(b"abc")
+        assert queue.get() == "é€".encode()
+    values = metrics.snapshot()
+    assert values[("pymqiwm_bytes_total", (("direction", "put"),))] == 8
+    assert values[("pymqiwm_bytes_total", (("direction", "get"),))] == 5
+
+
+def test_published_bytes_and_subscription_gets_are_counted(instrumented, metrics):
+    with WMSubscription(instrumented, "prices/#") as subscription:
+        with WMTopic(instrumented, "prices/eur") as topic:
+            topic.publish("€")
+        assert list(subscription.read_messages_while_waiting()) == ["€".encode()]
+    values = metrics.snapshot()
+    assert values[("pymqiwm_bytes_total", (("direction", "put"),))] == 3
+    assert values[("pymqiwm_bytes_total", (("direction", "get"),))] == 3
+
+
+def test_pcf_commands_are_counted(instrumented, metrics):
+    instrumented.create_local_queue("NEW")
+    assert metrics.snapshot()[("pymqiwm_mqi_calls_total", (("verb", "MQCMD_CREATE_Q"), ("reason", "0")))] == 1
+
+
+def test_the_wrapped_backend_is_still_reachable(metrics):
+    backend = InstrumentedBackend(FakeBackend(), metrics)
+    backend.define_queue("QM", "OTHER")  # forwarded to the fake
+    with WMQueueManager("QM", "host1(1414)", backend=backend) as qmgr, WMQueue(qmgr, "OTHER") as queue:
+        queue.put(b"m")
+        assert queue.depth() == 1
@@ -0,0 +1,129 @@
+import threading
+import time
+import pytest
+from pymqiwm import WMQueue, WMQueueManagerPool
+from pymqiwm.mqi import MD, PMO, MQMIError
+from pymqiwm.mqi.CMQC import MQPMO_SYNCPOINT
+
+
+@pytest.fixture
+def pool(backend):
+    def pool(**options):
+        return WMQueueManagerPool("QM", "host1(1414)", backend=backend, **options)
+    return pool
+
+
+def test_acquire_waits_for_a_release_at_max_size(pool):
+    with pool(size=1) as connections:
+        acquired = threading.Event()
+
+        def acquire():
+            with connections.connection():
+                acquired.set()
+
+        with connections.connection():
+            thread = threading.Thread(target=acquire)
+            thread.start()
+            assert not acquired.wait(0.1)
+            assert connections.stats()["waiting"] == 1
+        assert acquired.wait(5)
+        thread.join(5)
+        stats = connections.stats()
+        assert (stats["connections"], stats["idle"], stats["in use"], stats["acquired"]) == (1, 1, 0, 2)
+        assert stats["max acquire ms"] >= 90
+
+
+def test_acquire_times_out(pool):
+    with pool(size=1, acquire_timeout=0.05) as connections:
+        with connections.connection():
+            with pytest.raises(TimeoutError):
+                with connections.connection():
+                    pass
+            with pytest.raises(TimeoutError):
+                with connections.connection(timeout=0.01):
+                    pass
+        with connections.connection():  # the failed waits did not take the slot
+            pass
+
+
+def test_connections_are_reused(backend, pool):
+    with pool(size=4) as connections:
+        backend.reset_calls()
+        for _ in range(3):
+            with connections.connection() as qmgr:
+                assert qmgr.is_connected
+        assert backend.calls["MQCONNX"] == 1
+        assert connections.stats()["connections"] == 1
+
+
+def test_an_idle_connection_is_checked_with_is_connected(backend, pool):
+    with pool(size=1, health_check_interval=0) as connections:
+        with connections.connection() as qmgr:
+            first = qmgr
+        backend.break_connections("QM")
+        with connections.connection() as qmgr, WMQueue(qmgr, "Q") as queue:
+            assert qmgr is first and qmgr.is_connected
+            queue.put(b"m")
+        assert connections.stats()["reconnects"] == 1
+
+
+def test_a_recently_used_connection_is_not_checked(backend, pool):
+    with pool(size=1, health_check_interval=60) as connections:
+        with connections.connection():
+            pass
+        backend.reset_calls()
+        with connections.connection():
+            pass
+        assert connections.stats()["reconnects"] == 0
+        assert backend.calls["MQCONNX"] == 0
+
+
+def test_a_connection_that_raised_a_broken_reason_is_reconnected(backend, pool):
+    with pool(size=1) as connections:
+        with pytest.raises(MQMIError):
+            with connections.connection() as qmgr, WMQueue(qmgr, "Q") as queue:
+                backend.break_connections("QM")
+                queue.put(b"m")
+        with connections.connection() as qmgr, WMQueue(qmgr, "Q") as queue:
+            queue.put(b"m")
+        assert connections.stats()["reconnects"] == 1
+
+
+def test_the_unit_of_work_is_backed_out_when_the_block_raises(pool):
+    with pool(size=1) as connections:
+        with pytest.raises(ValueError):
+            with connections.connection() as qmgr, WMQueue(qmgr, "Q") as queue:
+                queue.put_many([b"m"] * 3, batch_size=10)  # committed
+                queue.put(b"uncommitted", MD(), PMO(Options=MQPMO_SYNCPOINT))
+                raise ValueError()
+        with connections.connection() as qmgr, WMQueue(qmgr, "Q") as queue:
+            assert queue.depth() == 3
+
+
+def test_close_disconnects_the_idle_connections_and_refuses_new_ones(pool):
+    connections = pool(size=2)
+    with connections.connection():
+        pass
+    connections.close()
+    assert connections.stats()["connections"] == 0
+    with pytest.raises(AssertionError):
+        with connections.connection():
+            pass
+
+
+def test_threads_share_the_pool(pool):
+    with pool(size=2) as connections:
+        def put(i):
+            with connections.connection() as qmgr, WMQueue(qmgr, "Q") as queue:
+                queue.put(b"%d" % i)
+                time.sleep(0.01)
+
+        threads = [threading.Thread(target=put, args=(i,)) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(5)
+        stats = connections.stats()
+        assert stats["connections"] <= 2 and stats["acquired"] == 8
+        with connections.connection() as qmgr, WMQueue(qmgr, "Q") as queue:
+            assert queue.depth() == 8
@@ -0,0 +1,101 @@
+import time
+import pytest
+from pymqiwm import MultiQueueReader, WMQueue
+from pymqiwm.mqi import MQMIError
+from pymqiwm.mqi.CMQC import MQRC_CONNECTION_BROKEN
+
+
+@pytest.fixture
+def queues(backend, qmgr):
+    """ Puts 6 messages on A and B, C stays empty """
+    for name in ("A", "B", "C"):
+        backend.define_queue("QM", name)
+    for name in ("A", "B"):
+        with WMQueue(qmgr, name) as queue:
+            queue.put_many([name.encode() + b"%d" % i for i in range(6)])
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "Timed out"
+        time.sleep(0.01)
+
+
+def buffered(reader, count, *names):
+    """ Waits until the connection got `count` messages of every queue of `names` ahead of the loop """
+    wait_for(lambda: all(reader.stats()["queues"][name]["buffered"] == count for name in names))
+
+
+def take(reader, count) -> list:
+    taken = []
+    for name, message in reader:
+        taken.append(message)
+        if len(taken) == count:
+            break
+    return taken
+
+
+def remaining(qmgr, name) -> list:
+    with WMQueue(qmgr, name) as queue:
+        return list(queue.browse_messages())
+
+
+@pytest.mark.parametrize("scheduling, weights, order", [
+    ("weighted", {"A": 2, "B": 1}, [b"A0", b"B0", b"A1", b"A2", b"B1", b"B2"]),
+    ("priority", {"A": 1, "B": 5}, [b"B0", b"B1", b"B2", b"A0", b"A1", b"A2"]),
+])
+def test_the_messages_are_yielded_in_the_order_of_the_scheduling(connect, queues, scheduling, weights, order):
+    with MultiQueueReader(connect, weights, scheduling=scheduling, prefetch=3) as reader:
+        buffered(reader, 3, "A", "B")
+        assert take(reader, 6) == order  # then the connection commits and gets the next 3 of every queue
+        assert sorted(take(reader, 6)) == [b"A3", b"A4", b"A5", b"B3", b"B4", b"B5"]
+        stats = reader.stats()
+        assert stats["yielded"] == 12 and stats["queues"]["A"]["weight"] == weights["A"]
+
+
+def test_an_empty_queue_is_polled_every_poll_interval(connect, queues, qmgr):
+    with MultiQueueReader(connect, ["C"], poll_interval=0.05, seconds_wait_interval=-1) as reader:
+        wait_for(lambda: reader.stats()["queues"]["C"]["empty polls"] >= 3)
+        assert reader.stats()["queues"]["C"]["idle"]
+        with WMQueue(qmgr, "C") as queue:
+            queue.put(b"late")
+        assert take(reader, 1) == [b"late"]
+    with MultiQueueReader(connect, ["C"], poll_interval=10) as reader:
+        time.sleep(0.2)
+        assert reader.stats()["queues"]["C"]["empty polls"] == 1
+
+
+def test_the_unit_of_work_is_committed_once_its_messages_were_yielded(backend, connect, queues, qmgr):
+    backend.reset_calls()
+    with MultiQueueReader(connect, ["A"], prefetch=4) as reader:
+        messages = iter(reader)
+        assert [next(messages) for _ in range(4)] == [("A", b"A%d" % i) for i in range(4)]
+        time.sleep(0.05)
+        assert backend.calls["MQCMIT"] == 0  # A3 is still being handled
+        assert next(messages) == ("A", b"A4")  # A0 to A3 are committed before A4 is got
+        assert backend.calls["MQCMIT"] == 1
+        messages.close()
+    # the unit of work of A4 and A5 was backed out, their messages are back in their place
+    assert remaining(qmgr, "A") == [b"A4", b"A5"]
+
+
+def test_the_messages_not_yielded_are_backed_out_on_stop(connect, queues, qmgr):
+    with MultiQueueReader(connect, ["A", "B"], prefetch=3) as reader:
+        buffered(reader, 3, "A", "B")
+        take(reader, 2)
+    # the yielded messages are backed out with the others of their unit of work, and yielded again
+    assert remaining(qmgr, "A") == [b"A%d" % i for i in range(6)]
+    assert remaining(qmgr, "B") == [b"B%d" % i for i in range(6)]
+
+
+def test_no_message_is_lost_when_the_connection_breaks(backend, connect, queues):
+    with pytest.raises(MQMIError) as raised:
+        with MultiQueueReader(connect, ["A"], prefetch=6) as reader:
+            buffered(reader, 6, "A")
+            backend.break_connections("QM")
+            assert take(reader, 6) == [b"A%d" % i for i in range(6)]
+            list(reader)  # the commit fails
+    assert raised.value.reason == MQRC_CONNECTION_BROKEN
+    with connect() as other:  # the connection of `qmgr` is broken too
+        assert remaining(other, "A") == [b"A%d" % i for i in range(6)]
@@ -0,0 +1,41 @@
+import pytest
+from pymqiwm.mqi import MQMIError
+from pymqiwm.mqi.CMQC import MQRC_CONNECTION_BROKEN, MQRC_Q_MGR_QUIESCING
+from pymqiwm import WMQueue, WMQueueManager
+
+
+def test_a_read_survives_a_broken_connection(backend, connect):
+    with connect(reconnect=True, min_backoff=0.01) as qmgr, WMQueue(qmgr, "Q") as queue:
+        queue.put_many([b"m%d" % i for i in range(10)])
+        got = []
+        for message in queue.read_messages_while_waiting():
+            got.append(message)
+            if len(got) == 3:
+                backend.break_connections("QM")
+        assert got == [b"m%d" % i for i in range(10)]
+        assert qmgr.reconnect_stats()["reconnects"] == 1
+        assert qmgr.generation == 1
+
+
+def test_a_broken_connection_is_raised_without_reconnect(backend, qmgr):
+    with WMQueue(qmgr, "Q") as queue:
+        queue.put(b"m")
+        backend.break_connections("QM")
+        with pytest.raises(MQMIError) as raised:
+            queue.get()
+        assert raised.value.reason == MQRC_CONNECTION_BROKEN
+
+
+def test_a_quiescing_queue_manager_is_raised_instead_of_reconnecting(backend, connect):
+    with connect(reconnect=True, reconnect_timeout=None) as qmgr, WMQueue(qmgr, "Q") as queue:
+        queue.put(b"m")
+        backend.quiesce("QM")
+        with pytest.raises(MQMIError) as raised:
+            list(queue.read_messages_while_waiting())  # gets with MQGMO_FAIL_IF_QUIESCING
+        assert raised.value.reason == MQRC_Q_MGR_QUIESCING
+        assert qmgr.reconnect_stats()["reconnects"] == 0
+
+
+def test_conn_info_needs_a_host(backend):
+    with pytest.raises(AssertionError):
+        WMQueueManager("QM", " , ", backend=backend)
@@ -0,0 +1,120 @@
+import threading
+import time
+import pytest
+from pymqiwm import WMQueue, WMRequester
+from pymqiwm.mqi import MD, MQMIError
+from pymqiwm.mqi.CMQC import MQRC_NO_MSG_AVAILABLE
+
+
+@pytest.fixture
+def queues(backend):
+    backend.define_queue("QM", "REQUESTS")
+    backend.define_queue("QM", "REPLIES")
+
+
+def reply_to(queue, requests, transform=bytes.upper):
+    """ Answers the requests in the order given, copying their CorrelId to the replies """
+    for request in requests:
+        with WMQueue(queue.qmgr, request.reply_to_q.strip().decode()) as replies:
+            replies.put(transform(request.body), MD(CorrelId=request.correl_id))
+
+
+def server(connect, count, reverse=False):
+    """ Gets `count` requests on its own connection and replies to them, in reverse order if asked """
+    def serve():
+        with connect() as qmgr, WMQueue(qmgr, "REQUESTS") as queue:
+            requests = []
+            for request in queue.read_messages_while_waiting(5, with_descriptor=True):
+                requests.append(request)
+                if len(requests) == count:
+                    break
+            reply_to(queue, reversed(requests) if reverse else requests)
+    return serve
+
+
+def test_get_by_msg_id_gets_only_that_message(qmgr):
+    with WMQueue(qmgr, "Q") as queue:
+        md = MD()
+        queue.put_many([b"a", b"b"])
+        queue.put(b"c", md)
+        queue.put(b"d")
+        assert queue.get_by_msg_id(md.MsgId) == b"c"
+        assert list(queue.read_messages_while_waiting()) == [b"a", b"b", b"d"]
+
+
+def test_get_by_correl_id_gets_the_first_match_and_times_out(qmgr):
+    with WMQueue(qmgr, "Q") as queue:
+        queue.put(b"other", MD(CorrelId=b"x"))
+        queue.put(b"first", MD(CorrelId=b"c"))
+        queue.put(b"second", MD(CorrelId=b"c"))
+        message = queue.get_by_correl_id(b"c", with_descriptor=True)
+        assert message.body == b"first" and message.correl_id == b"c".ljust(24, b"\0")
+        assert queue.get_by_correl_id(b"c") == b"second"
+        started = time.monotonic()
+        with pytest.raises(MQMIError) as raised:
+            queue.get_by_correl_id(b"c", seconds_wait_interval=0.1)
+        assert raised.value.reason == MQRC_NO_MSG_AVAILABLE
+        assert time.monotonic() - started >= 0.09
+        assert queue.depth() == 1
+
+
+def test_queue_request_waits_for_the_reply_with_its_correl_id(connect, queues, qmgr):
+    with WMQueue(qmgr, "REQUESTS") as requests, WMQueue(qmgr, "REPLIES") as replies:
+        replies.put(b"not mine", MD(CorrelId=b"someone else"))
+        thread = threading.Thread(target=server(connect, 1))
+        thread.start()
+        assert requests.request(b"ping", replies, timeout=5) == b"PING"
+        thread.join(5)
+        assert replies.depth() == 1
+
+
+def test_queue_request_times_out(queues, qmgr):
+    with WMQueue(qmgr, "REQUESTS") as requests, WMQueue(qmgr, "REPLIES") as replies:
+        with pytest.raises(MQMIError) as raised:
+            requests.request(b"ping", replies, timeout=0.1)
+        assert raised.value.reason == MQRC_NO_MSG_AVAILABLE
+        request = requests.get_message()
+        assert request.reply_to_q.strip() == b"REPLIES"
+
+
+def test_requester_dispatches_the_replies_of_concurrent_requests(connect, queues):
+    count = 10
+    thread = threading.Thread(target=server(connect, count, reverse=True))
+    thread.start()
+    with WMRequester(connect, "REQUESTS", "REPLIES", seconds_wait_interval=0.05) as requester:
+        results = [None] * count
+
+        def request(i):
+            results[i] = requester.request(b"m%d" % i, timeout=5)
+
+        threads = [threading.Thread(target=request, args=(i,)) for i in range(count)]
+        for request_thread in threads:
+            request_thread.start()
+        for request_thread in threads:
+            request_thread.join(10)
+        thread.join(5)
+        assert results == [b"M%d" % i for i in range(count)]
+        assert requester.in_flight == 0 and requester.late_replies == 0
+
+
+def test_requester_submit_returns_futures_answered_out_of_order(connect, queues):
+    thread = threading.Thread(target=server(connect, 3, reverse=True))
+    thread.start()
+    with WMRequester(connect, "REQUESTS", "REPLIES", seconds_wait_interval=0.05, with_descriptor=True) as requester:
+        futures = [requester.submit(body) for body in (b"a", b"b", b"c")]
+        replies = [future.result(5) for future in futures]
+    thread.join(5)
+    assert [reply.body for reply in replies] == [b"A", b"B", b"C"]
+
+
+def test_requester_timeout_and_late_reply(connect, queues):
+    with WMRequester(connect, "REQUESTS", "REPLIES", seconds_wait_interval=0.05) as requester:
+        with pytest.raises(TimeoutError):
+            requester.request(b"slow", timeout=0.1)
+        assert requester.in_flight == 0
+        with connect() as qmgr, WMQueue(qmgr, "REQUESTS") as queue:
+            reply_to(queue, [queue.get_message()])
+        deadline = time.monotonic() + 5
+        while requester.late_replies == 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert requester.late_replies == 1
@@ -0,0 +1,125 @@
+import time
+import pytest
+from pymqiwm import WMQueue, DumpReader, DumpWriter, dump, restore
+from pymqiwm.mqi import MD
+from pymqiwm.mqi.CMQC import MQPER_PERSISTENT
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "q.dump")
+
+
+@pytest.fixture
+def replay(backend):
+    backend.define_queue("QM", "REPLAY")
+
+
+def put_numbered(queue, count):
+    for i in range(count):
+        queue.put(b"m%02d" % i, MD(CorrelId=b"c%02d" % i, Persistence=MQPER_PERSISTENT))
+
+
+def replayed(qmgr) -> list:
+    with WMQueue(qmgr, "REPLAY") as queue:
+        return list(queue.browse_messages(with_descriptor=True))
+
+
+def test_a_dump_is_restored_with_the_descriptors(qmgr, replay, path):
+    with WMQueue(qmgr, "Q") as queue:
+        put_numbered(queue, 7)
+        originals = list(queue.browse_messages(with_descriptor=True))
+        assert dump(queue, path) == 7
+        assert queue.depth() == 7  # browsed
+
+    with DumpReader(path) as reader:
+        assert len(reader) == 7
+        assert reader[-1].body == b"m06" and reader[-1].msg_id == originals[-1].msg_id
+
+    with WMQueue(qmgr, "REPLAY") as queue:
+        assert restore(path, queue, batch_size=3) == 7
+    messages = replayed(qmgr)
+    assert [message.body for message in messages] == [b"m%02d" % i for i in range(7)]
+    for original, message in zip(originals, messages):
+        assert (message.msg_id, message.correl_id, message.persistence) == \
+            (original.msg_id, original.correl_id, MQPER_PERSISTENT)
+
+
+def test_a_dump_without_its_footer_is_read_by_a_scan(qmgr, path):
+    with WMQueue(qmgr, "Q") as queue:
+        put_numbered(queue, 5)
+        dump(queue, path)
+    with DumpReader(path) as reader:
+        cut = reader.offsets[-1] + 10  # the writer died while writing the last record
+    with open(path, "r+b") as file:
+        file.truncate(cut)
+
+    with DumpReader(path) as reader:
+        assert [message.body for message in reader] == [b"m%02d" % i for i in range(4)]
+    with DumpWriter(path, append=True) as writer:  # writes over the broken record
+        writer.write(b"new", MD())
+    with DumpReader(path) as reader:
+        assert [message.body for message in reader] == [b"m00", b"m01", b"m02", b"m03", b"new"]
+
+
+def test_dump_appends_to_an_existing_file(qmgr, path):
+    with WMQueue(qmgr, "Q") as queue:
+        put_numbered(queue, 3)
+        assert dump(queue, path, limit=2) == 2
+        assert dump(queue, path, append=True, destructive=True) == 3
+        assert queue.depth() == 0
+    with DumpReader(path) as reader:
+        assert [message.body for message in reader] == [b"m00", b"m01", b"m00", b"m01", b"m02"]
+
+
+def test_restore_a_range_with_new_msg_ids(qmgr, replay, path):
+    with WMQueue(qmgr, "Q") as queue:
+        put_numbered(queue, 6)
+        dump(queue, path)
+    with DumpReader(path) as reader:
+        msg_ids = [message.msg_id for message in reader]
+    with WMQueue(qmgr, "REPLAY") as queue:
+        assert restore(path, queue, start=1, stop=4) == 3
+        assert restore(path, queue, start=1, stop=4, new_msg_ids=True) == 3
+    messages = replayed(qmgr)
+    assert [message.body for message in messages] == [b"m01", b"m02", b"m03"] * 2
+    assert [message.msg_id for message in messages[:3]] == msg_ids[1:4]
+    assert not set(message.msg_id for message in messages[3:]) & set(msg_ids)
+
+
+def test_restore_at_a_rate_or_at_the_speed_of_the_put_times(qmgr, replay, path):
+    with DumpWriter(path) as writer:
+        for number, put_time in enumerate((b"12000000", b"12000010", b"12000020")):  # 1/10 second apart
+            writer.write(b"m%d" % number, MD(PutDate=b"20260101", PutTime=put_time))
+    with WMQueue(qmgr, "REPLAY") as queue:
+        started = time.monotonic()
+        restore(path, queue, rate=20)  # one message every 0.05 second
+        assert 0.1 <= time.monotonic() - started < 1
+        started = time.monotonic()
+        restore(path, queue, speed=2)
+        assert 0.1 <= time.monotonic() - started < 1
+        started = time.monotonic()
+        restore(path, queue)
+        assert time.monotonic() - started < 0.1
+        assert queue.depth() == 9
+
+
+def test_destructive_dump_drops_the_records_of_a_lost_unit_of_work(backend, connect, path):
+    with connect(reconnect=True, min_backoff=0.01) as qmgr, WMQueue(qmgr, "Q") as queue:
+        queue.put_many([b"m%02d" % i for i in range(25)])
+        get, gets = queue._get, []
+
+        def get_then_break(*args):
+            gets.append(None)
+            if len(gets) == 14:  # in the second unit of work
+                backend.break_connections("QM")
+            return get(*args)
+
+        queue._get = get_then_break
+        written = dump(queue, path, destructive=True, batch_size=10)
+        assert written + queue.depth() == 25
+
+    with DumpReader(path) as reader:
+        bodies = [message.body for message in reader]
+    assert len(bodies) == written
+    assert bodies == [b"m%02d" % i for i in range(written)]  # no record twice
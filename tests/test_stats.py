@@ -0,0 +1,86 @@
+import pytest
+from pymqiwm import QueueStatsPoller, WMQueue, WMQueueManager
+
+
+@pytest.fixture
+def calls(backend, monkeypatch):
+    """ The PCF calls of the pollers, as (call, generic name) """
+    for name in ("ORDERS", "PAYMENTS", "OTHER", "APP1.IN", "APP1.OUT", "APP2.OUT"):
+        backend.define_queue("QM", name)
+    calls = []
+    inquire, reset = WMQueueManager.inquire_queues_status, WMQueueManager.reset_queue_stats
+
+    def inquire_queues_status(qmgr, name):
+        calls.append(("inquire", name))
+        return inquire(qmgr, name)
+
+    def reset_queue_stats(qmgr, name):
+        calls.append(("reset", name))
+        return reset(qmgr, name)
+
+    monkeypatch.setattr(WMQueueManager, "inquire_queues_status", inquire_queues_status)
+    monkeypatch.setattr(WMQueueManager, "reset_queue_stats", reset_queue_stats)
+    return calls
+
+
+def test_poll_inquires_the_names_with_the_same_qualifiers_together(connect, calls):
+    with QueueStatsPoller(connect, ["APP1.IN", "APP1.OUT", "APP2.OUT"], interval=None) as poller:
+        calls.clear()
+        assert sorted(poller.poll()) == ["APP1.IN", "APP1.OUT", "APP2.OUT"]
+    assert calls == [("inquire", "APP1.*"), ("inquire", "APP2.OUT")]
+
+
+def test_poll_never_inquires_a_shorter_prefix(connect, calls):
+    with QueueStatsPoller(connect, ["ORDERS", "OTHER", "APP1.IN", "APP2.OUT"], interval=None) as poller:
+        calls.clear()
+        assert sorted(poller.poll()) == ["APP1.IN", "APP2.OUT", "ORDERS", "OTHER"]
+    assert sorted(calls) == [("inquire", "APP1.IN"), ("inquire", "APP2.OUT"), ("inquire", "ORDERS"),
+                             ("inquire", "OTHER")]
+
+
+def test_reset_counters_only_resets_the_watched_queues(connect, calls):
+    with connect() as qmgr, WMQueue(qmgr, "OTHER") as other, WMQueue(qmgr, "ORDERS") as orders:
+        other.put(b"m")
+        orders.put_many([b"m", b"m"])
+        with QueueStatsPoller(connect, ["ORDERS", "OTHER", "PAYMENTS"], interval=None,
+                              reset_counters=True) as poller:
+            assert [name for call, name in calls if call == "reset"] == ["ORDERS", "OTHER", "PAYMENTS"]
+            assert poller.get("ORDERS").enqueued == 2
+        calls.clear()
+        with QueueStatsPoller(connect, ["ORDERS"], interval=None, reset_counters=True):
+            pass
+        assert ("reset", "ORDERS") in calls and ("reset", "OTHER") not in calls
+
+
+def test_reset_counters_never_resets_a_generic_name(connect, calls):
+    with QueueStatsPoller(connect, ["ORDERS", "APP1.*"], interval=None, reset_counters=True) as poller:
+        assert [name for call, name in calls if call == "reset"] == ["ORDERS"]
+        snapshot = poller.snapshot()
+        assert snapshot["APP1.IN"]["enqueued"] is None and snapshot["ORDERS"]["enqueued"] == 0
+
+
+def test_get_of_an_unknown_queue_raises_key_error(connect, calls):
+    with QueueStatsPoller(connect, interval=None) as poller:
+        assert poller.depth("ORDERS") == 0
+        with pytest.raises(KeyError):
+            poller.get("MISSING")
+
+
+def test_inquire_queue_status_does_not_reset_the_counters(qmgr):
+    with WMQueue(qmgr, "Q") as queue:
+        queue.put_many([b"m", b"m"])
+    assert qmgr.inquire_queue_status("Q")["current depth"] == 2
+    assert qmgr.inquire_queue_status("Q*")["current depth"] == 2  # the name the queue manager returns
+    assert qmgr.reset_queue_stats("Q")["Q"]["messages put since reset"] == 2
+
+
+def test_get_stats_from_queue_is_deprecated_and_keeps_its_keys(qmgr):
+    with WMQueue(qmgr, "Q") as queue:
+        queue.put_many([b"m", b"m", b"m"])
+        queue.get()
+    with pytest.warns(DeprecationWarning):
+        stats = qmgr.get_stats_from_queue("Q")
+    assert stats == {"time since last queue reset": 0, "current depth": 3,
+                     "messages red recently": 1, "messages put recently": 3}
+    with pytest.warns(DeprecationWarning):
+        assert qmgr.get_stats_from_queue("Q")["messages put recently"] == 0  # it resets them
@@ -0,0 +1,32 @@
+import io
+import pytest
+from pymqiwm import WMQueue
+
+
+def test_streams_refuse_to_settle_an_open_batch(qmgr):
+    with WMQueue(qmgr, "Q") as queue:
+        with queue.async_producer(check_every=100, syncpoint=True) as producer:
+            producer.put(b"in the unit of work")
+            assert qmgr.has_open_batch
+            with pytest.raises(AssertionError):
+                queue.put_stream(io.BytesIO(b"payload"))
+            with pytest.raises(AssertionError):
+                queue.get_stream(io.BytesIO())
+        assert not qmgr.has_open_batch
+        assert queue.depth() == 1
+
+
+def test_stream_round_trip(qmgr):
+    with WMQueue(qmgr, "Q") as queue:
+        queue.put_stream(io.BytesIO(b"0123456789"), chunk_size=4)
+        output = io.BytesIO()
+        assert queue.get_stream(output) == 10
+        assert output.getvalue() == b"0123456789"
+
+
+def test_streams_on_a_raw_queue_manager(raw_qmgr):
+    with WMQueue(raw_qmgr, "Q") as queue:
+        queue.put_stream(io.BytesIO(b"0123456789"), chunk_size=4)
+        output = io.BytesIO()
+        assert queue.get_stream(output) == 10
+        assert output.getvalue() == b"0123456789"
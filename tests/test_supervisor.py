@@ -0,0 +1,77 @@
+import os
+import time
+import pytest
+from pymqiwm import ProcessSupervisor, WMQueue, WMQueueManager
+
+# The worker processes are forked, so they get a copy of the fake queue manager as it was when they started,
+# every worker process handles all the messages that were on the queue then
+_shared = {}
+
+
+@pytest.fixture(autouse=True)
+def shared(backend, tmp_path, monkeypatch):
+    monkeypatch.setitem(_shared, "backend", backend)
+    monkeypatch.setitem(_shared, "crashed", str(tmp_path / "crashed"))
+
+
+def connect():
+    return WMQueueManager("QM", "host1(1414)", backend=_shared["backend"])
+
+
+def handle(message):
+    """ Kills its process at the first b"crash" message, the file it leaves behind is seen by the next process """
+    if message == b"crash" and not os.path.exists(_shared["crashed"]):
+        open(_shared["crashed"], "w").close()
+        os._exit(1)
+
+
+def supervisor(**options):
+    options = dict(dict(processes=1, restart_delay=0, stats_interval=0.05, seconds_wait_interval=0.05,
+                        start_method="fork"), **options)
+    return ProcessSupervisor(connect, "Q", handle, **options)
+
+
+def wait_for(condition, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "Timed out"
+        time.sleep(0.02)
+
+
+def put(qmgr, *messages):
+    with WMQueue(qmgr, "Q") as queue:
+        queue.put_many(messages)
+
+
+def test_a_crashed_worker_is_started_again(qmgr):
+    put(qmgr, b"a", b"crash", b"b")
+    with supervisor() as running:
+        wait_for(lambda: running.restarts == 1 and running.stats()["handled"] >= 3)
+        stats = running.stats()
+        assert stats["processes"] == 1 and len(stats["workers"]) == 1
+    assert os.path.exists(_shared["crashed"])
+
+
+def test_the_counters_of_the_workers_are_added_up(qmgr):
+    put(qmgr, b"a", b"b", b"c", b"d", b"e")
+    with supervisor(processes=2) as running:
+        wait_for(lambda: running.stats()["handled"] == 10)
+        stats = running.stats()
+        assert stats["processes"] == 2 and stats["received"] == 10 and stats["errors"] == 0
+        assert sorted(worker["handled"] for worker in stats["workers"].values()) == [5, 5]
+        assert stats["msgs per sec"] > 0
+    stats = running.stats()
+    assert stats["handled"] == 10 and stats["processes"] == 0 and stats["restarts"] == 0
+
+
+def test_the_workers_are_scaled_by_the_depth(qmgr):
+    put(qmgr, *[b"m%02d" % i for i in range(25)])
+    with supervisor(max_processes=3, messages_per_process=10, scale_interval=60) as running:
+        wait_for(lambda: running.stats()["processes"] == 3)
+        assert running.stats()["depth"] == 25
+        with running._lock:
+            running._scale(0)
+        wait_for(lambda: running.stats()["processes"] == 1)
+        time.sleep(0.3)  # the supervisor does not start the retired workers again
+        assert running.stats()["processes"] == 1 and running.restarts == 0
+        wait_for(lambda: running.stats()["handled"] >= 25)
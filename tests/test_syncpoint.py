@@ -0,0 +1,63 @@
+import pytest
+from pymqiwm import WMQueue, StringCodec
+
+
+def test_put_many_commits_every_batch(qmgr):
+    with WMQueue(qmgr, "Q") as queue:
+        assert queue.put_many([b"m%d" % i for i in range(25)], batch_size=10) == 25
+        assert queue.depth() == 25
+        assert not qmgr.has_open_batch
+
+
+def test_get_many_raises_with_the_committed_batches_when_a_later_one_fails(qmgr):
+    with WMQueue(qmgr, "Q", codec="json") as queue, WMQueue(qmgr, "Q") as raw:
+        queue.put_many([{"i": i} for i in range(10)])
+        raw.put(b"not json")
+        queue.put({"i": 10})
+
+        with pytest.raises(ValueError) as raised:
+            queue.get_many(100, batch_size=5)
+
+        assert raised.value.committed_messages == [{"i": i} for i in range(10)]
+        assert queue.depth() == 2  # the failed batch was backed out
+        with pytest.raises(ValueError) as raised:
+            queue.get_many(100, batch_size=5)
+        assert raised.value.committed_messages == []
+        assert queue.depth() == 2
+        assert not qmgr.has_open_batch
+
+
+def test_batches_work_on_a_raw_queue_manager(raw_qmgr):
+    with WMQueue(raw_qmgr, "Q") as queue:
+        assert queue.put_many([b"m%d" % i for i in range(7)], batch_size=3) == 7
+        assert queue.get_many(5, batch_size=3) == [b"m%d" % i for i in range(5)]
+        with queue.read_messages_in_batches(batch_size=3) as messages:
+            assert list(messages) == [b"m5", b"m6"]
+        assert queue.depth() == 0
+
+
+class _Interrupted(BaseException):
+    pass
+
+
+class _InterruptingCodec(StringCodec):
+    """ Interrupts the decode of the second batch """
+
+    def __init__(self):
+        super().__init__()
+        self.batches = 0
+
+    def decode_many(self, bodies) -> list:
+        self.batches += 1
+        if self.batches == 2:
+            raise _Interrupted()
+        return super().decode_many(bodies)
+
+
+def test_get_many_attaches_the_committed_messages_to_a_base_exception(qmgr):
+    with WMQueue(qmgr, "Q", codec=_InterruptingCodec()) as queue:
+        queue.put_many(["m%d" % i for i in range(8)])
+        with pytest.raises(_Interrupted) as raised:
+            queue.get_many(100, batch_size=5)
+        assert raised.value.committed_messages == ["m%d" % i for i in range(5)]
+        assert queue.depth() == 3
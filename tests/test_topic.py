@@ -0,0 +1,39 @@
+import threading
+from pymqiwm import WMSubscription, WMTopic
+
+
+def test_fan_out_reads_at_most_max_in_flight_messages_ahead(qmgr):
+    with WMSubscription(qmgr, "prices/#") as subscription:
+        with WMTopic(qmgr, "prices/eur") as topic:
+            topic.publish_many([b"%d" % i for i in range(20)])
+        read, handled, ahead = [0], [0], []
+        lock = threading.Lock()
+        messages = subscription.read_messages_while_waiting
+
+        def counting(*args):
+            for message in messages(*args):
+                with lock:
+                    read[0] += 1
+                yield message
+
+        def handler(message):
+            with lock:
+                ahead.append(read[0] - handled[0])
+                handled[0] += 1
+
+        subscription.read_messages_while_waiting = counting
+        assert subscription.fan_out(handler, workers=8, max_in_flight=3) == {"handled": 20, "failed": 0}
+        assert max(ahead) <= 3
+
+
+def test_fan_out_counts_a_base_exception_as_failed(qmgr):
+    class Interrupted(BaseException):
+        pass
+
+    def handler(message):
+        raise Interrupted()
+
+    with WMSubscription(qmgr, "prices/#") as subscription:
+        with WMTopic(qmgr, "prices/eur") as topic:
+            topic.publish_many([b"a", b"b"])
+        assert subscription.fan_out(handler, workers=1) == {"handled": 0, "failed": 2}